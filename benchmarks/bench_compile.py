@@ -0,0 +1,251 @@
+"""
+Scaling benchmarks for problem construction and compilation.
+
+Generates random graph colouring and assignment problems in both encodings and records the
+wall time and peak memory of every compile phase as JSON, so that runs on two commits can be
+compared for regressions:
+
+    python -m benchmarks.bench_compile --output before.json
+    python -m benchmarks.bench_compile --output after.json
+    python -m benchmarks.bench_compile --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import dimod
+import numpy as np
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm, LinearEqualityConstraint
+
+SIZES = [10, 100, 1000, 10000, 100000]
+COLOURS = [3, 8, 16, 64]
+ENCODINGS = ["one-hot", "domain-wall"]
+PROBLEMS = ["colouring", "assignment"]
+# the compile phases are the stages compute_bqm reports through its instrumentation hooks
+COMPILE_STAGES = [
+    "compute_objective_bqm", "compute_constraint_bqm", "kill_impossible_terms", "substitution", "combine",
+    "fix_ends", "verify_bqm",
+]
+PHASES = ["variable_creation", "term_creation"] + COMPILE_STAGES
+
+
+def estimated_couplers(problem: str, encoding: str, n: int, k: int, degree: int) -> int:
+    '''Rough coupler count of the compiled model, used to skip configurations that will not fit'''
+    per_variable = k * (k - 1) // 2 if encoding == "one-hot" else k
+    edges = n * degree // 2 * k * (4 if encoding == "domain-wall" else 1)
+    if problem == "assignment":
+        # one equality constraint per value over every variable
+        edges = k * n * (n - 1) // 2
+    return n * per_variable + edges
+
+
+def colouring_terms(problem: Problem, rng, n: int, k: int, degree: int):
+    edges = rng.integers(0, n, size=(max(n * degree // 2, 1), 2))
+    problem.add_not_equal_edges(edges[edges[:, 0] != edges[:, 1]])
+    costs = rng.random(k)
+    for variable in problem.discrete_variables:
+        for slot, binary_variable in enumerate(variable.one_hot_variable_list):
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], costs[slot]))
+
+
+def assignment_terms(problem: Problem, rng, n: int, k: int, degree: int):
+    '''Each variable is a worker choosing one of k tasks, every task takes n // k workers'''
+    costs = rng.random((n, k))
+    for variable, row in zip(problem.discrete_variables, costs):
+        for slot, binary_variable in enumerate(variable.one_hot_variable_list):
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], row[slot]))
+    for slot in range(k):
+        workers = [variable.one_hot_variable_list[slot] for variable in problem.discrete_variables]
+        problem.add_constraint_term(LinearEqualityConstraint(1, workers, max(n // k, 1)))
+
+
+def phases(problem_kind: str, encoding: str, n: int, k: int, degree: int, seed: int, substitution_mode: str,
+           compile_workers: int = 1, on_stage=None):
+    '''
+    The benchmark steps in order, as (name, callable) pairs sharing one state dict. The compile
+    step is a full compute_bqm, whose stages are passed to on_stage as they finish.
+    '''
+    state = {"rng": np.random.default_rng(seed)}
+
+    def variable_creation():
+        problem = Problem()
+        problem.substitution_mode = substitution_mode
+        problem.compile_workers = compile_workers
+        for i in range(n):
+            problem.add_variable(DiscreteVariable(name=f"n{i}", domain=list(range(k)), encoding_type=encoding))
+        state["problem"] = problem
+
+    def term_creation():
+        build = colouring_terms if problem_kind == "colouring" else assignment_terms
+        build(state["problem"], state["rng"], n, k, degree)
+
+    def compile_bqm():
+        problem = state["problem"]
+        problem.enable_instrumentation(on_stage=[on_stage] if on_stage else None)
+        problem.compute_bqm(incremental=False)
+        problem.disable_instrumentation()
+
+    return state, [
+        ("variable_creation", variable_creation),
+        ("term_creation", term_creation),
+        ("compile", compile_bqm),
+    ]
+
+
+def run_phases(config: dict, trace_memory: bool) -> dict:
+    '''
+    Seconds, or peak bytes allocated when trace_memory, of every phase. Phases the compile did
+    not run in this configuration (fix_ends outside sequential substitution) are recorded as 0.
+    '''
+    results = {}
+    baseline = 0
+
+    def record(name, seconds):
+        nonlocal baseline
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            results[name] = {"peak_bytes": max(peak - baseline, 0)}
+            tracemalloc.reset_peak()
+            baseline = current
+        else:
+            results[name] = {"seconds": seconds}
+
+    state, steps = phases(**config, on_stage=lambda stage: record(stage.name, stage.seconds))
+    if trace_memory:
+        tracemalloc.start()
+    for name, step in steps:
+        if trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        step()
+        if name != "compile":
+            record(name, time.perf_counter() - start)
+    if trace_memory:
+        tracemalloc.stop()
+    for name in PHASES:
+        results.setdefault(name, {"peak_bytes": 0} if trace_memory else {"seconds": 0.0})
+    results["model"] = {
+        "num_variables": state["problem"].BQM.num_variables,
+        "num_interactions": state["problem"].BQM.num_interactions,
+    }
+    return results
+
+
+def benchmark(config: dict, repeat: int = 1) -> dict:
+    '''Best wall time over repeat timed runs, then one traced run for peak memory'''
+    timings = [run_phases(config, trace_memory=False) for _ in range(repeat)]
+    memory = run_phases(config, trace_memory=True)
+    result = dict(config, phases={}, model=timings[0]["model"])
+    for name in PHASES:
+        result["phases"][name] = {
+            "seconds": min(timing[name]["seconds"] for timing in timings),
+            "peak_bytes": memory[name]["peak_bytes"],
+        }
+    return result
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(sizes=SIZES, colours=COLOURS, encodings=ENCODINGS, problems=PROBLEMS, degree: int = 6,
+              seed: int = 0, repeat: int = 1, max_couplers: int = 5_000_000, substitution_mode: str = "sparse",
+              log=None, compile_workers: int = 1) -> dict:
+    results = []
+    for problem_kind in problems:
+        for encoding in encodings:
+            for n in sizes:
+                for k in colours:
+                    if estimated_couplers(problem_kind, encoding, n, k, degree) > max_couplers:
+                        continue
+                    config = dict(problem_kind=problem_kind, encoding=encoding, n=n, k=k, degree=degree,
+                                  seed=seed, substitution_mode=substitution_mode, compile_workers=compile_workers)
+                    result = benchmark(config, repeat)
+                    results.append(result)
+                    if log:
+                        total = sum(phase["seconds"] for phase in result["phases"].values())
+                        log(f"{problem_kind:10} {encoding:11} n={n:<6} k={k:<3} {total:8.3f}s")
+    return {
+        "commit": current_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "dimod": dimod.__version__,
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 1.2, min_seconds: float = 0.01) -> list:
+    '''(config, phase, old, new) for every phase whose time or peak memory grew by more than threshold'''
+    key = lambda result: tuple(result[field] for field in ("problem_kind", "encoding", "n", "k", "degree", "substitution_mode")) + (
+        result.get("compile_workers", 1),)
+    old_results = {key(result): result for result in old["results"]}
+    regressions = []
+    for result in new["results"]:
+        before = old_results.get(key(result))
+        if before is None:
+            continue
+        for name, phase in result["phases"].items():
+            was = before["phases"].get(name)
+            if was is None:
+                continue
+            if phase["seconds"] > min_seconds and phase["seconds"] > threshold * max(was["seconds"], min_seconds):
+                regressions.append((key(result), name, "seconds", was["seconds"], phase["seconds"]))
+            if phase["peak_bytes"] > threshold * max(was["peak_bytes"], 1 << 20):
+                regressions.append((key(result), name, "peak_bytes", was["peak_bytes"], phase["peak_bytes"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--colours", type=int, nargs="+", default=COLOURS)
+    parser.add_argument("--encodings", nargs="+", default=ENCODINGS, choices=ENCODINGS)
+    parser.add_argument("--problems", nargs="+", default=PROBLEMS, choices=PROBLEMS)
+    parser.add_argument("--degree", type=int, default=6, help="average degree of the colouring graphs")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-couplers", type=int, default=5_000_000, help="skip configurations estimated to be larger")
+    parser.add_argument("--substitution-mode", default="sparse", choices=["sparse", "sequential"])
+    parser.add_argument("--compile-workers", type=int, default=1, help="processes used to emit terms")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        regressions = compare(old, new, args.threshold)
+        for config, phase, measure, was, now in regressions:
+            print(f"{' '.join(map(str, config))} {phase} {measure}: {was:.4g} -> {now:.4g}")
+        print(f"{len(regressions)} regressions between {old['commit'][:8]} and {new['commit'][:8]}")
+        return 1 if regressions else 0
+
+    suite = run_suite(args.sizes, args.colours, args.encodings, args.problems, args.degree, args.seed,
+                      args.repeat, args.max_couplers, args.substitution_mode, log=print,
+                      compile_workers=args.compile_workers)
+    with open(args.output, "w") as f:
+        json.dump(suite, f, indent=1)
+    print(f"wrote {len(suite['results'])} results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Start-up cost of dw_util for short-lived processes: each snippet runs in a fresh interpreter
+and the median wall time over the repeats is reported, with the heavy modules it ended up
+loading. The bare interpreter start is measured too, so the import cost is the difference:
+
+    python -m benchmarks.bench_import --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# modules whose loading the lazy layout defers
+HEAVY = ["numpy", "scipy", "dimod", "matplotlib"]
+
+SNIPPETS = {
+    "interpreter": "pass",
+    "import dw_util": "import dw_util",
+    "import Problem": "from dw_util import Problem, DiscreteVariable",
+    "build model": (
+        "from dw_util import Problem, DiscreteVariable\n"
+        "variables = [DiscreteVariable(f'n{i}', list(range(4)), 'domain-wall') for i in range(50)]\n"
+        "problem = Problem(variables)\n"
+        "for a, b in zip(variables, variables[1:]):\n"
+        "    problem.add_objective_term(a != b)\n"
+    ),
+    "build and compile": (
+        "from dw_util import Problem, DiscreteVariable\n"
+        "variables = [DiscreteVariable(f'n{i}', list(range(4)), 'domain-wall') for i in range(50)]\n"
+        "problem = Problem(variables)\n"
+        "for a, b in zip(variables, variables[1:]):\n"
+        "    problem.add_objective_term(a != b)\n"
+        "problem.compute_bqm()\n"
+    ),
+}
+
+REPORT = (
+    "\nimport json, sys\n"
+    f"print(json.dumps([m for m in {HEAVY!r} if sys.modules.get(m) is not None]))\n"
+)
+
+
+def time_snippet(code: str, repeat: int = 5) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    seconds, loaded = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", code + REPORT], env=env, check=True, capture_output=True, text=True).stdout
+        seconds.append(time.perf_counter() - start)
+        loaded = json.loads(output.strip().splitlines()[-1])
+    return {"seconds": statistics.median(seconds), "loaded": loaded}
+
+
+def run(repeat: int = 5, snippets=SNIPPETS) -> dict:
+    results = {name: time_snippet(code, repeat) for name, code in snippets.items()}
+    baseline = results.get("interpreter", {"seconds": 0.0})["seconds"]
+    for result in results.values():
+        result["over_interpreter"] = result["seconds"] - baseline
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+    results = run(args.repeat)
+    for name, result in results.items():
+        print(f"{name:20s} {result['seconds'] * 1000:8.1f} ms  (+{result['over_interpreter'] * 1000:7.1f} ms)  loads {', '.join(result['loaded']) or '-'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
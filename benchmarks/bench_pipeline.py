@@ -0,0 +1,82 @@
+"""
+Throughput of solving a batch of small Problems one after another against the asynchronous
+solve_many pipeline, with a sampler that simulates the latency of a remote solver:
+
+    python -m benchmarks.bench_pipeline --problems 200 --latency 0.05 --max-in-flight 16
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_compile import colouring_terms
+from dw_util.classes import Problem, DiscreteVariable
+from dw_util.pipeline import solve_all, LatencySampler
+
+
+def colouring_problems(count: int, n: int, k: int, encoding: str, degree: int = 4, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        problem = Problem([DiscreteVariable(f"n{i}", list(range(k)), encoding) for i in range(n)])
+        colouring_terms(problem, rng, n, k, degree)
+        yield problem
+
+
+def solve_serially(problems, sampler, **sampler_kwargs) -> int:
+    solved = 0
+    for problem in problems:
+        problem.compute_bqm()
+        problem.evaluate(sampler.sample(problem.BQM, **sampler_kwargs))
+        solved += 1
+    return solved
+
+
+def run(count: int = 50, n: int = 20, k: int = 4, encoding: str = "domain-wall", latency: float = 0.05,
+        max_in_flight: int = 8, compile_workers: int = None, num_reads: int = 10) -> dict:
+    '''Seconds and problems per second of the serial loop and of solve_many on the same batch'''
+    sampler = LatencySampler(latency=latency)
+    start = time.perf_counter()
+    solve_serially(colouring_problems(count, n, k, encoding), sampler, num_reads=num_reads)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = solve_all(colouring_problems(count, n, k, encoding), sampler, max_in_flight, compile_workers, num_reads=num_reads)
+    pipelined = time.perf_counter() - start
+    failed = [result.index for result in results if not result.ok]
+    return {
+        "config": {"count": count, "n": n, "k": k, "encoding": encoding, "latency": latency,
+                   "max_in_flight": max_in_flight, "compile_workers": compile_workers, "num_reads": num_reads},
+        "serial_seconds": serial,
+        "pipeline_seconds": pipelined,
+        "speedup": serial / pipelined,
+        "problems_per_second": count / pipelined,
+        "mean_stage_seconds": {
+            stage: float(np.mean([result.timings[stage] for result in results if result.ok]))
+            for stage in ["compile", "compile_wall", "sample", "decode", "total"]
+        } if len(failed) < len(results) else {},
+        "failed": failed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=50)
+    parser.add_argument("--variables", type=int, default=20)
+    parser.add_argument("--colours", type=int, default=4)
+    parser.add_argument("--encoding", default="domain-wall", choices=["one-hot", "domain-wall"])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stand-in sampler waits per call")
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--compile-workers", type=int, default=None, help="compile processes, 0 to compile in a thread")
+    parser.add_argument("--num-reads", type=int, default=10)
+    args = parser.parse_args(argv)
+    result = run(args.problems, args.variables, args.colours, args.encoding, args.latency,
+                 args.max_in_flight, args.compile_workers, args.num_reads)
+    print(json.dumps(result, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
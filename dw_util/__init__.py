@@ -0,0 +1,39 @@
+'''
+Domain wall and one-hot encoding of discrete variables as binary quadratic models.
+
+The names below are imported from their modules on first use, so importing dw_util is cheap,
+and building a model does not load dimod or NumPy until it is compiled.
+'''
+import importlib
+
+_EXPORTS = {
+    "Problem": "dw_util.classes",
+    "DiscreteVariable": "dw_util.classes",
+    "BinaryVariable": "dw_util.classes",
+    "ConstantTerm": "dw_util.classes",
+    "BinaryLinearTerm": "dw_util.classes",
+    "BinaryQuadraticTerm": "dw_util.classes",
+    "BinaryPolynomialTerm": "dw_util.classes",
+    "NotEqualTerm": "dw_util.classes",
+    "LinearEqualityConstraint": "dw_util.classes",
+    "Collection": "dw_util.classes",
+    "Evaluation": "dw_util.evaluate",
+    "DiscreteAnnealingSampler": "dw_util.sampler",
+    "solve_many": "dw_util.pipeline",
+    "solve_all": "dw_util.pipeline",
+    "LatencySampler": "dw_util.pipeline",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'dw_util' has no attribute '{name}'")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,15 +1,39 @@
 from abc import ABC, abstractmethod
-from dimod import BQM
+
+from dw_util.lazy import lazy_import
+
+dimod = lazy_import("dimod")
 
 class AbstractVariable(ABC):
+    __slots__ = ('_name', 'domain', 'extra_properties')
+
     def __init__(self, name: str, domain: list = None, extra_properties: dict = None):
         self.name = name
         self.domain = domain
+        self.extra_properties = None
         if extra_properties:
-            for key, value in extra_properties.items():
-                if hasattr(self, key):
+            for key in extra_properties:
+                if hasattr(type(self), key):
                     raise AttributeError(f"Cannot add property '{key}' as it already exists on the object")
-                setattr(self, key, value)
+            self.extra_properties = dict(extra_properties)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, name: str):
+        self._name = name
+
+    def __getattr__(self, key):
+        # only reached when normal lookup fails, extra properties live in one dict rather than a __dict__
+        try:
+            extra_properties = object.__getattribute__(self, 'extra_properties')
+        except AttributeError:
+            extra_properties = None
+        if extra_properties and key in extra_properties:
+            return extra_properties[key]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{key}'")
 
     def __str__(self):
         return f"{self.name}∈{self.domain}, {self.extra_properties if self.extra_properties else ''}"
@@ -34,6 +58,10 @@ class AbstractTerm(ABC):
     def BQM(self):
         pass
 
+    def emit(self, accumulator):
+        '''Add the coefficients of this term to a CoefficientAccumulator, by default via its BQM'''
+        accumulator.add_bqm(self.BQM)
+
     def __str__(self):
         return self.description + f" | coeff: {self.coefficient} | vars: " + " | ".join([variable.name for variable in self.variables])
 
@@ -47,11 +75,15 @@ class AbstractCollection(ABC):
 
     @property
     def BQM(self):
-        bqm = BQM(vartype='BINARY')
+        bqm = dimod.BQM(vartype='BINARY')
         for term in self.terms:
             bqm.update(term.BQM)
         return bqm
 
+    def emit(self, accumulator):
+        for term in self.terms:
+            term.emit(accumulator)
+
     @property
     def value(self):
         return sum([term.value for term in self.terms])
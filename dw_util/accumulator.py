@@ -0,0 +1,286 @@
+from dw_util.abstract import AbstractVariable
+from dw_util.lazy import lazy_import
+
+np = lazy_import("numpy")
+dimod = lazy_import("dimod")
+
+
+class GrowableBuffer:
+    '''A numpy array that doubles its capacity when it runs out of room'''
+    def __init__(self, dtype, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def wrap(cls, array: 'np.ndarray'):
+        '''A full buffer over an existing (possibly read-only, memory mapped) array, copied on first write'''
+        buffer = cls(array.dtype, 0)
+        buffer._data = array
+        buffer.size = len(array)
+        return buffer
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed > len(self._data) or not self._data.flags.writeable:
+            capacity = max(needed, 2 * len(self._data))
+            data = np.empty(capacity, dtype=self._data.dtype)
+            data[:self.size] = self._data[:self.size]
+            self._data = data
+
+    def append(self, value):
+        self._reserve(1)
+        self._data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype).ravel()
+        self._reserve(len(values))
+        self._data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def clear(self):
+        self.size = 0
+
+    @property
+    def array(self):
+        return self._data[:self.size]
+
+    def __len__(self):
+        return self.size
+
+
+def reduce_coo(rows: 'np.ndarray', cols: 'np.ndarray', biases: 'np.ndarray', num_variables: int):
+    '''
+    Merge duplicate (row, col) couplings with a single sort and reduce. Pairs are put in
+    row < col order first so (u, v) and (v, u) land on the same coupler.
+    '''
+    rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+    keys = rows.astype(np.int64) * num_variables + cols
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if len(keys) == 0:
+        return rows[:0], cols[:0], biases[:0].astype(np.float64)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    merged = np.add.reduceat(biases[order].astype(np.float64), starts)
+    unique_keys = keys[starts]
+    return unique_keys // num_variables, unique_keys % num_variables, merged
+
+
+class CoefficientAccumulator:
+    '''
+    Collects linear biases, (row, col, bias) coupler triples and an offset into growable
+    numpy buffers. Duplicates are only merged when the model is reduced, so adding a term
+    is just an append and the BQM is built in a single from_numpy_vectors call.
+
+    If num_variables is given the labels are taken to already be dense integer indices (as
+    handed out by a VariableRegistry) and no label lookup is done at all.
+    '''
+    def __init__(self, capacity: int = 1024, num_variables: int = None):
+        self.labels = []
+        self.index = {}
+        self.indexed = num_variables is not None
+        self._num_variables = num_variables
+        self.offset = 0.0
+        self._explicit_variables = GrowableBuffer(np.int64, 16)
+        self._linear_indices = GrowableBuffer(np.int64, capacity)
+        self._linear_biases = GrowableBuffer(np.float64, capacity)
+        self._rows = GrowableBuffer(np.int64, capacity)
+        self._cols = GrowableBuffer(np.int64, capacity)
+        self._quadratic_biases = GrowableBuffer(np.float64, capacity)
+
+    @property
+    def num_variables(self):
+        return self._num_variables if self.indexed else len(self.labels)
+
+    def resize(self, num_variables: int):
+        '''Let an indexed accumulator take labels up to num_variables, e.g. after the registry grew'''
+        assert self.indexed and num_variables >= self._num_variables, "Can only grow an indexed accumulator"
+        self._num_variables = num_variables
+
+    @property
+    def num_entries(self):
+        '''Number of buffered (not yet merged) linear and quadratic entries'''
+        return len(self._linear_indices) + len(self._rows)
+
+    @property
+    def empty(self):
+        return self.num_entries == 0 and len(self._explicit_variables) == 0 and self.offset == 0
+
+    def clear(self):
+        for buffer in self._buffers:
+            buffer.clear()
+        self.offset = 0.0
+
+    @property
+    def _buffers(self):
+        return (
+            self._explicit_variables, self._linear_indices, self._linear_biases,
+            self._rows, self._cols, self._quadratic_biases,
+        )
+
+    def variable_index(self, label) -> int:
+        '''The dense integer index of a label, registering it if it has not been seen yet'''
+        if self.indexed:
+            return label
+        try:
+            return self.index[label]
+        except KeyError:
+            self.index[label] = len(self.labels)
+            self.labels.append(label)
+            return self.index[label]
+
+    def add_variable(self, label):
+        index = self.variable_index(label)
+        if self.indexed:
+            self._explicit_variables.append(index)
+
+    def add_offset(self, bias: float):
+        self.offset += bias
+
+    def add_linear(self, label, bias: float):
+        self._linear_indices.append(self.variable_index(label))
+        self._linear_biases.append(bias)
+
+    def add_quadratic(self, u, v, bias: float):
+        if u == v:
+            # x * x == x for binary variables
+            self.add_linear(u, bias)
+            return
+        self._rows.append(self.variable_index(u))
+        self._cols.append(self.variable_index(v))
+        self._quadratic_biases.append(bias)
+
+    def add_linear_from_arrays(self, indices, biases):
+        '''Bulk version of add_linear taking already registered integer indices'''
+        self._linear_indices.extend(indices)
+        self._linear_biases.extend(np.broadcast_to(biases, np.shape(indices)))
+
+    def add_quadratic_from_arrays(self, rows, cols, biases):
+        '''Bulk version of add_quadratic taking already registered integer indices'''
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        biases = np.broadcast_to(np.asarray(biases, dtype=np.float64), rows.shape)
+        diagonal = rows == cols
+        if diagonal.any():
+            self.add_linear_from_arrays(rows[diagonal], biases[diagonal])
+            rows, cols, biases = rows[~diagonal], cols[~diagonal], biases[~diagonal]
+        self._rows.extend(rows)
+        self._cols.extend(cols)
+        self._quadratic_biases.extend(biases)
+
+    def merge(self, other: 'CoefficientAccumulator', scale: float = 1.0):
+        '''Add every entry of another indexed accumulator over the same labels, multiplied by scale'''
+        assert self.indexed and other.indexed, "Only indexed accumulators share a label space"
+        self._explicit_variables.extend(other._explicit_variables.array)
+        self._linear_indices.extend(other._linear_indices.array)
+        self._linear_biases.extend(scale * other._linear_biases.array)
+        self._rows.extend(other._rows.array)
+        self._cols.extend(other._cols.array)
+        self._quadratic_biases.extend(scale * other._quadratic_biases.array)
+        self.offset += scale * other.offset
+
+    def drop_variables(self, labels) -> 'CoefficientAccumulator':
+        '''
+        Remove every entry of an indexed accumulator that involves one of labels, the offset
+        stays. Returns the removed entries as an accumulator of their own.
+        '''
+        assert self.indexed, "Only an indexed accumulator can drop variables by label"
+        dropped = np.zeros(self.num_variables, dtype=bool)
+        labels = np.asarray(labels, dtype=np.int64)
+        dropped[labels[labels < self.num_variables]] = True
+        linear = dropped[self._linear_indices.array]
+        quadratic = dropped[self._rows.array] | dropped[self._cols.array]
+        removed = CoefficientAccumulator.from_arrays(
+            self.num_variables, self._linear_indices.array[linear], self._linear_biases.array[linear],
+            self._rows.array[quadratic], self._cols.array[quadratic], self._quadratic_biases.array[quadratic],
+        )
+        explicit = self._explicit_variables.array
+        kept = [
+            explicit[~dropped[explicit]], self._linear_indices.array[~linear], self._linear_biases.array[~linear],
+            self._rows.array[~quadratic], self._cols.array[~quadratic], self._quadratic_biases.array[~quadratic],
+        ]
+        for buffer, values in zip(self._buffers, kept):
+            buffer.clear()
+            buffer.extend(values)
+        return removed
+
+    def compact(self):
+        '''
+        Merge duplicates in place, so the buffers hold one entry per variable and coupler. Keeps
+        memory proportional to the size of the model however many terms have been added.
+        '''
+        linear, (rows, cols, biases), offset = self.reduce()
+        used = self.used_variables() if self.indexed else np.arange(self.num_variables)
+        self.clear()
+        self.offset = offset
+        if self.indexed:
+            self._explicit_variables.extend(used)
+        self._linear_indices.extend(used)
+        self._linear_biases.extend(linear[used])
+        self._rows.extend(rows)
+        self._cols.extend(cols)
+        self._quadratic_biases.extend(biases)
+
+    @classmethod
+    def from_arrays(cls, num_variables: int, linear_indices, linear_biases, rows, cols, biases, offset: float = 0.0):
+        '''An indexed accumulator holding the given entries, without copying them until it is written to'''
+        accumulator = cls(capacity=0, num_variables=num_variables)
+        accumulator._linear_indices = GrowableBuffer.wrap(np.asarray(linear_indices, dtype=np.int64))
+        accumulator._linear_biases = GrowableBuffer.wrap(np.asarray(linear_biases, dtype=np.float64))
+        accumulator._rows = GrowableBuffer.wrap(np.asarray(rows, dtype=np.int64))
+        accumulator._cols = GrowableBuffer.wrap(np.asarray(cols, dtype=np.int64))
+        accumulator._quadratic_biases = GrowableBuffer.wrap(np.asarray(biases, dtype=np.float64))
+        accumulator._explicit_variables = GrowableBuffer.wrap(np.asarray(linear_indices, dtype=np.int64))
+        accumulator.offset = offset
+        return accumulator
+
+    def add_bqm(self, bqm: 'dimod.BQM'):
+        '''
+        Fold an existing dimod BQM into the buffers, used for terms that only provide a BQM.
+        An indexed accumulator takes the BQM's variable labels by their registry index.
+        '''
+        if self.indexed:
+            bqm = bqm.relabel_variables(
+                {variable: variable.index for variable in bqm.variables if isinstance(variable, AbstractVariable)},
+                inplace=False,
+            )
+        for variable in bqm.variables:
+            self.add_variable(variable)
+        for variable, bias in bqm.linear.items():
+            self.add_linear(variable, bias)
+        for (u, v), bias in bqm.quadratic.items():
+            self.add_quadratic(u, v, bias)
+        self.add_offset(bqm.offset)
+
+    def reduce(self):
+        '''Returns (linear, (rows, cols, biases), offset) with duplicate couplers merged'''
+        n = self.num_variables
+        linear = np.bincount(
+            self._linear_indices.array, weights=self._linear_biases.array, minlength=n
+        ).astype(np.float64)
+        quadratic = reduce_coo(
+            self._rows.array, self._cols.array, self._quadratic_biases.array, max(n, 1)
+        )
+        return linear, quadratic, self.offset
+
+    def used_variables(self) -> 'np.ndarray':
+        '''Sorted indices of every variable that has been given a bias or explicitly added'''
+        used = np.zeros(self.num_variables, dtype=bool)
+        for buffer in (self._linear_indices, self._rows, self._cols, self._explicit_variables):
+            used[buffer.array] = True
+        return np.flatnonzero(used)
+
+    def to_bqm(self) -> 'dimod.BQM':
+        linear, (rows, cols, biases), offset = self.reduce()
+        if not self.indexed:
+            return dimod.BQM.from_numpy_vectors(
+                linear, (rows, cols, biases), offset, 'BINARY', variable_order=self.labels
+            )
+        # only variables that were touched end up in the model, labelled by their index
+        used = self.used_variables()
+        position = np.empty(self.num_variables, dtype=np.int64)
+        position[used] = np.arange(len(used))
+        return dimod.BQM.from_numpy_vectors(
+            linear[used], (position[rows], position[cols], biases), offset, 'BINARY',
+            variable_order=used.tolist()
+        )
@@ -1,20 +1,63 @@
-from dimod import BinaryQuadraticModel as BQM
-from itertools import combinations as comb
+from dw_util.lazy import lazy_import
 from dw_util.abstract import AbstractVariable, AbstractTerm, AbstractCollection
-from dw_util.standalone import substitute_bqm_variables
+from dw_util.accumulator import CoefficientAccumulator
+from dw_util.registry import VariableRegistry
+from dw_util.instrumentation import Instrumentation, NULL_STAGE
+from dw_util.streaming import StreamedCoefficients, chunked, iter_edge_source
+from dw_util.quadratize import quadratize
+
+# building a model needs neither, they are loaded when a model is first compiled
+np = lazy_import("numpy")
+dimod = lazy_import("dimod")
 
 
 class Problem:
-    def __init__(self, discrete_variables = [], ancillary_variables = []):
-        self.discrete_variables = discrete_variables
-        self.ancillary_variables = ancillary_variables
+    def __init__(self, discrete_variables = None, ancillary_variables = None):
+        # binary variables are labelled in the compiled BQMs by their index in the registry
+        self.registry = VariableRegistry()
+        self.discrete_variables = []
+        # binary variables outside the discrete variables, such as the ancillas of quadratize
+        self.ancillary_variables = []
         self.objective_terms = []
         self.constraint_terms = []
-        self._objective_bqm = BQM(vartype='BINARY')
-        self._constraint_bqm = BQM(vartype='BINARY')
+        # dimod BQMs are only made when compiled or asked for
+        self._objective_bqm = None
+        self._constraint_bqm = None
         self._BQM = None
 
         self.penalty_weight = 1
+        # "sparse" substitutes every domain wall variable (and fixes the ends) in one pass,
+        # "sequential" substitutes one variable at a time
+        self.substitution_mode = "sparse"
+        # processes used to emit the terms of a full compile, None for every core
+        self.compile_workers = 1
+
+        ### Compiled state, with the changes made since it was compiled ###
+        # the substituted objective and (unweighted) constraint parts that make up BQM
+        self._objective_part = None
+        self._constraint_part = None
+        self._compiled_penalty_weight = None
+        # (term or discrete variable, +1 added / -1 removed)
+        self._pending_objective = []
+        self._pending_constraint = []
+        self._removed_variables = []
+        self._value_slot_tables = None
+        # coefficients of terms added through the streaming methods, which are not kept
+        self._streamed_objective = StreamedCoefficients()
+        self._streamed_constraint = StreamedCoefficients()
+        # columns of the compiled models of a loaded Problem, built into BQMs when first used
+        self._stored_models = None
+        # set by enable_instrumentation, None keeps compute_bqm free of bookkeeping
+        self.instrumentation = None
+        # (label, label) -> label of the ancilla standing for their product, and the terms of
+        # degree above two added since the last quadratize
+        self._ancilla_pairs = {}
+        self._unreduced_terms = []
+
+        for variable in discrete_variables or []:
+            self.add_variable(variable)
+        for ancilla in ancillary_variables or []:
+            self.add_ancillary_variable(ancilla)
 
     @property
     def active_binary_variables(self):
@@ -22,85 +65,568 @@ class Problem:
                 for discrete_variable in self.discrete_variables
                 for binary_variable in discrete_variable.binary_variables
                 if not binary_variable.virtual
-                ]
+                ] + self.ancillary_variables
 
     @property
     def objective_bqm(self):
+        self._materialize()
+        if self._objective_bqm is None:
+            self._objective_bqm = dimod.BQM(vartype='BINARY')
         return self._objective_bqm
 
     def compute_objective_bqm(self):
-        self._objective_bqm = BQM(vartype='BINARY')
-        for objective_term in self.objective_terms:
-            self._objective_bqm.update(objective_term.BQM)
+        from dw_util.parallel import emit_all
+
+        accumulator = emit_all(self.objective_terms, len(self.registry), self.compile_workers)
+        accumulator.merge(self._streamed_objective.total)
+        self._objective_bqm = accumulator.to_bqm()
 
     @property
     def constraint_bqm(self):
+        self._materialize()
+        if self._constraint_bqm is None:
+            self._constraint_bqm = dimod.BQM(vartype='BINARY')
         return self._constraint_bqm
 
     def compute_constraint_bqm(self):
-        self._constraint_bqm = BQM(vartype='BINARY')
-        for variable in self.discrete_variables:
-            self._constraint_bqm.update(variable.BQM)
-        for constraint_term in self.constraint_terms:
-            self._constraint_bqm.update(constraint_term.BQM)
+        from dw_util.parallel import emit_all
+
+        accumulator = emit_all(self.discrete_variables + self.constraint_terms, len(self.registry), self.compile_workers)
+        accumulator.merge(self._streamed_constraint.total)
+        self._constraint_bqm = accumulator.to_bqm()
 
     def substitute_domain_wall_variables(self):
+        from dw_util.standalone import substitute_bqm_variables
+
         for variable in self.discrete_variables:
             if variable.encoding_type == "domain-wall":
                 for binary_variable in variable.one_hot_variable_list:
                     left, right = binary_variable.dw_neigbours
                     self._BQM = substitute_bqm_variables(
                         self._BQM, 
-                        binary_variable,
-                        {left: -1, right: 1}
+                        binary_variable.index,
+                        {left.index: -1, right.index: 1}
                     )
         
+    def domain_wall_substitutions(self, labels = None):
+        '''
+        The one-hot to domain wall map x_i = d_{i+1} - d_i, and the fixed start and end variables.
+        If labels are given only the substitutions those variables need are returned.
+        '''
+        substitutions, fixed = {}, {}
+        if labels is None:
+            for variable in self.discrete_variables:
+                if variable.encoding_type == "domain-wall":
+                    for binary_variable in variable.one_hot_variable_list:
+                        left, right = binary_variable.dw_neigbours
+                        substitutions[binary_variable.index] = {left.index: -1, right.index: 1}
+                    fixed[variable.domain_wall_variable_list[0].index] = 0
+                    fixed[variable.domain_wall_variable_list[-1].index] = 1
+            return substitutions, fixed
+        for label in labels:
+            binary_variable = self.registry[label]
+            parent = binary_variable.parent_variable
+            if parent is None or parent.encoding_type != "domain-wall":
+                continue
+            if binary_variable.role == "one-hot":
+                walls = binary_variable.dw_neigbours
+                substitutions[label] = {walls[0].index: -1, walls[1].index: 1}
+            else:
+                walls = [binary_variable]
+            for wall in walls:
+                if wall.virtual:
+                    fixed[wall.index] = 0 if wall.position == 0 else 1
+        return substitutions, fixed
+
+    def substitute_domain_wall_variables_sparse(self, bqm, labels = None):
+        '''Substitute the domain wall variables of a BQM and fix the ends as a single sparse transform'''
+        from dw_util.standalone import linear_substitute_bqm
+
+        substitutions, fixed = self.domain_wall_substitutions(labels)
+        return linear_substitute_bqm(bqm, substitutions, fixed)
+
     def fix_ends(self):
         for variable in self.discrete_variables:
             if variable.encoding_type == "domain-wall":
                 start = variable.domain_wall_variable_list[0]
                 end = variable.domain_wall_variable_list[-1]
                 assert 'start' in start.name and 'end' in end.name, "The start and end variables are not the first and last in the domain wall variable list, something has gone wrong"
-                self._BQM.fix_variable(start, 0)
-                self._BQM.fix_variable(end, 1)
+                self._BQM.fix_variable(start.index, 0)
+                self._BQM.fix_variable(end.index, 1)
 
     def kill_impossible_terms(self):
         """
         If the variable penalties are satisfied, these evaluate to zero anyway and can be removed
         """
-        for discrete_variable in self.discrete_variables:
-            for b1, b2 in comb(discrete_variable.one_hot_variable_list, 2):
-                if self._objective_bqm.get_quadratic(b1, b2, default=0) != 0:
-                    self._objective_bqm.remove_interaction(b1, b2)
-
-    def compute_bqm(self):
-        self.compute_objective_bqm()
-        self.compute_constraint_bqm()
-        self.kill_impossible_terms()
-        self._BQM = self._objective_bqm 
-        + self.penalty_weight * self._constraint_bqm
-        self.substitute_domain_wall_variables()
-        self.fix_ends()
-        self.verify_bqm()
-
-    def verify_bqm(self):
-        # Check that all variables in both BQMs are in active_binary_variables
-        bqm_vars = self.BQM.variables
-        invalid_vars = bqm_vars - self.active_binary_variables
-        assert not invalid_vars, f"Found variables in BQMs that are not in active_binary_variables:\nBQM: {invalid_vars}"
+        self._kill_impossible_interactions(self._objective_bqm)
+
+    def _kill_impossible_interactions(self, bqm):
+        '''Remove the couplers between one-hot variables of the same discrete variable, looking only at the couplers bqm has'''
+        if not bqm.num_interactions:
+            return
+        one_hot_labels = self.value_slot_tables()[0]
+        owner = np.full(len(self.registry), -1, dtype=np.int64)
+        owner[one_hot_labels[one_hot_labels >= 0]] = np.nonzero(one_hot_labels >= 0)[0]
+        labels = np.fromiter(bqm.variables, dtype=np.int64, count=bqm.num_variables)
+        _, (rows, cols, _), _ = bqm.to_numpy_vectors(variable_order=labels.tolist())
+        u, v = labels[rows], labels[cols]
+        same = (owner[u] >= 0) & (owner[u] == owner[v])
+        bqm.remove_interactions_from(zip(u[same].tolist(), v[same].tolist()))
+
+    @property
+    def is_dirty(self):
+        '''Whether anything has changed since the BQM was last compiled'''
+        return (
+            (self._BQM is None and self._stored_models is None)
+            or bool(self._pending_objective or self._pending_constraint or self._removed_variables)
+            or self._streamed_objective.has_pending or self._streamed_constraint.has_pending
+            or self.penalty_weight != self._compiled_penalty_weight
+        )
+
+    def enable_instrumentation(self, on_stage = None, on_compile = None):
+        '''
+        Record the wall time, counts and model sizes of every stage of compute_bqm in
+        compile_stats. on_stage callbacks get each StageRecord as it finishes and on_compile
+        callbacks the CompileStats at the end of each compile.
+        '''
+        self.instrumentation = Instrumentation(on_stage, on_compile)
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+
+    @property
+    def compile_stats(self):
+        '''The CompileStats of the last compile, None unless instrumentation is enabled'''
+        return self.instrumentation.stats if self.instrumentation is not None else None
+
+    def _stage(self, name: str):
+        if self.instrumentation is None:
+            return NULL_STAGE
+        return self.instrumentation.stage(self, name)
+
+    def compute_bqm(self, incremental: bool = True):
+        '''
+        Compile the BQM. Once compiled, only the terms and variables added or removed since are
+        compiled and patched into the model, and a new penalty_weight just rescales the cached
+        constraint part. Pass incremental=False to rebuild everything.
+        '''
+        self._materialize()
+        full = not incremental or self._objective_part is None or self.substitution_mode != "sparse"
+        if self.instrumentation is not None:
+            self.instrumentation.start("full" if full else "incremental")
+        if self._unreduced_terms:
+            with self._stage("quadratize") as stage:
+                result = self.quadratize()
+                stage.count("terms", result.terms)
+                stage.count("ancillas", len(result.ancillas))
+        if self.penalty_weight < 1 and self._has_product_ancillas():
+            raise ValueError(f"Penalty weights below 1 do not keep the optimum of a quadratized Problem, got {self.penalty_weight}")
+        if full:
+            self._compile_all()
+        else:
+            self._compile_changes()
+        self._clear_pending()
+        if self.penalty_weight != self._compiled_penalty_weight:
+            with self._stage("reweight"):
+                self._BQM = self._objective_part + self.penalty_weight * self._constraint_part
+            self._compiled_penalty_weight = self.penalty_weight
+        if self.instrumentation is not None:
+            self.instrumentation.finish()
+
+    def _compile_all(self):
+        from dw_util.standalone import linear_substitute_bqm
+
+        with self._stage("compute_objective_bqm") as stage:
+            self.compute_objective_bqm()
+            stage.count("terms", len(self.objective_terms))
+        with self._stage("compute_constraint_bqm") as stage:
+            self.compute_constraint_bqm()
+            stage.count("terms", len(self.constraint_terms))
+            stage.count("variables", len(self.discrete_variables))
+        with self._stage("kill_impossible_terms") as stage:
+            interactions = self._objective_bqm.num_interactions
+            self.kill_impossible_terms()
+            stage.count("removed_interactions", interactions - self._objective_bqm.num_interactions)
+        self._compiled_penalty_weight = self.penalty_weight
+        if self.substitution_mode == "sparse":
+            with self._stage("substitution") as stage:
+                substitutions, fixed = self.domain_wall_substitutions()
+                self._objective_part = linear_substitute_bqm(self._objective_bqm, substitutions, fixed)
+                self._constraint_part = linear_substitute_bqm(self._constraint_bqm, substitutions, fixed)
+                stage.count("substitutions", len(substitutions))
+                stage.count("fixed", len(fixed))
+            with self._stage("combine"):
+                self._BQM = self._objective_part + self.penalty_weight * self._constraint_part
+        elif self.substitution_mode == "sequential":
+            self._objective_part = self._constraint_part = None
+            with self._stage("combine"):
+                self._BQM = self._objective_bqm + self.penalty_weight * self._constraint_bqm
+            with self._stage("substitution"):
+                self.substitute_domain_wall_variables()
+            with self._stage("fix_ends"):
+                self.fix_ends()
+        else:
+            raise ValueError(f"Unknown substitution mode {self.substitution_mode}")
+        with self._stage("verify_bqm"):
+            self.verify_bqm()
+
+    def _compile_pending(self, pending, streamed):
+        '''The BQM of the coefficients added minus the coefficients removed by pending changes'''
+        added = CoefficientAccumulator(num_variables=len(self.registry))
+        removed = CoefficientAccumulator(num_variables=len(self.registry))
+        for item, sign in pending:
+            item.emit(added if sign > 0 else removed)
+        added.merge(streamed.take_pending())
+        delta = added.to_bqm()
+        delta.update(-removed.to_bqm())
+        return delta
+
+    def _compile_changes(self):
+        '''
+        Substitution is affine, so the substituted model of a sum is the sum of the substituted
+        models, and each change can be substituted on its own and added to the cached parts.
+        '''
+        from dw_util.standalone import drop_zero_interactions
+
+        with self._stage("compile_pending") as stage:
+            objective_delta = self._compile_pending(self._pending_objective, self._streamed_objective)
+            constraint_delta = self._compile_pending(self._pending_constraint, self._streamed_constraint)
+            stage.count("objective_changes", len(self._pending_objective))
+            stage.count("constraint_changes", len(self._pending_constraint))
+            stage.count("interactions", objective_delta.num_interactions + constraint_delta.num_interactions)
+        with self._stage("kill_impossible_terms"):
+            self._kill_impossible_interactions(objective_delta)
+        with self._stage("substitution") as stage:
+            objective_delta_part = self.substitute_domain_wall_variables_sparse(objective_delta, objective_delta.variables)
+            constraint_delta_part = self.substitute_domain_wall_variables_sparse(constraint_delta, constraint_delta.variables)
+            stage.count("interactions", objective_delta_part.num_interactions + constraint_delta_part.num_interactions)
+
+        with self._stage("patch"):
+            for bqm, delta in [
+                (self._objective_bqm, objective_delta),
+                (self._constraint_bqm, constraint_delta),
+                (self._objective_part, objective_delta_part),
+                (self._constraint_part, constraint_delta_part),
+            ]:
+                bqm.update(delta)
+                drop_zero_interactions(bqm, delta.quadratic)
+            if self.penalty_weight == self._compiled_penalty_weight:
+                self._BQM.update(objective_delta_part)
+                self._BQM.update(self.penalty_weight * constraint_delta_part)
+                drop_zero_interactions(self._BQM, objective_delta_part.quadratic)
+                drop_zero_interactions(self._BQM, constraint_delta_part.quadratic)
+
+        with self._stage("remove_variables") as stage:
+            removed_labels = [
+                binary_variable.index
+                for variable in self._removed_variables
+                for binary_variable in variable.all_binary_variables
+            ]
+            for bqm in [self._objective_bqm, self._constraint_bqm, self._objective_part, self._constraint_part, self._BQM]:
+                for label in removed_labels:
+                    if label in bqm.variables:
+                        bqm.remove_variable(label)
+            stage.count("variables", len(self._removed_variables))
+        with self._stage("verify_bqm"):
+            self.verify_bqm(list(objective_delta_part.variables) + list(constraint_delta_part.variables))
+
+    def _invalidate_compiled(self):
+        '''Drop the compiled state, so the next compute_bqm compiles from scratch'''
+        self._BQM = self._objective_part = self._constraint_part = None
+        self._stored_models = None
+        self._value_slot_tables = None
+
+    def _clear_pending(self):
+        self._pending_objective = []
+        self._pending_constraint = []
+        self._removed_variables = []
+        self._streamed_objective.take_pending()
+        self._streamed_constraint.take_pending()
+
+    def _has_product_ancillas(self):
+        '''Whether quadratize added ancillas, whose penalties are only sized for penalty_weight >= 1'''
+        return any(isinstance(ancilla.represents, tuple) for ancilla in self.ancillary_variables)
+
+    @staticmethod
+    def _is_active(binary_variable):
+        if binary_variable.role == "ancilla":
+            return True
+        parent = binary_variable.parent_variable
+        return not binary_variable.virtual and parent is not None and binary_variable.role == parent.encoding_type
+
+    def verify_bqm(self, labels = None):
+        # Check that all variables in the BQM are in active_binary_variables, or just the given labels
+        if labels is None:
+            invalid_vars = self.BQM.variables - {variable.index for variable in self.active_binary_variables}
+        else:
+            invalid_vars = {label for label in labels if not self._is_active(self.registry[label])}
+        assert not invalid_vars, f"Found variables in BQMs that are not in active_binary_variables:\nBQM: {[self.registry[i] for i in invalid_vars]}"
 
     @property
     def BQM(self):
+        self._materialize()
         return self._BQM
 
+    def _materialize(self):
+        if self._stored_models is None:
+            return
+        from dw_util.storage import COMPILED_MODELS, columns_to_bqm
+
+        for name, columns in self._stored_models.items():
+            setattr(self, COMPILED_MODELS[name], columns_to_bqm(columns))
+        self._stored_models = None
+
+    def save(self, path):
+        '''
+        Compile if needed and write the compiled models and variables to the directory path,
+        as columns of .npy files that load memory maps.
+        '''
+        from dw_util.storage import save_problem
+
+        save_problem(self, path)
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> 'Problem':
+        '''
+        Read a Problem written by save. The variables and compiled models come back with the
+        same integer labels, so samples of the saved BQM can be evaluated. Terms are not kept:
+        their coefficients are folded into the model, and new terms can be added as usual.
+        '''
+        from dw_util.storage import load_problem
+
+        return load_problem(cls, path, mmap)
+
+    def evaluate(self, samples, labels = None, atol: float = 1e-9):
+        '''
+        Decode and score a whole batch of reads at once. samples is a dimod SampleSet or an
+        (n_reads x n_vars) array whose columns follow labels, by default the variables of the
+        compiled BQM. Returns an Evaluation with the decoded values, objective and penalty
+        energies and a per-constraint violation mask, penalties within atol (relative to the
+        constraint's coefficients) of zero counting as satisfied.
+        '''
+        from dw_util.evaluate import evaluate
+
+        return evaluate(self, samples, labels, atol)
+
+    def sweep_penalty(self, weights, sampler, num_reads: int = 100, max_workers: int = None, **sampler_kwargs):
+        '''
+        Sample objective + weight * constraint for each weight in parallel worker processes and
+        report the feasibility rate and best feasible energy of each. The model parts are
+        compiled once and shared with the workers through shared memory. sampler must be
+        picklable, e.g. a simulated annealing sampler. A quadratized Problem needs weights of
+        at least 1, see quadratize.
+        '''
+        from dw_util.sweep import sweep_penalty
+
+        return sweep_penalty(self, weights, sampler, num_reads, max_workers, **sampler_kwargs)
+
+    def optimize_domain_orders(self, max_passes: int = 10) -> 'OrderingResult':
+        '''
+        Reorder the domains of the domain wall variables to minimise the couplers of the
+        compiled BQM, which is recompiled. Variables whose domain wall variables appear in terms
+        directly keep their order. Returns the coupler counts before and after.
+        '''
+        from dw_util.ordering import optimize_domain_orders
+
+        return optimize_domain_orders(self, max_passes)
+
+    def presolve(self, atol: float = 1e-9, use_roof_duality: bool = True, drop_dominated: bool = True) -> 'Presolved':
+        '''
+        A reduced copy of the compiled BQM for sampling, with near-zero biases, dominated domain
+        values and persistent variables removed. Its postsolve method turns samples of the
+        reduced model into samples of BQM, which evaluate decodes as usual.
+        '''
+        from dw_util.presolve import presolve
+
+        return presolve(self, atol, use_roof_duality, drop_dominated)
+
+    def to_sparse(self, format: str = "qubo", dtype = "float64"):
+        '''
+        The compiled model as (Q, linear, offset, labels) for solvers outside dimod: Q an upper
+        triangular scipy CSR matrix of the couplers, linear a vector, so the energy of x is
+        linear @ x + x @ Q @ x + offset, and labels the BQM label (registry index) of every
+        column, see variable(). format="ising" gives the same model over spins, and dtype
+        float32 halves the memory. A loaded Problem is exported straight from its mapped arrays.
+        Otherwise the compiled BQM is read with one to_numpy_vectors call: the compile buffers
+        hold the terms before domain wall substitution and weighting, not this model, so they
+        cannot be exported directly.
+        '''
+        from dw_util.standalone import sparse_model
+        from dw_util.storage import bqm_columns
+
+        if self._stored_models is not None and not self.is_dirty:
+            labels, linear, rows, cols, biases, offset = self._stored_models["BQM"]
+        else:
+            self.compute_bqm()
+            (labels, linear, rows, cols, biases), offset = bqm_columns(self._BQM)
+        matrix, linear, offset = sparse_model(linear, rows, cols, biases, offset, format, dtype)
+        return matrix, linear, offset, np.asarray(labels)
+
+    def repair(self, samples, labels = None, descent: bool = False, max_sweeps: int = 100):
+        '''
+        Map broken reads to the nearest valid encoding of every discrete variable, and with
+        descent=True improve them greedily from there. Returns a SampleSet over BQM.
+        '''
+        from dw_util.repair import repair
+
+        return repair(self, samples, labels, descent, max_sweeps)
+
+    def local_state(self, sample = None) -> 'LocalState':
+        '''
+        A LocalState over a CSR view of the compiled BQM, for local search: O(degree) flips and
+        discrete value changes and batched deltas. sample maps BQM labels to values, or is an
+        array in the order of BQM.variables; all zeros by default.
+        '''
+        from dw_util.delta import AdjacencyModel, LocalState
+
+        return LocalState(AdjacencyModel(self), sample)
+
+    def variable(self, label: int) -> 'BinaryVariable':
+        '''The binary variable behind an integer BQM label'''
+        return self.registry[label]
+
     def add_variable(self, variable: 'DiscreteVariable'):
         self.discrete_variables.append(variable)
+        self._value_slot_tables = None
+        for binary_variable in variable.all_binary_variables:
+            self.registry.register(binary_variable)
+        self._pending_constraint.append((variable, 1))
+
+    def remove_variable(self, variable: 'DiscreteVariable'):
+        '''
+        Remove a discrete variable, any terms using it should be removed as well. Streamed
+        coefficients cannot be removed term by term, so those of the variable are dropped here.
+        '''
+        self.discrete_variables.remove(variable)
+        labels = [binary_variable.index for binary_variable in variable.all_binary_variables]
+        self._streamed_objective.drop_variables(labels)
+        self._streamed_constraint.drop_variables(labels)
+        self._value_slot_tables = None
+        self._pending_constraint.append((variable, -1))
+        self._removed_variables.append(variable)
 
     def add_objective_term(self, term):
         self.objective_terms.append(term)
+        self._pending_objective.append((term, 1))
+        if getattr(term, "degree", 0) > 2:
+            self._unreduced_terms.append(term)
+
+    def add_ancillary_variable(self, ancilla: 'BinaryVariable'):
+        '''
+        Register a binary variable that belongs to no discrete variable. An ancilla that
+        represents a pair of binary variables stands for their product and is reused for it.
+        '''
+        if ancilla.role is None:
+            ancilla.role = "ancilla"
+        self.registry.register(ancilla)
+        self.ancillary_variables.append(ancilla)
+        if isinstance(ancilla.represents, tuple):
+            u, v = sorted(binary_variable.index for binary_variable in ancilla.represents)
+            self._ancilla_pairs[(u, v)] = ancilla.index
+
+    def quadratize(self) -> 'QuadratizationResult':
+        '''
+        Reduce the terms of degree above two added since the last call to quadratic form. The
+        pair of binary variables shared by the most such terms is replaced by an ancilla, with
+        the Rosenberg penalty s * (x y - 2 x a - 2 y a + 3 a) added as a constraint term, until
+        no term is above degree two; pairs that already have an ancilla keep it. s is the sum
+        of the absolute coefficients the ancilla stands in for, which keeps the minimum energy
+        for penalty_weight >= 1 only, so compute_bqm refuses a lower weight once there are
+        ancillas. Indicators of domain wall variables are first expanded over
+        their walls, and products of two values of one discrete variable are dropped.
+        compute_bqm calls this when needed. Returns a QuadratizationResult.
+        '''
+        terms, self._unreduced_terms = self._unreduced_terms, []
+        return quadratize(self, terms)
+
+    def value_slot_tables(self):
+        '''
+        For every discrete variable, by position in discrete_variables: the labels of its one-hot
+        variables by slot (padded with -1), and a sorted lookup from variable position and value
+        id to slot. Cached until a variable is added or removed.
+        '''
+        if self._value_slot_tables is None:
+            width = max((len(variable.domain) for variable in self.discrete_variables), default=0)
+            one_hot_labels = np.full((len(self.discrete_variables), width), -1, dtype=np.int64)
+            value_ids = np.full((len(self.discrete_variables), width), -1, dtype=np.int64)
+            ids = {}
+            for position, variable in enumerate(self.discrete_variables):
+                for slot, binary_variable in enumerate(variable.one_hot_variable_list):
+                    one_hot_labels[position, slot] = binary_variable.index
+                    value_ids[position, slot] = ids.setdefault(binary_variable.represents, len(ids))
+            positions, slots = np.nonzero(value_ids >= 0)
+            keys = positions * max(len(ids), 1) + value_ids[positions, slots]
+            order = np.argsort(keys)
+            self._value_slot_tables = (one_hot_labels, value_ids, keys[order], slots[order], max(len(ids), 1))
+        return self._value_slot_tables
+
+    def add_not_equal_edges(self, edges, weight: float = 1) -> 'NotEqualEdges':
+        '''
+        Add weight to the objective for every edge (a, b) whose discrete variables, given by their
+        position in discrete_variables, take the same value. edges is an (E x 2) integer array and
+        all the couplers are found with array operations, without a term object per edge.
+        '''
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        rows, cols = self._not_equal_couplers(edges)
+        term = NotEqualEdges(rows, cols, weight, self.registry, num_edges=len(edges))
+        self.add_objective_term(term)
+        return term
+
+    def _not_equal_couplers(self, edges: 'np.ndarray'):
+        '''Labels of the one-hot variable pairs representing the same value at the two ends of each edge'''
+        one_hot_labels, value_ids, keys, key_slots, num_values = self.value_slot_tables()
+        a, b = edges[:, 0], edges[:, 1]
+        ### For every slot of a, look up the slot of b representing the same value ###
+        wanted = b[:, None] * num_values + value_ids[a]
+        found = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+        match = (value_ids[a] >= 0) & (keys[found] == wanted) if len(keys) else np.zeros(wanted.shape, dtype=bool)
+        return one_hot_labels[a][match], one_hot_labels[b[:, None], key_slots[found]][match]
+
+    def _stream_terms(self, terms, streamed: StreamedCoefficients, chunk_size: int):
+        for chunk in chunked(terms, chunk_size):
+            quadratize(self, [term for term in chunk if getattr(term, "degree", 0) > 2 and term.reduced is None])
+            accumulator = CoefficientAccumulator(capacity=4 * len(chunk), num_variables=len(self.registry))
+            for term in chunk:
+                term.emit(accumulator)
+            streamed.fold(accumulator)
+
+    def add_objective_terms(self, terms, chunk_size: int = 10_000):
+        '''
+        Fold terms from any iterable, e.g. a generator, into the objective a chunk at a time.
+        The terms are not kept, so memory follows the size of the model rather than the number
+        of terms, but they cannot be removed again.
+        '''
+        self._stream_terms(terms, self._streamed_objective, chunk_size)
+
+    def add_constraint_terms(self, terms, chunk_size: int = 10_000):
+        '''add_objective_terms for constraint terms'''
+        self._stream_terms(terms, self._streamed_constraint, chunk_size)
+
+    def stream_not_equal_edges(self, edges, weight: float = 1, chunk_size: int = 100_000):
+        '''
+        add_not_equal_edges for edges that do not fit in memory at once. edges is a path to a
+        CSV or .npy file of index pairs (read lazily), an (E x 2) array or an iterable of such
+        arrays. The couplers of each chunk are folded straight into the objective.
+        '''
+        for chunk in iter_edge_source(edges, chunk_size):
+            rows, cols = self._not_equal_couplers(chunk)
+            accumulator = CoefficientAccumulator(capacity=len(rows), num_variables=len(self.registry))
+            accumulator.add_quadratic_from_arrays(rows, cols, weight)
+            self._streamed_objective.fold(accumulator)
+
+    def remove_objective_term(self, term):
+        self.objective_terms.remove(term)
+        self._pending_objective.append((term, -1))
 
     def add_constraint_term(self, term):
         self.constraint_terms.append(term)
+        self._pending_constraint.append((term, 1))
+        if getattr(term, "degree", 0) > 2:
+            self._unreduced_terms.append(term)
+
+    def remove_constraint_term(self, term):
+        self.constraint_terms.remove(term)
+        self._pending_constraint.append((term, -1))
 
     def __repr__(self):
         variables_str = "\n".join(
@@ -124,9 +650,12 @@ class ConstantTerm(AbstractTerm):
 
     @property
     def BQM(self):
-        bqm = BQM(vartype='BINARY')
+        bqm = dimod.BQM(vartype='BINARY')
         bqm.offset += self.coefficient
         return bqm
+
+    def emit(self, accumulator):
+        accumulator.add_offset(self.coefficient)
         
     def __mul__(self, other):
         if isinstance(other, (int, float)):
@@ -145,6 +674,8 @@ class ConstantTerm(AbstractTerm):
                 self.coefficient * other.coefficient,
                 description=f"{self.description} * {other.description}"
             )
+        elif isinstance(other, (BinaryQuadraticTerm, BinaryPolynomialTerm)):
+            return other * self.coefficient
         else:
             return NotImplemented
 
@@ -165,11 +696,14 @@ class BinaryLinearTerm(AbstractTerm):
 
     @property
     def BQM(self):
-        bqm = BQM(vartype='BINARY')
+        bqm = dimod.BQM(vartype='BINARY')
         bqm.add_variable(self.variables[0])
         bqm.add_linear(self.variables[0], self.coefficient)
         return bqm
 
+    def emit(self, accumulator):
+        accumulator.add_linear(self.variables[0].index, self.coefficient)
+
     def __mul__(self, other):
         if isinstance(other, (int, float)):
             return BinaryLinearTerm(self.variables, self.coefficient * other)
@@ -180,6 +714,8 @@ class BinaryLinearTerm(AbstractTerm):
                 return BinaryQuadraticTerm(self.variables + other.variables, self.coefficient * other.coefficient)
             else:
                 return BinaryLinearTerm(self.variables, self.coefficient ** 2)
+        elif isinstance(other, (BinaryQuadraticTerm, BinaryPolynomialTerm)):
+            return BinaryPolynomialTerm(self.variables + other.variables, self.coefficient * other.coefficient)
         else:
             return NotImplemented
 
@@ -198,18 +734,120 @@ class BinaryQuadraticTerm(AbstractTerm):
 
     @property
     def BQM(self):
-        bqm = BQM(vartype='BINARY')
+        bqm = dimod.BQM(vartype='BINARY')
         bqm.add_variable(self.variables[0])
         bqm.add_variable(self.variables[1])
         bqm.add_quadratic(self.variables[0], self.variables[1], self.coefficient)
         return bqm
 
+    def emit(self, accumulator):
+        accumulator.add_quadratic(self.variables[0].index, self.variables[1].index, self.coefficient)
+
     def __mul__(self, other):
-        if isinstance(other, (int, float, ConstantTerm)):
+        if isinstance(other, (int, float)):
             return BinaryQuadraticTerm(self.variables, self.coefficient * other)
+        elif isinstance(other, ConstantTerm):
+            return BinaryQuadraticTerm(self.variables, self.coefficient * other.coefficient)
+        elif isinstance(other, (BinaryLinearTerm, BinaryQuadraticTerm, BinaryPolynomialTerm)):
+            return BinaryPolynomialTerm(self.variables + other.variables, self.coefficient * other.coefficient)
+        else:
+            return NotImplemented
+
+class BinaryPolynomialTerm(AbstractTerm):
+    '''
+    The product of any number of binary variables times a coefficient, e.g. of the indicators
+    of several discrete variables. A variable repeated counts once, as x * x = x. Terms of
+    degree above two compile through the ancillas Problem.quadratize gives them: reduced then
+    holds the product as (labels, coefficient) monomials of degree up to two.
+    '''
+    def __init__(self, variables: list['BinaryVariable'], coefficient: int = 1, description: str = "polynomial"):
+        unique = list({id(variable): variable for variable in variables}.values())
+        super().__init__(unique, coefficient, description=description)
+        self.reduced = None
+
+    @property
+    def degree(self):
+        return len(self.variables)
+
+    @property
+    def value(self):
+        product = self.coefficient
+        for variable in self.variables:
+            product *= variable.value
+        return product
+
+    @property
+    def BQM(self):
+        if self.degree > 2:
+            raise ValueError(f"{self} has degree {self.degree}, it only has a BQM once compiled by a Problem")
+        accumulator = CoefficientAccumulator()
+        if self.degree == 2:
+            accumulator.add_quadratic(self.variables[0], self.variables[1], self.coefficient)
+        elif self.degree == 1:
+            accumulator.add_linear(self.variables[0], self.coefficient)
+        else:
+            accumulator.add_offset(self.coefficient)
+        return accumulator.to_bqm()
+
+    def emit(self, accumulator):
+        monomials = self.reduced
+        if monomials is None:
+            if self.degree > 2:
+                raise ValueError(f"{self} has degree {self.degree}, call Problem.quadratize first")
+            monomials = [([variable.index for variable in self.variables], self.coefficient)]
+        for labels, coefficient in monomials:
+            if len(labels) == 2:
+                accumulator.add_quadratic(labels[0], labels[1], coefficient)
+            elif len(labels) == 1:
+                accumulator.add_linear(labels[0], coefficient)
+            else:
+                accumulator.add_offset(coefficient)
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return BinaryPolynomialTerm(self.variables, self.coefficient * other)
+        elif isinstance(other, ConstantTerm):
+            return BinaryPolynomialTerm(self.variables, self.coefficient * other.coefficient)
+        elif isinstance(other, (BinaryLinearTerm, BinaryQuadraticTerm, BinaryPolynomialTerm)):
+            return BinaryPolynomialTerm(self.variables + other.variables, self.coefficient * other.coefficient)
         else:
             return NotImplemented
 
+class AncillaConstraint(AbstractTerm):
+    '''
+    The Rosenberg penalty coefficient * (x y - 2 x a - 2 y a + 3 a) tying an ancilla a to the
+    product of the pair x, y it represents: zero when a = x y and at least coefficient if not.
+    '''
+    def __init__(self, ancilla: 'BinaryVariable', coefficient: float = 1, description: str = "ancilla"):
+        x, y = ancilla.represents
+        super().__init__([x, y, ancilla], coefficient, is_constraint=True, description=description)
+
+    @property
+    def value(self):
+        x, y, a = (variable.value for variable in self.variables)
+        return self.coefficient * (x * y - 2 * x * a - 2 * y * a + 3 * a)
+
+    @property
+    def satisfied(self):
+        return self.value == 0
+
+    @property
+    def BQM(self):
+        x, y, a = self.variables
+        bqm = dimod.BQM(vartype='BINARY')
+        bqm.add_quadratic(x, y, self.coefficient)
+        bqm.add_quadratic(x, a, -2 * self.coefficient)
+        bqm.add_quadratic(y, a, -2 * self.coefficient)
+        bqm.add_linear(a, 3 * self.coefficient)
+        return bqm
+
+    def emit(self, accumulator):
+        x, y, a = (variable.index for variable in self.variables)
+        accumulator.add_quadratic(x, y, self.coefficient)
+        accumulator.add_quadratic(x, a, -2 * self.coefficient)
+        accumulator.add_quadratic(y, a, -2 * self.coefficient)
+        accumulator.add_linear(a, 3 * self.coefficient)
+
 class Collection(AbstractCollection):
     def __init__(self, terms: list[AbstractTerm]):
         super().__init__(terms)
@@ -245,30 +883,109 @@ class NotEqualTerm(AbstractTerm):
     def BQM(self):
         return sum([sub_term.BQM for sub_term in self._sub_terms])
 
+    def emit(self, accumulator):
+        for sub_term in self._sub_terms:
+            sub_term.emit(accumulator)
+
     def __str__(self):
         return f"{self.variables[0].name} != {self.variables[1].name}"
     
     def __repr__(self):
         return self.__str__()
 
-class OneHotConstraint(AbstractTerm):
-    """A constraint that is satisfied if the variables are one hot encoded"""
-    def __init__(self, discrete_variable: 'DiscreteVariable', description: str = "one-hot"):
-        super().__init__(discrete_variable.binary_variables, 1, is_constraint=True, description=description)
-        self.discrete_variable = discrete_variable
-        linear_terms = [BinaryLinearTerm([binary_variable]) for binary_variable in discrete_variable.binary_variables] + [ConstantTerm(-1)]
-        self.collection = Collection(linear_terms) ** 2
+class NotEqualEdges(AbstractTerm):
+    '''
+    A whole graph of NotEqualTerm's held as two arrays of one-hot labels, the couplers between
+    binary variables representing the same value at either end of an edge. Made by
+    Problem.add_not_equal_edges, it is one object however many edges there are.
+    '''
+    def __init__(self, rows: 'np.ndarray', cols: 'np.ndarray', coefficient: float, registry, num_edges: int, description: str = "not equal edges"):
+        super().__init__([], coefficient, is_constraint=True, description=description)
+        self.rows = rows
+        self.cols = cols
+        self.registry = registry
+        self.num_edges = num_edges
+
+    @property
+    def value(self):
+        '''coefficient times the number of edges whose ends take the same value'''
+        return self.coefficient * sum(
+            self.registry[u].value * self.registry[v].value for u, v in zip(self.rows.tolist(), self.cols.tolist())
+        )
+
+    @property
+    def BQM(self):
+        bqm = dimod.BQM(vartype='BINARY')
+        for u, v in zip(self.rows.tolist(), self.cols.tolist()):
+            bqm.add_quadratic(self.registry[u], self.registry[v], self.coefficient)
+        return bqm
+
+    def emit(self, accumulator):
+        accumulator.add_quadratic_from_arrays(self.rows, self.cols, self.coefficient)
+
+    def __str__(self):
+        return f"{self.description} | coeff: {self.coefficient} | {self.num_edges} edges, {len(self.rows)} couplers"
+
+class LinearEqualityConstraint(AbstractTerm):
+    '''
+    A constraint that sum(coefficients * variables) == rhs, penalised by the square of the
+    difference. For binary x the expansion is closed form: a_i^2 - 2 rhs a_i on the linear
+    terms, 2 a_i a_j on every pair and rhs^2 on the offset, so it is written straight into
+    coefficient arrays. Covers one-hot (all ones, rhs 1), k-hot (rhs k) and weighted sums.
+    '''
+    def __init__(self, coefficients, variables: list['BinaryVariable'], rhs: float, coefficient: float = 1, description: str = "linear equality"):
+        super().__init__(variables, coefficient, is_constraint=True, description=description)
+        # plain floats, so that a model can be built without loading NumPy
+        try:
+            self.coefficients = [float(a) for a in coefficients]
+        except TypeError:
+            self.coefficients = [float(coefficients)] * len(variables)
+        self.rhs = rhs
+        assert len(self.coefficients) == len(variables), "LinearEqualityConstraint needs one coefficient per variable"
+
     @property
     def satisfied(self):
-        return self.collection.value == 0
+        return self.value == 0
 
     @property
     def value(self):
-        return self.collection.value
+        total = sum(a * variable.value for a, variable in zip(self.coefficients, self.variables))
+        return self.coefficient * (total - self.rhs) ** 2
+
+    def penalty_arrays(self):
+        '''(linear biases, (first, second, coupler biases), offset) indexed by position in variables'''
+        a = np.asarray(self.coefficients, dtype=np.float64)
+        first, second = np.triu_indices(len(a), 1)
+        linear = self.coefficient * (a * a - 2 * self.rhs * a)
+        quadratic = self.coefficient * 2 * np.outer(a, a)[first, second]
+        return linear, (first, second, quadratic), self.coefficient * self.rhs ** 2
 
     @property
     def BQM(self):
-        return self.collection.BQM
+        linear, (first, second, quadratic), offset = self.penalty_arrays()
+        bqm = dimod.BQM(vartype='BINARY')
+        for variable, bias in zip(self.variables, linear.tolist()):
+            bqm.add_linear(variable, bias)
+        for i, j, bias in zip(first.tolist(), second.tolist(), quadratic.tolist()):
+            if self.variables[i] is self.variables[j]:
+                bqm.add_linear(self.variables[i], bias)
+            else:
+                bqm.add_quadratic(self.variables[i], self.variables[j], bias)
+        bqm.offset += offset
+        return bqm
+
+    def emit(self, accumulator):
+        linear, (first, second, quadratic), offset = self.penalty_arrays()
+        labels = np.fromiter((variable.index for variable in self.variables), dtype=np.int64, count=len(self.variables))
+        accumulator.add_linear_from_arrays(labels, linear)
+        accumulator.add_quadratic_from_arrays(labels[first], labels[second], quadratic)
+        accumulator.add_offset(offset)
+
+class OneHotConstraint(LinearEqualityConstraint):
+    """A constraint that is satisfied if the variables are one hot encoded"""
+    def __init__(self, discrete_variable: 'DiscreteVariable', description: str = "one-hot"):
+        super().__init__(1, discrete_variable.binary_variables, 1, description=description)
+        self.discrete_variable = discrete_variable
 
 class DomainWallConstraint(AbstractTerm):
     """A constraint that is satisfied if the variables are domain wall encoded"""
@@ -284,6 +1001,10 @@ class DomainWallConstraint(AbstractTerm):
     def BQM(self):
         return sum([sub_constraint.BQM for sub_constraint in self.sub_constraints])
 
+    def emit(self, accumulator):
+        for sub_constraint in self.sub_constraints:
+            sub_constraint.emit(accumulator)
+
     @property
     def value(self):
         return sum([sub_constraint.value for sub_constraint in self.sub_constraints])
@@ -309,22 +1030,28 @@ class Forbid10Constraint(AbstractTerm):
 
     @property
     def value(self):
-        return self.coefficient * (self.satisfied)
+        return self.coefficient * (not self.satisfied)
 
     @property
     def BQM(self):
-        bqm = BQM(vartype='BINARY')
+        bqm = dimod.BQM(vartype='BINARY')
         bqm.add_variable(self.variables[0])
         bqm.add_variable(self.variables[1])
         bqm.add_linear(self.variables[0], 1)
         bqm.add_quadratic(self.variables[0], self.variables[1], -1)
         return bqm
 
+    def emit(self, accumulator):
+        accumulator.add_linear(self.variables[0].index, 1)
+        accumulator.add_quadratic(self.variables[0].index, self.variables[1].index, -1)
+
 class DiscreteVariable(AbstractVariable):
     '''
     A generic class representing an integer variable. This will contain the 
     shared attributes of the one-hot and domain wall implementations
     '''
+    __slots__ = ('encoding_type', 'constraint_list', 'one_hot_variable_list', 'domain_wall_variable_list')
+
     def __init__(self, name: str, domain: list = None, encoding_type: str = None, extra_properties: dict = None):
         super().__init__(name, domain, extra_properties)
         self.encoding_type = encoding_type
@@ -334,45 +1061,63 @@ class DiscreteVariable(AbstractVariable):
         if encoding_type == "one-hot":
             self.one_hot_variable_list = [
                 BinaryVariable(
-                    name=f"{self.name} is {value}", 
                     parent_variable=self, 
-                    represents=value
+                    represents=value,
+                    role="one-hot",
+                    position=i
                 ) 
-                for value in self.domain
+                for i, value in enumerate(self.domain)
             ]
             
         if encoding_type == "domain-wall":
-            self.domain_wall_variable_list = []
-            self.permute_domain()
-            extended_domain = ['start'] + self.domain + ['end']
-            for i, value in enumerate(extended_domain[:-1]):
-                self.domain_wall_variable_list.append(
-                    BinaryVariable(
-                        name=f"{self.name} dw[{extended_domain[i]}, {extended_domain[i+1]}]", 
-                        parent_variable=self,
-                        virtual=True if any(x in ['start', 'end'] for x in extended_domain[i:i+2]) else False
-                    ) 
+            ### There is a wall between each neighbouring pair of the domain extended by 'start' and 'end' ###
+            self.domain_wall_variable_list = [
+                BinaryVariable(
+                    parent_variable=self,
+                    virtual=i == 0 or i == len(self.domain),
+                    role="domain-wall",
+                    position=i
                 )
+                for i in range(len(self.domain) + 1)
+            ]
             ### Now we make one hot variables linked to the domain wall variables ###
-            self.one_hot_variable_list = []
-            for i, value in enumerate(self.domain):
-                self.one_hot_variable_list.append(
-                    BinaryVariable(
-                        name=f"{self.name}={value}", 
-                        parent_variable=self, 
-                        represents=value,
-                        extra_properties={'dw_neigbours': self.domain_wall_variable_list[i:i+2]}
-                    ) 
-                )
-            self.virtual_variable_list = self.domain_wall_variable_list[1:-1]
+            self.one_hot_variable_list = [
+                BinaryVariable(
+                    parent_variable=self, 
+                    represents=value,
+                    role="one-hot",
+                    position=i
+                ) 
+                for i, value in enumerate(self.domain)
+            ]
         
         ### Make the constraint list ###
         if encoding_type == "one-hot": self.constraint_list.append(OneHotConstraint(self))
         elif encoding_type == "domain-wall": self.constraint_list.append(DomainWallConstraint(self))
 
 
-    def permute_domain(self):
-        pass
+    def permute_domain(self, order):
+        '''
+        Reorder the domain, order giving the current positions in their new order. The one-hot
+        variables move with their values, so terms on them keep their meaning, while the walls
+        stay in place and come to separate different values. A Problem holding the variable
+        has to be compiled from scratch afterwards, see Problem.optimize_domain_orders.
+        '''
+        order = [int(position) for position in order]
+        if sorted(order) != list(range(len(self.domain))):
+            raise ValueError(f"{order} is not a permutation of the positions of {self.domain}")
+        self.domain = [self.domain[position] for position in order]
+        self.one_hot_variable_list = [self.one_hot_variable_list[position] for position in order]
+        for position, binary_variable in enumerate(self.one_hot_variable_list):
+            binary_variable.position = position
+
+    def indicator(self, value) -> BinaryLinearTerm:
+        '''The term that is 1 when the variable takes value, products of these are polynomial terms'''
+        return BinaryLinearTerm([self.one_hot_variable_list[self.domain.index(value)]])
+
+    @property
+    def virtual_variable_list(self):
+        return self.domain_wall_variable_list[1:-1]
 
     @property
     def binary_variables(self):
@@ -383,6 +1128,13 @@ class DiscreteVariable(AbstractVariable):
         else:
             raise ValueError(f"No binary variables created for {self.name}")
 
+    @property
+    def all_binary_variables(self):
+        '''Every binary variable made for this variable, including the one-hot variables that domain wall encoding substitutes away'''
+        if self.encoding_type == "domain-wall":
+            return self.domain_wall_variable_list + self.one_hot_variable_list
+        return self.binary_variables
+
     @property
     def value(self):
         '''The value that the variable is currently set to, depending on the encoding'''
@@ -397,10 +1149,35 @@ class DiscreteVariable(AbstractVariable):
     def BQM(self):
         return sum([constraint.BQM for constraint in self.constraint_list])
 
+    def emit(self, accumulator):
+        for constraint in self.constraint_list:
+            constraint.emit(accumulator)
+
+
+    def _domain_wall_bits(self):
+        '''Values of the domain wall variables, with the virtual ends fixed at 0 and 1'''
+        return [0] + [variable.value for variable in self.virtual_variable_list] + [1]
+
+    def get_one_hot_value(self):
+        bits = [variable.value for variable in self.one_hot_variable_list]
+        return self.domain[bits.index(1)]
+
+    def get_domain_wall_value(self):
+        bits = self._domain_wall_bits()
+        for i in range(len(self.domain)):
+            if bits[i + 1] - bits[i] == 1:
+                return self.domain[i]
 
     @property
     def is_valid(self):
-        raise NotImplementedError("Not yet implemented")
+        if self.encoding_type == "one-hot":
+            bits = [variable.value for variable in self.one_hot_variable_list]
+            return None not in bits and sum(bits) == 1
+        elif self.encoding_type == "domain-wall":
+            bits = self._domain_wall_bits()
+            return None not in bits and all(a <= b for a, b in zip(bits, bits[1:]))
+        else:
+            raise ValueError(f"No encoding to check for {self.name}")
     
     def __str__(self):
         return f"{self.name}∈{self.domain}"
@@ -411,13 +1188,51 @@ class DiscreteVariable(AbstractVariable):
     def __ne__(self, other):
         return NotEqualTerm([self, other], 1)
 
+BINARY_DOMAIN = [0, 1]
+
 class BinaryVariable(AbstractVariable):
-    def __init__(self, name: str, represents = None, parent_variable = None, virtual = False, extra_properties: dict = None):
-        super().__init__(name, domain = [0, 1], extra_properties=extra_properties)
+    '''
+    A single binary variable. Variables made by a DiscreteVariable have no stored name, it is
+    built from the parent, role and position when asked for. Once added to a Problem, index is
+    the integer label of the variable in the compiled BQMs.
+    '''
+    __slots__ = ('_value', 'represents', 'parent_variable', 'virtual', 'role', 'position', 'index')
+
+    def __init__(self, name: str = None, represents = None, parent_variable = None, virtual = False, extra_properties: dict = None, role: str = None, position: int = None):
+        super().__init__(name, domain = BINARY_DOMAIN, extra_properties=extra_properties)
         self._value = None
         self.represents = represents
         self.parent_variable = parent_variable
         self.virtual = virtual
+        self.role = role
+        self.position = position
+        self.index = None
+
+    @property
+    def name(self):
+        if self._name is not None:
+            return self._name
+        parent = self.parent_variable
+        if self.role == "one-hot":
+            if parent.encoding_type == "one-hot":
+                return f"{parent.name} is {self.represents}"
+            return f"{parent.name}={self.represents}"
+        if self.role == "domain-wall":
+            left = 'start' if self.position == 0 else parent.domain[self.position - 1]
+            right = 'end' if self.position == len(parent.domain) else parent.domain[self.position]
+            return f"{parent.name} dw[{left}, {right}]"
+        return None
+
+    @name.setter
+    def name(self, name: str):
+        self._name = name
+
+    @property
+    def dw_neigbours(self):
+        '''The two domain wall variables whose difference gives this one-hot variable'''
+        if self.role != "one-hot" or self.parent_variable.encoding_type != "domain-wall":
+            raise AttributeError(f"{self} is not the one-hot variable of a domain wall encoded variable")
+        return self.parent_variable.domain_wall_variable_list[self.position:self.position + 2]
 
     @property   
     def value(self):
@@ -0,0 +1,155 @@
+import numpy as np
+import scipy.sparse as sp
+
+from dw_util.sampler import csr_rows
+
+
+class AdjacencyModel:
+    '''
+    A CSR view of a compiled Problem.BQM for local search. Column i is labels[i], J is the
+    symmetric coupler matrix with an extra empty column standing in for binary variables that
+    are not in the BQM. For the discrete variables it keeps, padded to the widest, the columns
+    of their binary variables in the BQM (the one-hot variables, or the inner walls), the
+    encoding of every value over those columns, and the couplers among them.
+    '''
+    def __init__(self, problem):
+        problem.compute_bqm()
+        bqm = problem.BQM
+        self.labels = np.fromiter(bqm.variables, dtype=np.int64, count=bqm.num_variables)
+        self.column = {int(label): i for i, label in enumerate(self.labels)}
+        n = len(self.labels)
+        # to_numpy_vectors sorts integer labels unless given the order
+        linear, (rows, cols, biases), self.offset = bqm.to_numpy_vectors(variable_order=self.labels.tolist())
+        self.h = np.append(linear, 0.0)
+        self.J = sp.coo_matrix(
+            (np.concatenate([biases, biases]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(n + 1, n + 1),
+        ).tocsr()
+        self.J.sum_duplicates()
+        self.spare = n
+
+        ### Binary columns, value encodings and inner couplers of the discrete variables ###
+        variables = problem.discrete_variables
+        bits = [self._bits(variable) for variable in variables]
+        width = max((len(variable.domain) for variable in variables), default=1)
+        num_bits = max((len(b) for b in bits), default=1)
+        self.domain_sizes = np.array([len(variable.domain) for variable in variables], dtype=np.int64)
+        self.bit_columns = np.full((len(variables), num_bits), self.spare, dtype=np.int64)
+        self.encodings = np.zeros((len(variables), width, num_bits), dtype=np.int8)
+        for a, (variable, labels) in enumerate(zip(variables, bits)):
+            self.bit_columns[a, :len(labels)] = [self.column.get(label, self.spare) for label in labels]
+            k = len(variable.domain)
+            if variable.encoding_type == "one-hot":
+                self.encodings[a, :k, :k] = np.eye(k, dtype=np.int8)
+            else:
+                # inner wall j is 1 once j passes the position of the value
+                self.encodings[a, :k, :k - 1] = np.arange(1, k)[None, :] > np.arange(k)[:, None]
+        # bits outside the BQM never change
+        self.encodings[self.bit_columns[:, None, :].repeat(width, axis=1) == self.spare] = 0
+        self.blocks = np.stack([
+            self.J[columns][:, columns].toarray() for columns in self.bit_columns
+        ]) if len(variables) else np.zeros((0, num_bits, num_bits))
+
+    @staticmethod
+    def _bits(variable) -> list:
+        if variable.encoding_type == "one-hot":
+            return [binary_variable.index for binary_variable in variable.one_hot_variable_list]
+        return [binary_variable.index for binary_variable in variable.virtual_variable_list]
+
+    @property
+    def num_variables(self):
+        return len(self.labels)
+
+    def degree(self, columns) -> np.ndarray:
+        return np.diff(self.J.indptr)[columns]
+
+
+class LocalState:
+    '''
+    A binary state of an AdjacencyModel with the local field h_i + sum_j J_ij x_j of every
+    variable, so a flip is scored in O(1) and applied in O(degree), and moving a discrete
+    variable to another value is scored and applied in O(degree) of the bits that change.
+    '''
+    def __init__(self, model: AdjacencyModel, sample=None):
+        self.model = model
+        self.x = np.zeros(model.num_variables + 1, dtype=np.int8)
+        if sample is not None:
+            if isinstance(sample, dict):
+                for label, value in sample.items():
+                    if label in model.column:
+                        self.x[model.column[label]] = value
+            else:
+                self.x[:-1] = np.asarray(sample, dtype=np.int8)
+        self.fields = model.h + model.J @ self.x.astype(np.float64)
+        self.energy = float(model.offset + self.x @ (model.h + 0.5 * (self.fields - model.h)))
+
+    @property
+    def sample(self) -> dict:
+        return dict(zip(self.model.labels.tolist(), self.x[:-1].tolist()))
+
+    ### Single flips ###
+    def flip_delta(self, column: int) -> float:
+        return float((1 - 2 * self.x[column]) * self.fields[column])
+
+    def flip_deltas(self, columns=None) -> np.ndarray:
+        '''Energy change of flipping each of the given columns alone, all of them by default'''
+        columns = np.arange(self.model.num_variables) if columns is None else np.asarray(columns)
+        return (1 - 2 * self.x[columns]) * self.fields[columns]
+
+    def flip(self, column: int) -> float:
+        return self.apply(np.array([column]))
+
+    ### Several bits at once ###
+    def delta(self, columns) -> float:
+        '''Energy change of flipping all of the given distinct columns together'''
+        columns = np.asarray(columns, dtype=np.int64)
+        signs = 1 - 2 * self.x[columns].astype(np.float64)
+        inner = self.model.J[columns][:, columns].toarray()
+        return float(signs @ self.fields[columns] + 0.5 * signs @ inner @ signs)
+
+    def apply(self, columns) -> float:
+        '''Flip the given distinct columns together, returning the energy change'''
+        columns = np.asarray(columns, dtype=np.int64)
+        columns = columns[columns != self.model.spare]
+        change = self.delta(columns)
+        signs = 1 - 2 * self.x[columns].astype(np.float64)
+        entry, neighbours, biases = csr_rows(self.model.J, columns)
+        np.add.at(self.fields, neighbours, signs[entry] * biases)
+        self.x[columns] ^= 1
+        self.energy += change
+        return change
+
+    ### Discrete variables ###
+    def value_deltas(self, variables=None) -> np.ndarray:
+        '''
+        (variables x widest domain) energy change of setting each given discrete variable, by
+        position in discrete_variables, to the encoding of each value of its domain, inf past
+        the end of the domain. The state of a variable does not need to be a valid encoding.
+        '''
+        model = self.model
+        variables = np.arange(len(model.domain_sizes)) if variables is None else np.asarray(variables)
+        columns = model.bit_columns[variables]
+        current = self.x[columns]
+        # +1 / -1 for every bit a value needs flipped, 0 for the others
+        changes = model.encodings[variables].astype(np.float64) - current[:, None, :]
+        deltas = (
+            np.einsum('avb,ab->av', changes, self.fields[columns])
+            + 0.5 * np.einsum('avb,abc,avc->av', changes, model.blocks[variables], changes)
+        )
+        deltas[np.arange(deltas.shape[1])[None, :] >= model.domain_sizes[variables][:, None]] = np.inf
+        return deltas
+
+    def set_value(self, variable: int, position: int) -> float:
+        '''Set a discrete variable to the encoding of the value at position in its domain'''
+        model = self.model
+        columns = model.bit_columns[variable]
+        differs = self.x[columns] != model.encodings[variable, position]
+        return self.apply(columns[differs])
+
+    def positions(self) -> np.ndarray:
+        '''Position of the value of each discrete variable, -1 where its encoding is not valid'''
+        model = self.model
+        current = self.x[model.bit_columns]
+        matches = (model.encodings == current[:, None, :]).all(axis=2)
+        matches[np.arange(matches.shape[1])[None, :] >= model.domain_sizes[:, None]] = False
+        return np.where(matches.any(axis=1), matches.argmax(axis=1), -1)
@@ -0,0 +1,140 @@
+import numpy as np
+
+from dw_util.accumulator import CoefficientAccumulator
+from dw_util.standalone import bqm_energies
+
+
+class Evaluation:
+    '''
+    The result of Problem.evaluate for a batch of reads. Row r of every array belongs to read r,
+    columns of positions/values/valid follow Problem.discrete_variables and columns of
+    violations follow constraints.
+    '''
+    def __init__(self, positions, values, objective, penalty, energy, violations, constraints):
+        self.positions = positions
+        self.values = values
+        self.objective = objective
+        self.penalty = penalty
+        self.energy = energy
+        self.violations = violations
+        self.constraints = constraints
+
+    @property
+    def valid(self):
+        '''Whether each discrete variable holds a valid encoding in each read'''
+        return self.positions >= 0
+
+    @property
+    def feasible(self):
+        '''Reads in which no constraint is violated'''
+        return ~self.violations.any(axis=1)
+
+    def __len__(self):
+        return len(self.energy)
+
+    def __repr__(self):
+        return f"Evaluation({len(self)} reads, {int(self.feasible.sum())} feasible)"
+
+
+def registry_states(problem, samples, labels=None) -> np.ndarray:
+    '''
+    Spread a (n_reads x n_labels) sample array over every variable in the registry. The fixed
+    domain wall ends are filled in and the one-hot variables of domain wall encoded variables
+    are set to d_{i+1} - d_i, so they are -1 where the encoding is broken.
+    '''
+    if hasattr(samples, 'record'):
+        labels = list(samples.variables) if labels is None else labels
+        samples = samples.record.sample
+    elif labels is None:
+        labels = list(problem.BQM.variables)
+    samples = np.atleast_2d(np.asarray(samples))
+    states = np.zeros((len(samples), len(problem.registry)), dtype=np.int8)
+    states[:, np.asarray(labels, dtype=np.int64)] = samples
+
+    starts, ends, one_hot, left, right = [], [], [], [], []
+    for variable in problem.discrete_variables:
+        if variable.encoding_type == "domain-wall":
+            walls = [binary_variable.index for binary_variable in variable.domain_wall_variable_list]
+            starts.append(walls[0])
+            ends.append(walls[-1])
+            one_hot.extend(binary_variable.index for binary_variable in variable.one_hot_variable_list)
+            left.extend(walls[:-1])
+            right.extend(walls[1:])
+    states[:, starts] = 0
+    states[:, ends] = 1
+    states[:, one_hot] = states[:, right] - states[:, left]
+    return states
+
+
+def decode_positions(problem, states: np.ndarray) -> np.ndarray:
+    '''
+    Position in its domain of the value each discrete variable takes, -1 where the encoding is
+    broken. Variables sharing an encoding and domain size are decoded together.
+    '''
+    positions = np.full((len(states), len(problem.discrete_variables)), -1, dtype=np.int64)
+    groups = {}
+    for column, variable in enumerate(problem.discrete_variables):
+        groups.setdefault((variable.encoding_type, len(variable.domain)), []).append(column)
+
+    for (encoding_type, _), columns in groups.items():
+        variables = [problem.discrete_variables[column] for column in columns]
+        if encoding_type == "one-hot":
+            index = np.array([[b.index for b in v.one_hot_variable_list] for v in variables])
+            bits = states[:, index]
+            valid = bits.sum(axis=2) == 1
+            found = bits.argmax(axis=2)
+        elif encoding_type == "domain-wall":
+            index = np.array([[b.index for b in v.domain_wall_variable_list] for v in variables])
+            steps = np.diff(states[:, index].astype(np.int8), axis=2)
+            # the ends are fixed at 0 and 1, so no step down means exactly one wall
+            valid = (steps >= 0).all(axis=2)
+            found = steps.argmax(axis=2)
+        else:
+            raise ValueError(f"Cannot decode encoding {encoding_type}")
+        positions[:, columns] = np.where(valid, found, -1)
+    return positions
+
+
+def decode_values(problem, positions: np.ndarray) -> np.ma.MaskedArray:
+    '''The domain values behind decode_positions, masked where the encoding is broken'''
+    width = max((len(variable.domain) for variable in problem.discrete_variables), default=0)
+    # object dtype, so that mixed domains such as [0, 1, 2] and ['x', 'y'] keep their own values
+    table = np.empty((len(problem.discrete_variables), width), dtype=object)
+    for row, variable in enumerate(problem.discrete_variables):
+        for column in range(width):
+            table[row, column] = variable.domain[column if column < len(variable.domain) else 0]
+    if table.size == 0:
+        return np.ma.masked_array(np.zeros(positions.shape), mask=positions < 0)
+    values = table[np.arange(len(problem.discrete_variables)), np.maximum(positions, 0)]
+    return np.ma.masked_array(values, mask=positions < 0)
+
+
+def evaluate(problem, samples, labels=None, atol: float = 1e-9) -> Evaluation:
+    '''
+    A constraint term counts as violated when its penalty exceeds atol times its largest
+    coefficient, so rounding in e.g. 0.1 + 0.2 == 0.3 does not make a read infeasible.
+    '''
+    states = registry_states(problem, samples, labels)
+    positions = decode_positions(problem, states)
+    objective = bqm_energies(problem.objective_bqm, states)
+    penalty = bqm_energies(problem.constraint_bqm, states)
+
+    constraints = [constraint for variable in problem.discrete_variables for constraint in variable.constraint_list]
+    violations = np.empty((len(states), len(constraints) + len(problem.constraint_terms)), dtype=bool)
+    violations[:, :len(constraints)] = positions < 0
+    for column, term in enumerate(problem.constraint_terms, start=len(constraints)):
+        accumulator = CoefficientAccumulator(num_variables=len(problem.registry))
+        term.emit(accumulator)
+        linear, (_, _, biases), offset = accumulator.reduce()
+        scale = max(np.abs(linear).max(initial=0), np.abs(biases).max(initial=0), abs(offset), 1.0)
+        violations[:, column] = bqm_energies(accumulator.to_bqm(), states) > atol * scale
+
+    return Evaluation(
+        positions=positions,
+        values=decode_values(problem, positions),
+        objective=objective,
+        penalty=penalty,
+        energy=objective + problem.penalty_weight * penalty,
+        violations=violations,
+        constraints=constraints + list(problem.constraint_terms),
+    )
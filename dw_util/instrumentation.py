@@ -0,0 +1,109 @@
+import time
+
+
+class StageRecord:
+    '''Wall time, counts and model sizes before and after one stage of a compile'''
+    def __init__(self, name: str, before: dict):
+        self.name = name
+        self.before = before
+        self.after = None
+        self.seconds = None
+        self.counts = {}
+
+    def count(self, key: str, value: int):
+        self.counts[key] = value
+
+    def as_dict(self):
+        return {"name": self.name, "seconds": self.seconds, "counts": self.counts, "before": self.before, "after": self.after}
+
+    def __repr__(self):
+        counts = ", ".join(f"{key}={value}" for key, value in self.counts.items())
+        return f"{self.name}: {self.seconds:.6f}s {counts}"
+
+
+class CompileStats:
+    '''The stage records of one call to Problem.compute_bqm'''
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.stages = []
+
+    @property
+    def seconds(self):
+        return sum(stage.seconds for stage in self.stages)
+
+    def __getitem__(self, name: str) -> StageRecord:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def as_dict(self):
+        return {"mode": self.mode, "seconds": self.seconds, "stages": [stage.as_dict() for stage in self.stages]}
+
+    def __repr__(self):
+        return f"CompileStats({self.mode}, {self.seconds:.6f}s)\n" + "\n".join(f"  {stage}" for stage in self.stages)
+
+
+def model_sizes(problem) -> dict:
+    '''(variables, interactions) of the objective, constraint and final models'''
+    sizes = {}
+    for name, bqm in [("objective", problem._objective_bqm), ("constraint", problem._constraint_bqm), ("BQM", problem._BQM)]:
+        sizes[name] = (bqm.num_variables, bqm.num_interactions) if bqm is not None else (0, 0)
+    return sizes
+
+
+class _Stage:
+    def __init__(self, instrumentation, problem, name):
+        self.instrumentation = instrumentation
+        self.problem = problem
+        self.record = StageRecord(name, model_sizes(problem))
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc):
+        self.record.seconds = time.perf_counter() - self._start
+        self.record.after = model_sizes(self.problem)
+        self.instrumentation.stats.stages.append(self.record)
+        for hook in self.instrumentation.on_stage:
+            hook(self.record)
+        return False
+
+
+class _NullStage:
+    '''Stands in for a stage when instrumentation is off, so the compile path costs one call'''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, key, value):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+    '''
+    Records every stage of Problem.compute_bqm. on_stage hooks are called with each StageRecord
+    as it finishes and on_compile hooks with the CompileStats once the compile is done, so the
+    data can be forwarded to a metrics system.
+    '''
+    def __init__(self, on_stage=None, on_compile=None):
+        self.on_stage = list(on_stage or [])
+        self.on_compile = list(on_compile or [])
+        self.stats = None
+
+    def start(self, mode: str):
+        self.stats = CompileStats(mode)
+
+    def stage(self, problem, name: str):
+        return _Stage(self, problem, name)
+
+    def finish(self):
+        for hook in self.on_compile:
+            hook(self.stats)
+        return self.stats
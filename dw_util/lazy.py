@@ -0,0 +1,35 @@
+import importlib
+import sys
+
+
+class LazyModule:
+    '''
+    Stands in for a module inside dw_util until one of its attributes is first used, then
+    imports it with importlib and copies its namespace in, so later lookups cost what they
+    would on the module itself. A module that is not installed fails with ImportError there.
+    '''
+    def __init__(self, name: str):
+        self.__name__ = name
+
+    def __getattr__(self, key):
+        try:
+            module = importlib.import_module(self.__name__)
+        except ImportError as error:
+            raise ImportError(f"{self.__name__} is needed for this but is not installed, pip install {self.__name__}") from error
+        self.__dict__.update(module.__dict__)
+        return getattr(module, key)
+
+    def __repr__(self):
+        return f"<lazy module {self.__name__!r}>"
+
+
+def lazy_import(name: str):
+    '''
+    The top level module name, imported when one of its attributes is first used, so that
+    importing dw_util stays cheap and building a model does not load dimod or NumPy. A module
+    that is already loaded is returned as it is. The stand-in is only bound inside dw_util and
+    sys.modules is left alone: the first use imports the real module the usual way, which is
+    the only side effect, and every other importer gets that module.
+    '''
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,208 @@
+import numpy as np
+
+from dw_util.parallel import emit_all
+
+
+class OrderingResult:
+    '''The outcome of Problem.optimize_domain_orders'''
+    def __init__(self, before: int, after: int, orders: dict, passes: int):
+        # non-zero couplers of the compiled BQM
+        self.before = before
+        self.after = after
+        # new order of each reordered variable, by position in discrete_variables, as positions in its old domain
+        self.orders = orders
+        self.passes = passes
+
+    def __repr__(self):
+        return f"OrderingResult({self.before} -> {self.after} couplers, {len(self.orders)} variables reordered)"
+
+
+def nonzero_couplers(bqm) -> int:
+    return int(np.count_nonzero(bqm.to_numpy_vectors()[1][2]))
+
+
+def term_coefficients(problem):
+    '''
+    The objective terms plus penalty_weight times the constraint terms, streamed ones included
+    but not the encoding constraints of the variables, as (linear, (rows, cols, biases), offset)
+    over registry indices.
+    '''
+    num_variables = len(problem.registry)
+    accumulator = emit_all(problem.objective_terms, num_variables, problem.compile_workers)
+    accumulator.merge(problem._streamed_objective.total)
+    constraint = emit_all(problem.constraint_terms, num_variables, problem.compile_workers)
+    constraint.merge(problem._streamed_constraint.total)
+    accumulator.merge(constraint, problem.penalty_weight)
+    return accumulator.reduce()
+
+
+def encoding_maps(problem):
+    '''
+    For every registry index: the position of its discrete variable in discrete_variables, its
+    position among the one-hot variables (-1 for domain wall variables), and whether it is a
+    domain wall variable. Indices of removed variables get -1 and False.
+    '''
+    num_variables = len(problem.registry)
+    parent = np.full(num_variables, -1, dtype=np.int64)
+    one_hot_position = np.full(num_variables, -1, dtype=np.int64)
+    is_wall = np.zeros(num_variables, dtype=bool)
+    for i, variable in enumerate(problem.discrete_variables):
+        for binary_variable in variable.one_hot_variable_list:
+            parent[binary_variable.index] = i
+            one_hot_position[binary_variable.index] = binary_variable.position
+        if variable.encoding_type == "domain-wall":
+            walls = [binary_variable.index for binary_variable in variable.domain_wall_variable_list]
+            is_wall[walls] = True
+            parent[walls] = i
+    return parent, one_hot_position, is_wall
+
+
+def wall_users(parent: np.ndarray, is_wall: np.ndarray, linear, rows, cols, atol: float = 1e-12) -> set:
+    '''Positions of the variables whose domain wall variables are used by terms directly'''
+    used = np.concatenate([np.flatnonzero(np.abs(linear) > atol), rows, cols])
+    return set(parent[used[is_wall[used]]].tolist())
+
+
+def coupler_blocks(problem, atol: float = 1e-12):
+    '''
+    The couplers between one-hot variables of different discrete variables, in one-hot space
+    and weighted as in the compiled BQM, as {(a, b): (k_a x k_b) matrix} over positions in
+    discrete_variables with a < b. Also returns the positions of the variables whose domain
+    wall variables are used by terms directly, whose meaning a new order would change.
+    '''
+    linear, (rows, cols, biases), _ = term_coefficients(problem)
+    parent, one_hot_position, is_wall = encoding_maps(problem)
+
+    keep = np.abs(biases) > atol
+    rows, cols, biases = rows[keep], cols[keep], biases[keep]
+    frozen = wall_users(parent, is_wall, linear, rows, cols, atol)
+
+    one_hot = (one_hot_position[rows] >= 0) & (one_hot_position[cols] >= 0) & (parent[rows] != parent[cols])
+    rows, cols, biases = rows[one_hot], cols[one_hot], biases[one_hot]
+    swap = parent[rows] > parent[cols]
+    rows, cols = np.where(swap, cols, rows), np.where(swap, rows, cols)
+    a, b = parent[rows], parent[cols]
+    keys = a * len(problem.discrete_variables) + b
+    order = np.argsort(keys, kind='stable')
+    keys, a, b = keys[order], a[order], b[order]
+    rows, cols, biases = rows[order], cols[order], biases[order]
+
+    blocks = {}
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.zeros(0, dtype=np.int64)
+    for start, stop in zip(starts, np.append(starts[1:], len(keys))):
+        pair = (int(a[start]), int(b[start]))
+        block = np.zeros((len(problem.discrete_variables[pair[0]].domain), len(problem.discrete_variables[pair[1]].domain)))
+        np.add.at(block, (one_hot_position[rows[start:stop]], one_hot_position[cols[start:stop]]), biases[start:stop])
+        blocks[pair] = block
+    return blocks, frozen
+
+
+def row_distances(rows: np.ndarray, atol: float = 1e-12) -> np.ndarray:
+    '''Number of columns in which each pair of rows differs, the couplers a wall between them leaves'''
+    distances = np.zeros((len(rows), len(rows)), dtype=np.int64)
+    for i, row in enumerate(rows):
+        distances[i] = np.count_nonzero(np.abs(rows - row) > atol, axis=1)
+    return distances
+
+
+def path_cost(distances: np.ndarray, order) -> int:
+    order = np.asarray(order)
+    return int(distances[order[:-1], order[1:]].sum())
+
+
+def nearest_neighbour_path(distances: np.ndarray, start: int) -> np.ndarray:
+    visited = np.zeros(len(distances), dtype=bool)
+    path = [start]
+    visited[start] = True
+    for _ in range(len(distances) - 1):
+        following = int(np.argmin(np.where(visited, np.iinfo(np.int64).max, distances[path[-1]])))
+        path.append(following)
+        visited[following] = True
+    return np.array(path)
+
+
+def two_opt_path(distances: np.ndarray, order) -> np.ndarray:
+    '''Reverse the segment of the open path that saves the most until no reversal helps'''
+    k = len(distances)
+    # a zero distance sentinel at both ends turns the open path into a closed tour
+    extended = np.zeros((k + 1, k + 1), dtype=distances.dtype)
+    extended[:k, :k] = distances
+    path = np.concatenate(([k], order, [k]))
+    i, j = np.triu_indices(k, 1)
+    i, j = i + 1, j + 1
+    while len(i):
+        delta = (
+            extended[path[i - 1], path[j]] + extended[path[i], path[j + 1]]
+            - extended[path[i - 1], path[i]] - extended[path[j], path[j + 1]]
+        )
+        best = int(np.argmin(delta))
+        if delta[best] >= 0:
+            break
+        path[i[best]:j[best] + 1] = path[i[best]:j[best] + 1][::-1]
+    return path[1:-1]
+
+
+def best_order(distances: np.ndarray, order: np.ndarray, starts: int = 4) -> np.ndarray:
+    '''
+    The shortest open path through the rows found by 2-opt, starting from the given order and
+    from nearest neighbour paths. A domain wall variable's couplers to its neighbours are the
+    sum of the distances between consecutive values, so this is its best order.
+    '''
+    candidates = [order] + [nearest_neighbour_path(distances, int(start)) for start in order[::max(len(order) // starts, 1)]]
+    improved = [two_opt_path(distances, candidate) for candidate in candidates]
+    return min(improved, key=lambda candidate: path_cost(distances, candidate))
+
+
+def _stacked_neighbours(a: int, neighbours, blocks, orders, walls):
+    '''The couplers of a to all its neighbours in their current order, one row per value of a'''
+    stacked = []
+    for b in neighbours[a]:
+        block = blocks[(a, b)] if a < b else blocks[(b, a)].T
+        block = block[:, orders[b]] if b in orders else block
+        stacked.append(np.diff(block, axis=1) if b in walls else block)
+    return np.hstack(stacked)
+
+
+def optimize_domain_orders(problem, max_passes: int = 10, atol: float = 1e-12) -> OrderingResult:
+    '''
+    Order the domains of the domain wall variables so the compiled BQM has as few couplers as
+    possible. With its neighbours fixed, the couplers of a variable after substitution are the
+    differences between the rows of its one-hot couplers taken in domain order, so each
+    variable in turn gets the shortest path through its rows, until a pass changes nothing.
+    '''
+    problem.compute_bqm()
+    before = nonzero_couplers(problem.BQM)
+    blocks, frozen = coupler_blocks(problem, atol)
+
+    variables = problem.discrete_variables
+    walls = {i for i, variable in enumerate(variables) if variable.encoding_type == "domain-wall"}
+    neighbours = {i: [] for i in range(len(variables))}
+    for a, b in blocks:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    orders = {i: np.arange(len(variables[i].domain)) for i in walls}
+    # two values can only be swapped end for end, which just flips the signs
+    movable = [i for i in sorted(walls - frozen) if len(variables[i].domain) > 2 and neighbours[i]]
+
+    passes = 0
+    for passes in range(1, max_passes + 1):
+        changed = False
+        for a in movable:
+            stacked = _stacked_neighbours(a, neighbours, blocks, orders, walls)
+            distances = row_distances(stacked, atol)
+            candidate = best_order(distances, orders[a])
+            if path_cost(distances, candidate) < path_cost(distances, orders[a]):
+                orders[a] = candidate
+                changed = True
+        if not changed:
+            break
+
+    reordered = {}
+    for i, order in orders.items():
+        if not np.array_equal(order, np.arange(len(order))):
+            variables[i].permute_domain(order)
+            reordered[i] = order
+    if reordered:
+        problem._invalidate_compiled()
+        problem.compute_bqm()
+    return OrderingResult(before, nonzero_couplers(problem.BQM), reordered, passes)
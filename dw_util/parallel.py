@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from dw_util.accumulator import CoefficientAccumulator
+
+# below this many items per worker the pool costs more than it saves
+MIN_ITEMS_PER_WORKER = 5_000
+# the accumulator buffers a worker hands back, in the order they are merged
+FIELDS = ('_explicit_variables', '_linear_indices', '_linear_biases', '_rows', '_cols', '_quadratic_biases')
+
+# the items being compiled, set in the parent before the pool forks so workers inherit them
+_ITEMS = None
+
+
+def can_fork() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _emit_range(start: int, stop: int, num_variables: int):
+    '''Worker: emit _ITEMS[start:stop] and copy the raw buffers into a new shared memory block'''
+    accumulator = CoefficientAccumulator(num_variables=num_variables)
+    for item in _ITEMS[start:stop]:
+        item.emit(accumulator)
+    arrays = [getattr(accumulator, field).array for field in FIELDS]
+    layout = []
+    size = 0
+    for field, array in zip(FIELDS, arrays):
+        layout.append((field, array.dtype.str, array.shape, size))
+        size += array.nbytes
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for (field, dtype, shape, offset), array in zip(layout, arrays):
+        np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)[...] = array
+    memory.close()
+    return memory.name, layout, accumulator.offset
+
+
+def _merge_shared(accumulator: CoefficientAccumulator, name: str, layout, offset: float):
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        for field, dtype, shape, start in layout:
+            getattr(accumulator, field).extend(np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=start))
+        accumulator.offset += offset
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def emit_all(items: list, num_variables: int, workers: int = 1) -> CoefficientAccumulator:
+    '''
+    An indexed accumulator holding the coefficients of every item (term or discrete variable).
+    With workers > 1 (None for every core) large lists are split into contiguous ranges that
+    forked worker processes emit into shared memory. The raw entries are merged back in order,
+    so reducing them sums the same numbers in the same order as the serial path and gives the
+    same model. Falls back to emitting serially where fork is not available.
+    '''
+    workers = os.cpu_count() if workers is None else workers
+    workers = min(workers, len(items) // MIN_ITEMS_PER_WORKER)
+    accumulator = CoefficientAccumulator(num_variables=num_variables)
+    if workers <= 1 or not can_fork():
+        for item in items:
+            item.emit(accumulator)
+        return accumulator
+
+    global _ITEMS
+    _ITEMS = items
+    # started before the fork so workers register their blocks with the tracker of this process,
+    # which sees them unlinked here, instead of each starting one that reports them leaked
+    resource_tracker.ensure_running()
+    bounds = np.linspace(0, len(items), workers + 1).astype(np.int64)
+    results, error = [], None
+    try:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            futures = [pool.submit(_emit_range, int(start), int(stop), num_variables) for start, stop in zip(bounds[:-1], bounds[1:])]
+            # wait for every worker, so no block is left behind if one of them fails
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    error = error or e
+    finally:
+        _ITEMS = None
+    for result in results:
+        if error is None:
+            _merge_shared(accumulator, *result)
+        else:
+            memory = shared_memory.SharedMemory(name=result[0])
+            memory.close()
+            memory.unlink()
+    if error is not None:
+        raise error
+    return accumulator
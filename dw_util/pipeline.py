@@ -0,0 +1,160 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import dimod
+
+from dw_util.parallel import can_fork
+
+
+class SolveResult:
+    '''
+    One Problem of solve_many: the compiled problem (a copy when compiled in another process),
+    its samples and their Evaluation, or the error that stopped it, and the seconds spent in
+    each stage. index is the position of the problem in the input.
+    '''
+    def __init__(self, index: int, problem, sampleset=None, evaluation=None, timings: dict = None, error: BaseException = None):
+        self.index = index
+        self.problem = problem
+        self.sampleset = sampleset
+        self.evaluation = evaluation
+        # compile (in the worker), compile_wall (including the wait for a worker), sample, decode, total
+        self.timings = timings or {}
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def feasibility_rate(self):
+        return float(self.evaluation.feasible.mean()) if self.ok and len(self.evaluation) else 0.0
+
+    @property
+    def best_feasible_energy(self):
+        '''Lowest energy over the feasible reads, None if there are none'''
+        if not self.ok or not self.evaluation.feasible.any():
+            return None
+        return float(self.evaluation.energy[self.evaluation.feasible].min())
+
+    def __repr__(self):
+        if not self.ok:
+            return f"SolveResult({self.index}, error={self.error!r})"
+        return f"SolveResult({self.index}, feasibility_rate={self.feasibility_rate:.3f}, total={self.timings.get('total', 0):.4f}s)"
+
+
+class LatencySampler(dimod.Sampler):
+    '''
+    A local stand-in for a remote sampler: every call waits latency seconds, as a network
+    round trip and queue would, then samples with child, random reads by default. The wait
+    releases the GIL like a real client, so calls from several threads overlap.
+    '''
+    def __init__(self, child: dimod.Sampler = None, latency: float = 0.1):
+        self.child = child if child is not None else dimod.RandomSampler()
+        self.latency = latency
+        self._lock = threading.Lock()
+        # calls waiting or sampling now, and the most there have been at once
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def parameters(self):
+        return dict(self.child.parameters)
+
+    @property
+    def properties(self):
+        return {"latency": self.latency, "child_properties": self.child.properties}
+
+    def sample(self, bqm, **parameters):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return self.child.sample(bqm, **parameters)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _compile(problem):
+    start = time.perf_counter()
+    problem.compute_bqm()
+    return problem, time.perf_counter() - start
+
+
+def _process_context():
+    # a forking pool starts all its workers on the first compile, before any sampler thread
+    return multiprocessing.get_context("fork" if can_fork() else "spawn")
+
+
+async def _solve_one(index, problem, sampler, compile_pool, sample_pool, sampler_kwargs) -> SolveResult:
+    loop = asyncio.get_running_loop()
+    timings = {}
+    start = time.perf_counter()
+    try:
+        problem, timings["compile"] = await loop.run_in_executor(compile_pool, _compile, problem)
+        timings["compile_wall"] = time.perf_counter() - start
+
+        mark = time.perf_counter()
+        sampleset = await loop.run_in_executor(sample_pool, functools.partial(sampler.sample, problem.BQM, **sampler_kwargs))
+        timings["sample"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        evaluation = await loop.run_in_executor(sample_pool, problem.evaluate, sampleset)
+        timings["decode"] = time.perf_counter() - mark
+    except Exception as error:
+        timings["total"] = time.perf_counter() - start
+        return SolveResult(index, problem, timings=timings, error=error)
+    timings["total"] = time.perf_counter() - start
+    return SolveResult(index, problem, sampleset, evaluation, timings)
+
+
+async def solve_many(problems, sampler, max_in_flight: int = 8, compile_workers: int = None, **sampler_kwargs):
+    '''
+    Compile, sample and decode many Problems at once, yielding a SolveResult for each as it
+    finishes, so not in input order. Compiles run in a pool of compile_workers processes
+    (None for every core, 0 to compile in a thread of this process) while earlier problems
+    wait on the sampler, and sampler calls and decoding run in threads. At most max_in_flight
+    problems are between compile and decode at a time, and problems, which may be any
+    iterable, are only taken from it as jobs finish. Every result carries its own timings; a
+    problem that fails gives a result with error set and the others carry on. Compiling in
+    processes needs picklable problems and returns compiled copies in the results.
+
+        async for result in solve_many(problems, sampler, num_reads=100):
+            ...
+    '''
+    if max_in_flight < 1:
+        raise ValueError(f"max_in_flight must be at least 1, not {max_in_flight}")
+    compile_pool = (
+        ProcessPoolExecutor(max_workers=compile_workers, mp_context=_process_context())
+        if compile_workers != 0 else ThreadPoolExecutor(max_workers=1)
+    )
+    sample_pool = ThreadPoolExecutor(max_workers=max_in_flight)
+    pending = set()
+    try:
+        for index, problem in enumerate(problems):
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(_solve_one(index, problem, sampler, compile_pool, sample_pool, sampler_kwargs)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        compile_pool.shutdown(wait=True, cancel_futures=True)
+        sample_pool.shutdown(wait=True, cancel_futures=True)
+
+
+def solve_all(problems, sampler, max_in_flight: int = 8, compile_workers: int = None, **sampler_kwargs) -> list:
+    '''solve_many run to the end from synchronous code, with the results in input order'''
+    async def collect():
+        return [result async for result in solve_many(problems, sampler, max_in_flight, compile_workers, **sampler_kwargs)]
+    return sorted(asyncio.run(collect()), key=lambda result: result.index)
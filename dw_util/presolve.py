@@ -0,0 +1,198 @@
+import dimod
+import numpy as np
+import scipy.sparse as sp
+
+from dw_util.ordering import term_coefficients, encoding_maps, wall_users
+from dw_util.standalone import linear_substitute_bqm
+
+try:
+    from dwave.preprocessing import roof_duality
+except ImportError:
+    roof_duality = None
+
+
+class Presolved:
+    '''
+    A reduced copy of a compiled BQM and the postsolve map back to it: variables fixed to a
+    value, and variables merged into another one they always equal.
+    '''
+    def __init__(self, bqm: dimod.BinaryQuadraticModel, full_bqm: dimod.BinaryQuadraticModel):
+        self.bqm = bqm
+        self.full_bqm = full_bqm
+        self.fixed = {}
+        self.merged = {}
+        # (discrete variable position, value) pairs dropped as dominated
+        self.dropped_values = []
+        self.stats = {}
+
+    def postsolve(self, samples, labels=None) -> dimod.SampleSet:
+        '''
+        Extend samples of the reduced BQM (a SampleSet or an array whose columns follow labels)
+        to the full compiled BQM, with energies evaluated on it. Problem.evaluate decodes the
+        result like any sample of Problem.BQM.
+        '''
+        if hasattr(samples, 'record'):
+            labels = list(samples.variables) if labels is None else labels
+            samples = samples.record.sample
+        elif labels is None:
+            labels = list(self.bqm.variables)
+        samples = np.atleast_2d(np.asarray(samples))
+        full_labels = list(self.full_bqm.variables)
+        column = {label: i for i, label in enumerate(full_labels)}
+        states = np.zeros((len(samples), len(full_labels)), dtype=np.int8)
+        if len(labels):
+            states[:, [column[label] for label in labels]] = samples
+        for label, value in self.fixed.items():
+            states[:, column[label]] = value
+        for label, representative in self.merged.items():
+            states[:, column[label]] = states[:, column[representative]]
+        return dimod.SampleSet.from_samples_bqm((states, full_labels), self.full_bqm)
+
+    def __repr__(self):
+        return (f"Presolved({self.full_bqm.num_variables} -> {self.bqm.num_variables} variables, "
+                f"{self.full_bqm.num_interactions} -> {self.bqm.num_interactions} couplers)")
+
+
+def drop_small_biases(bqm: dimod.BinaryQuadraticModel, atol: float) -> int:
+    '''Remove couplers and zero linear biases smaller than atol, returning the couplers removed'''
+    small = [interaction for interaction, bias in bqm.quadratic.items() if abs(bias) < atol]
+    bqm.remove_interactions_from(small)
+    for variable, bias in bqm.linear.items():
+        if abs(bias) < atol:
+            bqm.set_linear(variable, 0)
+    return len(small)
+
+
+def dominated_values(problem, atol: float = 1e-9) -> dict:
+    '''
+    {discrete variable position: positions of dominated values}. Value s of a variable is
+    dominated by t if choosing s instead of t can never lower the energy: the linear bias of s
+    minus that of t, plus every negative difference of their couplers to other variables, is
+    not negative. Dropping s then keeps an optimum. Variables whose domain wall variables are
+    used by terms directly are left alone, and every variable keeps at least one value.
+    '''
+    linear, (rows, cols, biases), _ = term_coefficients(problem)
+    parent, one_hot_position, is_wall = encoding_maps(problem)
+    frozen = wall_users(parent, is_wall, linear, rows, cols, atol)
+    # couplers within a variable vanish whichever single value it takes
+    cross = parent[rows] != parent[cols]
+    rows, cols, biases = rows[cross], cols[cross], biases[cross]
+    n = len(problem.registry)
+    couplers = sp.coo_matrix(
+        (np.concatenate([biases, biases]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), shape=(n, n)
+    ).tocsr()
+
+    dropped = {}
+    for i, variable in enumerate(problem.discrete_variables):
+        if i in frozen or len(variable.domain) < 2:
+            continue
+        labels = [binary_variable.index for binary_variable in variable.one_hot_variable_list]
+        block = couplers[labels]
+        alive = list(range(len(labels)))
+        for s in range(len(labels)):
+            for t in alive:
+                if t == s:
+                    continue
+                difference = block[s] - block[t]
+                if linear[labels[s]] - linear[labels[t]] + difference.minimum(0).sum() >= -atol:
+                    alive.remove(s)
+                    break
+        if len(alive) < len(labels):
+            dropped[i] = sorted(set(range(len(labels))) - set(alive))
+    return dropped
+
+
+def _value_reductions(problem, dropped: dict):
+    '''
+    fixed and merged labels of the compiled BQM that drop the given values. A one-hot variable
+    is fixed to 0. For a domain wall variable x_s = d_{s+1} - d_s = 0 merges wall s + 1 into
+    wall s, so runs of dropped values share one wall, fixed when it is the start or the end.
+    '''
+    fixed, merged = {}, {}
+    for i, slots in dropped.items():
+        variable = problem.discrete_variables[i]
+        if variable.encoding_type == "one-hot":
+            for slot in slots:
+                fixed[variable.one_hot_variable_list[slot].index] = 0
+            continue
+        k = len(variable.domain)
+        representative = list(range(k + 1))
+        for slot in slots:
+            representative[slot + 1] = representative[slot]
+        walls = variable.domain_wall_variable_list
+        for position in range(1, k):
+            r = representative[position]
+            if r == 0:
+                fixed[walls[position].index] = 0
+            elif r == representative[k]:
+                fixed[walls[position].index] = 1
+            elif r != position:
+                merged[walls[position].index] = walls[r].index
+    return fixed, merged
+
+
+def persistencies(bqm: dimod.BinaryQuadraticModel, atol: float = 1e-9) -> dict:
+    '''
+    Variables every optimum agrees on, from the bound on each variable's local field: x is 0
+    if its linear bias plus all its negative couplers is still positive, 1 if its linear bias
+    plus all its positive couplers is still negative. Repeated until nothing more is fixed.
+    '''
+    fixed = {}
+    bqm = bqm.copy()
+    while bqm.num_variables:
+        labels = list(bqm.variables)
+        linear, (rows, cols, biases), _ = bqm.to_numpy_vectors(variable_order=labels)
+        negative = np.minimum(biases, 0)
+        positive = np.maximum(biases, 0)
+        lower = linear + np.bincount(rows, negative, len(linear)) + np.bincount(cols, negative, len(linear))
+        upper = linear + np.bincount(rows, positive, len(linear)) + np.bincount(cols, positive, len(linear))
+        found = {labels[i]: 0 for i in np.flatnonzero(lower > atol)}
+        found.update({labels[i]: 1 for i in np.flatnonzero(upper < -atol)})
+        if not found:
+            break
+        fixed.update(found)
+        bqm.fix_variables(found)
+    return fixed
+
+
+def presolve(problem, atol: float = 1e-9, use_roof_duality: bool = True, drop_dominated: bool = True) -> Presolved:
+    '''
+    Reduce the compiled BQM of a Problem before sampling: drop biases smaller than atol,
+    drop dominated domain values, then fix the variables that take the same value in every
+    optimum, by roof duality where dwave-preprocessing is installed and by local field bounds
+    otherwise. Parallel couplers are already merged by the compile. The Presolved result
+    maps samples of the reduced model back to the full one.
+    '''
+    problem.compute_bqm()
+    full_bqm = problem.BQM
+    bqm = full_bqm.copy()
+    presolved = Presolved(bqm, full_bqm)
+    presolved.stats["dropped_couplers"] = drop_small_biases(bqm, atol)
+
+    if drop_dominated:
+        dropped = dominated_values(problem, atol)
+        fixed, merged = _value_reductions(problem, dropped)
+        fixed = {label: value for label, value in fixed.items() if label in bqm.variables}
+        merged = {label: representative for label, representative in merged.items() if label in bqm.variables}
+        substitutions = {label: {representative: 1} for label, representative in merged.items()}
+        bqm = linear_substitute_bqm(bqm, substitutions, fixed)
+        presolved.fixed.update(fixed)
+        presolved.merged.update(merged)
+        presolved.dropped_values = [(i, problem.discrete_variables[i].domain[slot]) for i, slots in dropped.items() for slot in slots]
+
+    if use_roof_duality and roof_duality is not None:
+        _, fixed = roof_duality(bqm, strict=True)
+    else:
+        fixed = persistencies(bqm, atol)
+    bqm.fix_variables(fixed)
+    presolved.fixed.update(fixed)
+
+    presolved.bqm = bqm
+    presolved.stats.update({
+        "dropped_values": len(presolved.dropped_values),
+        "fixed": len(presolved.fixed),
+        "merged": len(presolved.merged),
+        "variables": (full_bqm.num_variables, bqm.num_variables),
+        "interactions": (full_bqm.num_interactions, bqm.num_interactions),
+    })
+    return presolved
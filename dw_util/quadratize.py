@@ -0,0 +1,179 @@
+import heapq
+import itertools
+
+
+class QuadratizationResult:
+    '''The outcome of Problem.quadratize'''
+    def __init__(self, ancillas: list, reused: list, terms: int, vanished: int, max_degree: int):
+        # ancillary binary variables made by this pass, in order, and older ones it used again
+        self.ancillas = ancillas
+        self.reused = reused
+        # higher order terms reduced, and those dropped as always zero on valid states
+        self.terms = terms
+        self.vanished = vanished
+        self.max_degree = max_degree
+
+    def __repr__(self):
+        return (f"QuadratizationResult({self.terms} terms of degree up to {self.max_degree}, "
+                f"{len(self.ancillas)} new ancillas, {len(self.reused)} reused, {self.vanished} vanished)")
+
+
+def vanishes(variables) -> bool:
+    '''Whether a product holds two one-hot variables of the same discrete variable, so is 0 on valid states'''
+    parents = [id(variable.parent_variable) for variable in variables if variable.role == "one-hot"]
+    return len(parents) != len(set(parents))
+
+
+def expand(variables, coefficient) -> dict:
+    '''
+    A product as {frozenset of labels: coefficient} over variables that are binary in every
+    state. The indicator of value s of a domain wall variable is written as d_{s+1} - d_s over
+    its walls, as the compile substitutes it, but before the ancillas are made: an ancilla
+    for the substituted indicator, which is -1 on broken walls, could pay for breaking them.
+    The fixed ends d_0 = 0 and d_k = 1 are applied.
+    '''
+    expanded = {frozenset(): coefficient}
+    for variable in variables:
+        parent = variable.parent_variable
+        if variable.role == "one-hot" and parent.encoding_type == "domain-wall":
+            walls = parent.domain_wall_variable_list
+            left, right = walls[variable.position], walls[variable.position + 1]
+            factors = [] if left is walls[0] else [(left.index, -1)]
+            factors.append((None, 1) if right is walls[-1] else (right.index, 1))
+        else:
+            factors = [(variable.index, 1)]
+        product = {}
+        for labels, bias in expanded.items():
+            for label, sign in factors:
+                key = labels if label is None else labels | {label}
+                product[key] = product.get(key, 0) + sign * bias
+        expanded = {labels: bias for labels, bias in product.items() if bias != 0}
+    return expanded
+
+
+def _pairs(monomial):
+    return itertools.combinations(sorted(monomial), 2)
+
+
+def reduce_monomials(monomials: list, pairs: dict, new_ancilla) -> tuple:
+    '''
+    Reduce sets of labels to at most two labels each by substituting pairs of labels with
+    ancillas, always the pair held by the most monomials still above degree two, so terms that
+    share a pair share its ancilla. pairs maps (u, v) with u < v to the label of an ancilla
+    and is extended with new_ancilla(u, v) when a pair has none yet. Returns the reduced
+    monomials and, for every ancilla used, the positions of the monomials it reduced.
+    '''
+    monomials = [set(monomial) for monomial in monomials]
+    holders = {}
+    for i, monomial in enumerate(monomials):
+        if len(monomial) > 2:
+            for pair in _pairs(monomial):
+                holders.setdefault(pair, set()).add(i)
+    # pairs that already have an ancilla go first on ties, then the smallest labels
+    heap = [(-len(held), pair not in pairs, pair) for pair, held in holders.items()]
+    heapq.heapify(heap)
+
+    users = {}
+    while heap:
+        count, _, pair = heapq.heappop(heap)
+        held = holders.get(pair)
+        if not held:
+            continue
+        if -count != len(held):
+            # counts only fall while a pair waits, so a stale entry is pushed back with its count
+            heapq.heappush(heap, (-len(held), pair not in pairs, pair))
+            continue
+        if pair not in pairs:
+            pairs[pair] = new_ancilla(*pair)
+        ancilla = pairs[pair]
+        touched = set()
+        for i in list(held):
+            monomial = monomials[i]
+            for old in _pairs(monomial):
+                holders[old].discard(i)
+            monomial -= set(pair)
+            monomial.add(ancilla)
+            users.setdefault(ancilla, []).append(i)
+            if len(monomial) > 2:
+                for new in _pairs(monomial):
+                    holders.setdefault(new, set()).add(i)
+                    touched.add(new)
+        for new in touched:
+            heapq.heappush(heap, (-len(holders[new]), new not in pairs, new))
+    return monomials, users
+
+
+def ancilla_strengths(users: dict, coefficients: list, components: dict) -> dict:
+    '''
+    The Rosenberg penalty each ancilla needs so that a wrong ancilla never pays: the sum of
+    the absolute coefficients of the terms it reduced, plus twice the strength of every ancilla
+    built on it, since flipping it changes their penalties by at most that much. components
+    maps every ancilla label to the pair of labels it stands for.
+    '''
+    strengths = {ancilla: sum(abs(coefficients[i]) for i in reduced) for ancilla, reduced in users.items()}
+    # an ancilla is always made after the ancillas of its pair, so has a larger label
+    for ancilla in sorted(components, reverse=True):
+        if ancilla not in strengths:
+            continue
+        for component in components[ancilla]:
+            if component in components:
+                strengths[component] = strengths.get(component, 0) + 2 * strengths[ancilla]
+    return strengths
+
+
+def quadratize(problem, terms) -> QuadratizationResult:
+    '''
+    Give every term of degree above two its reduced monomials, making ancillas for new pairs
+    and adding their penalties to the constraint terms, see Problem.quadratize.
+    '''
+    from dw_util.classes import AncillaConstraint, BinaryVariable
+
+    registry = problem.registry
+    terms = [term for term in terms if term.degree > 2]
+    dropped = [term for term in terms if vanishes(term.variables)]
+    for term in dropped:
+        term.reduced = []
+    terms = [term for term in terms if term.reduced is None]
+
+    made = []
+
+    def new_ancilla(u, v):
+        ancilla = BinaryVariable(
+            name=f"({registry[u]})*({registry[v]})",
+            represents=(registry[u], registry[v]),
+            role="ancilla",
+        )
+        problem.add_ancillary_variable(ancilla)
+        made.append(ancilla)
+        return ancilla.index
+
+    owners, coefficients, monomials = [], [], []
+    for term in terms:
+        for labels, coefficient in expand(term.variables, term.coefficient).items():
+            owners.append(term)
+            coefficients.append(coefficient)
+            monomials.append(labels)
+    monomials, users = reduce_monomials(monomials, problem._ancilla_pairs, new_ancilla)
+    for term in terms:
+        term.reduced = []
+    for term, monomial, coefficient in zip(owners, monomials, coefficients):
+        term.reduced.append((sorted(monomial), coefficient))
+
+    components = {
+        ancilla.index: (ancilla.represents[0].index, ancilla.represents[1].index)
+        for ancilla in problem.ancillary_variables
+        if isinstance(ancilla.represents, tuple)
+    }
+    strengths = ancilla_strengths(users, coefficients, components)
+    for label in sorted(strengths):
+        if strengths[label]:
+            problem.add_constraint_term(AncillaConstraint(registry[label], strengths[label]))
+
+    new_labels = {ancilla.index for ancilla in made}
+    return QuadratizationResult(
+        ancillas=made,
+        reused=[registry[label] for label in sorted(users) if label not in new_labels],
+        terms=len(terms),
+        vanished=len(dropped),
+        max_degree=max((term.degree for term in terms + dropped), default=0),
+    )
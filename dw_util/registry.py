@@ -0,0 +1,34 @@
+class VariableRegistry:
+    '''
+    Gives every binary variable of a Problem a dense integer index. The indices are used as
+    the labels of the compiled BQMs so that hashing and storage stay cheap for large models.
+    '''
+    __slots__ = ('variables',)
+
+    def __init__(self):
+        self.variables = []
+
+    def register(self, binary_variable) -> int:
+        if binary_variable.index is not None:
+            raise ValueError(f"{binary_variable} is already registered with index {binary_variable.index}")
+        binary_variable.index = len(self.variables)
+        self.variables.append(binary_variable)
+        return binary_variable.index
+
+    def register_at(self, binary_variable, index: int):
+        '''Register a variable at a known index, as when loading a saved Problem. Gaps are left as None'''
+        if index >= len(self.variables):
+            self.variables.extend([None] * (index + 1 - len(self.variables)))
+        if self.variables[index] is not None:
+            raise ValueError(f"Index {index} is already taken by {self.variables[index]}")
+        binary_variable.index = index
+        self.variables[index] = binary_variable
+
+    def __getitem__(self, index: int):
+        return self.variables[index]
+
+    def __len__(self):
+        return len(self.variables)
+
+    def __iter__(self):
+        return iter(self.variables)
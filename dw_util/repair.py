@@ -0,0 +1,78 @@
+import dimod
+import numpy as np
+
+from dw_util.evaluate import registry_states
+from dw_util.sampler import ValueModel, DiscreteAnnealingSampler
+
+
+def nearest_positions(problem, states: np.ndarray) -> np.ndarray:
+    '''
+    (n_reads x n_discrete) position of the valid encoding nearest in Hamming distance to each
+    variable's bits in registry states, so valid encodings are kept as they are. A one-hot
+    variable takes the first bit that is set (the first value if none is), a domain wall
+    variable the wall position that disagrees with the fewest of its walls.
+    '''
+    positions = np.zeros((len(states), len(problem.discrete_variables)), dtype=np.int64)
+    groups = {}
+    for column, variable in enumerate(problem.discrete_variables):
+        groups.setdefault((variable.encoding_type, len(variable.domain)), []).append(column)
+
+    for (encoding_type, k), columns in groups.items():
+        variables = [problem.discrete_variables[column] for column in columns]
+        if encoding_type == "one-hot":
+            index = np.array([[b.index for b in v.one_hot_variable_list] for v in variables])
+            positions[:, columns] = states[:, index].argmax(axis=2)
+        elif encoding_type == "domain-wall":
+            index = np.array([[b.index for b in v.virtual_variable_list] for v in variables], dtype=np.int64).reshape(len(columns), k - 1)
+            walls = states[:, index].astype(np.int64)
+            # at position q the inner walls 1..q should be 0 and q+1..k-1 should be 1
+            ones_before = np.concatenate([np.zeros(walls.shape[:2] + (1,), dtype=np.int64), np.cumsum(walls, axis=2)], axis=2)
+            zeros = 1 - walls
+            zeros_after = np.concatenate([np.cumsum(zeros[:, :, ::-1], axis=2)[:, :, ::-1], np.zeros(walls.shape[:2] + (1,), dtype=np.int64)], axis=2)
+            positions[:, columns] = (ones_before + zeros_after).argmin(axis=2)
+        else:
+            raise ValueError(f"Cannot repair encoding {encoding_type}")
+    return positions
+
+
+def greedy_descent(model: ValueModel, positions: np.ndarray, max_sweeps: int = 100) -> int:
+    '''
+    Move every variable of every read to its lowest energy value, a colour group at a time,
+    until a sweep changes nothing. Energies never go up. Returns the number of sweeps.
+    '''
+    fields = model.fields(positions)
+    for sweep in range(1, max_sweeps + 1):
+        changed = 0
+        for group in model.colours:
+            local = fields[:, model.slot_of[group]] + model.product_fields(positions, group)
+            current = np.take_along_axis(local, positions[:, group][:, :, None], axis=2)[:, :, 0]
+            best = local.argmin(axis=2)
+            # only strict improvements, so ties cannot cycle
+            better = np.take_along_axis(local, best[:, :, None], axis=2)[:, :, 0] < current - 1e-12
+            changed += model.move(positions, fields, group, np.where(better, best, positions[:, group]))
+        if not changed:
+            return sweep
+    return max_sweeps
+
+
+def repair(problem, samples, labels=None, descent: bool = False, max_sweeps: int = 100) -> dimod.SampleSet:
+    '''
+    Map every read to the nearest valid encoding of each discrete variable, all reads and all
+    variables of an encoding and domain size at once, then optionally run greedy descent on
+    the energy from there. samples is a dimod SampleSet or an (n_reads x n_vars) array whose
+    columns follow labels. The ancillas of quadratize are set to the product they stand for,
+    and descent needs every ancilla to stand for one. Returns a SampleSet over the labels of
+    Problem.BQM, with energies.
+    '''
+    problem.compute_bqm()
+    # built first so that a problem descent cannot handle is rejected before any work
+    model = ValueModel(problem) if descent else None
+    states = registry_states(problem, samples, labels)
+    positions = nearest_positions(problem, states)
+    info = {}
+    if descent:
+        info["sweeps"] = greedy_descent(model, positions, max_sweeps)
+    repaired_states, labels = DiscreteAnnealingSampler.binary_states(problem, positions)
+    sampleset = dimod.SampleSet.from_samples_bqm((repaired_states, labels), problem.BQM)
+    sampleset.info.update(info)
+    return sampleset
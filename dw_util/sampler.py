@@ -0,0 +1,315 @@
+import time
+
+import dimod
+import numpy as np
+import scipy.sparse as sp
+
+from dw_util.standalone import linear_substitute_bqm
+
+
+def csr_rows(matrix: sp.csr_matrix, rows: np.ndarray):
+    '''The entries of the given rows of a CSR matrix as (position in rows, column, value) arrays'''
+    starts, stops = matrix.indptr[rows], matrix.indptr[rows + 1]
+    lengths = stops - starts
+    entry = np.repeat(np.arange(len(rows)), lengths)
+    within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    positions = starts[entry] + within
+    return entry, matrix.indices[positions], matrix.data[positions]
+
+
+class ValueModel:
+    '''
+    The energy of a Problem over the values of its discrete variables. Every value of every
+    variable is a slot, each slot has a linear bias and the slots of different variables are
+    coupled, so the energy of an assignment is offset + sum h[slot] + sum J[slot, slot'] over
+    the chosen slots. Domain wall variables are written as d_j = x_0 + ... + x_{j-1}, which
+    holds for every valid encoding, so the model matches BQM on valid states and cannot
+    express invalid ones. The ancillas of quadratize are taken to equal the product they
+    stand for, so every term with an ancilla is a product term: its coefficient times whether
+    each of a few variables is at one of a set of positions. Ancillas that stand for no
+    product cannot be expressed over values and are rejected.
+    '''
+    def __init__(self, problem):
+        problem.compute_bqm()
+        free = [ancilla.name for ancilla in problem.ancillary_variables if not isinstance(ancilla.represents, tuple)]
+        if free:
+            raise ValueError(f"ValueModel cannot represent ancillary variables that stand for no product: {free}")
+        substitutions, fixed = {}, {}
+        for variable in problem.discrete_variables:
+            if variable.encoding_type == "domain-wall":
+                one_hot = [binary_variable.index for binary_variable in variable.one_hot_variable_list]
+                walls = variable.domain_wall_variable_list
+                for j, wall in enumerate(walls[1:-1], start=1):
+                    substitutions[wall.index] = {label: 1 for label in one_hot[:j]}
+                fixed[walls[0].index] = 0
+                fixed[walls[-1].index] = 1
+        bqm = problem.objective_bqm + problem.penalty_weight * problem.constraint_bqm
+        bqm = linear_substitute_bqm(bqm, substitutions, fixed)
+
+        ### Slots are numbered variable by variable, padded to the widest domain ###
+        variables = problem.discrete_variables
+        self.width = max((len(variable.domain) for variable in variables), default=1)
+        self.num_slots = sum(len(variable.domain) for variable in variables)
+        # slot_of[a, s] is the slot of value s of variable a, padding points to a spare slot
+        self.slot_of = np.full((len(variables), self.width), self.num_slots, dtype=np.int64)
+        self.domain_sizes = np.array([len(variable.domain) for variable in variables], dtype=np.int64)
+        slot_by_label = {}
+        owner = np.empty(self.num_slots + 1, dtype=np.int64)
+        slot = 0
+        for a, variable in enumerate(variables):
+            for s, binary_variable in enumerate(variable.one_hot_variable_list):
+                self.slot_of[a, s] = slot
+                slot_by_label[binary_variable.index] = slot
+                owner[slot] = a
+                slot += 1
+        owner[self.num_slots] = -1
+
+        ancillas = {ancilla.index for ancilla in problem.ancillary_variables}
+        self._product_terms(problem, bqm, ancillas)
+        bqm.remove_variables_from([label for label in bqm.variables if label in ancillas])
+        labels = list(bqm.variables)
+        linear, (rows, cols, biases), offset = bqm.to_numpy_vectors(variable_order=labels)
+        slots = np.array([slot_by_label[label] for label in labels], dtype=np.int64)
+        self.h = np.zeros(self.num_slots + 1)
+        np.add.at(self.h, slots, linear)
+        rows, cols = slots[rows], slots[cols]
+        # couplers within a variable are zero on valid states
+        cross = owner[rows] != owner[cols]
+        rows, cols, biases = rows[cross], cols[cross], biases[cross]
+        self.J = sp.coo_matrix(
+            (np.concatenate([biases, biases]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(self.num_slots + 1, self.num_slots + 1),
+        ).tocsr()
+        self.J.sum_duplicates()
+        self.offset = offset
+        self.owner = owner
+        self.colours = self._colour_classes(len(variables))
+
+    def _product_terms(self, problem, bqm, ancillas: set):
+        '''
+        The terms of bqm with an ancilla as product_variables (terms x degree, padded with -1),
+        product_masks (terms x degree x width, True where the variable meets its condition) and
+        product_coefficients. An ancilla is the AND of the conditions of the pair it stands for.
+        '''
+        column = {id(variable): a for a, variable in enumerate(problem.discrete_variables)}
+        positions = np.arange(self.width)
+        conditions = {}
+
+        def condition(label):
+            if label not in conditions:
+                binary_variable = problem.registry[label]
+                if label in ancillas:
+                    merged = dict(condition(binary_variable.represents[0].index))
+                    for a, mask in condition(binary_variable.represents[1].index).items():
+                        merged[a] = merged[a] & mask if a in merged else mask
+                    conditions[label] = merged
+                else:
+                    a = column[id(binary_variable.parent_variable)]
+                    # a one-hot bit is its value, a wall d_j is 1 on the values before it
+                    mask = positions == binary_variable.position if binary_variable.role == "one-hot" else positions < binary_variable.position
+                    conditions[label] = {a: mask}
+            return conditions[label]
+
+        terms = [((u,), bias) for u, bias in bqm.linear.items() if u in ancillas]
+        terms += [((u, v), bias) for (u, v), bias in bqm.quadratic.items() if u in ancillas or v in ancillas]
+        products = []
+        for term_labels, bias in terms:
+            merged = {}
+            for label in term_labels:
+                for a, mask in condition(label).items():
+                    merged[a] = merged[a] & mask if a in merged else mask
+            if bias and all(mask.any() for mask in merged.values()):
+                products.append((bias, {a: mask for a, mask in merged.items() if not mask.all()}))
+
+        degree = max((len(merged) for _, merged in products), default=0)
+        self.product_variables = np.full((len(products), degree), -1, dtype=np.int64)
+        self.product_masks = np.ones((len(products), degree, self.width), dtype=bool)
+        self.product_coefficients = np.array([bias for bias, _ in products], dtype=np.float64)
+        for t, (_, merged) in enumerate(products):
+            for d, (a, mask) in enumerate(sorted(merged.items())):
+                self.product_variables[t, d] = a
+                self.product_masks[t, d] = mask
+
+    def _conditions(self, positions: np.ndarray) -> np.ndarray:
+        '''(replicas x terms x degree) whether each variable of each product term meets its condition'''
+        t, d = np.indices(self.product_variables.shape)
+        met = self.product_masks[t, d, positions[:, np.maximum(self.product_variables, 0)]]
+        return met | (self.product_variables < 0)
+
+    def product_fields(self, positions: np.ndarray, group: np.ndarray):
+        '''(replicas x len(group) x width) energy the product terms add to each value of the group'''
+        if not len(self.product_coefficients):
+            return 0
+        member = np.full(len(self.domain_sizes), -1, dtype=np.int64)
+        member[group] = np.arange(len(group))
+        terms, places = np.nonzero((self.product_variables >= 0) & (member[np.maximum(self.product_variables, 0)] >= 0))
+        extra = np.zeros((len(positions), len(group), self.width))
+        if not len(terms):
+            return extra
+        unmet = ~self._conditions(positions)
+        # the term is on when every other variable meets its condition
+        others = (unmet[:, terms].sum(axis=2) - unmet[:, terms, places]) == 0
+        weights = others * self.product_coefficients[terms]
+        np.add.at(extra, (slice(None), member[self.product_variables[terms, places]]), weights[:, :, None] * self.product_masks[terms, places])
+        return extra
+
+    def product_energies(self, positions: np.ndarray) -> np.ndarray:
+        if not len(self.product_coefficients):
+            return np.zeros(len(positions))
+        return self._conditions(positions).all(axis=2) @ self.product_coefficients
+
+    def _colour_classes(self, num_variables: int) -> list:
+        '''
+        Groups of variables with no couplers or product terms between them, which can be
+        updated together
+        '''
+        coupled = self.J.tocoo()
+        a, b = self.owner[coupled.row], self.owner[coupled.col]
+        pairs = [
+            (u, v) for row in self.product_variables.tolist()
+            for u in row for v in row if u >= 0 and v >= 0 and u != v
+        ]
+        if pairs:
+            a = np.concatenate([a, np.array([u for u, _ in pairs], dtype=np.int64)])
+            b = np.concatenate([b, np.array([v for _, v in pairs], dtype=np.int64)])
+        graph = sp.csr_matrix((np.ones(len(a)), (a, b)), shape=(num_variables, num_variables))
+        colour = np.full(num_variables, -1, dtype=np.int64)
+        # largest degree first keeps the number of colours down
+        for variable in np.argsort(-np.diff(graph.indptr), kind='stable'):
+            taken = set(colour[graph.indices[graph.indptr[variable]:graph.indptr[variable + 1]]].tolist())
+            colour[variable] = next(c for c in range(num_variables + 1) if c not in taken)
+        return [np.flatnonzero(colour == c) for c in range(colour.max() + 1)] if num_variables else []
+
+    def fields(self, positions: np.ndarray) -> np.ndarray:
+        '''(replicas x slots) energy of choosing each slot given the other variables, spare slot inf'''
+        replicas = np.repeat(np.arange(len(positions)), positions.shape[1])
+        chosen = self.slot_of[np.arange(positions.shape[1]), positions].ravel()
+        x = sp.csr_matrix((np.ones(len(chosen)), (replicas, chosen)), shape=(len(positions), self.num_slots + 1))
+        fields = self.h + (x @ self.J).toarray()
+        fields[:, self.num_slots] = np.inf
+        return fields
+
+    def move(self, positions: np.ndarray, fields: np.ndarray, group: np.ndarray, chosen: np.ndarray) -> int:
+        '''
+        Set the variables of a colour group to the chosen positions in every replica, updating
+        positions and fields in place. Returns the number of values that changed.
+        '''
+        candidates = self.slot_of[group]
+        old = candidates[np.arange(len(group)), positions[:, group]]
+        new = candidates[np.arange(len(group)), chosen]
+        moved = old != new
+        if not moved.any():
+            return 0
+        positions[:, group] = chosen
+        # the fields gain the couplers of the new slots and lose those of the old ones
+        r = np.broadcast_to(np.arange(len(positions))[:, None], moved.shape)[moved]
+        entry, columns, biases = csr_rows(self.J, np.concatenate([new[moved], old[moved]]))
+        sign = np.where(entry < len(r), 1.0, -1.0)
+        np.add.at(fields, (np.concatenate([r, r])[entry], columns), sign * biases)
+        return int(moved.sum())
+
+    def energies(self, positions: np.ndarray, fields: np.ndarray) -> np.ndarray:
+        # each coupler is counted from both of its ends
+        chosen = self.slot_of[np.arange(positions.shape[1]), positions]
+        rows = np.arange(len(positions))[:, None]
+        return self.offset + 0.5 * (self.h[chosen] + fields[rows, chosen]).sum(axis=1) + self.product_energies(positions)
+
+    def default_beta_range(self):
+        '''Hot enough to accept the largest change half the time, cold enough to reject the smallest'''
+        magnitudes = np.abs(self.h) + np.asarray(abs(self.J).sum(axis=1)).ravel()
+        terms, places = np.nonzero(self.product_variables >= 0)
+        np.add.at(magnitudes, self.slot_of[self.product_variables[terms, places]],
+                  np.abs(self.product_coefficients)[terms, None] * self.product_masks[terms, places])
+        magnitudes = magnitudes[:-1]
+        nonzero = np.concatenate([np.abs(self.h[:-1]), np.abs(self.J.data), np.abs(self.product_coefficients)])
+        nonzero = nonzero[nonzero > 0]
+        if not len(nonzero):
+            return 0.1, 1.0
+        return np.log(2) / (2 * magnitudes.max()), np.log(100) / nonzero.min()
+
+
+class DiscreteAnnealingSampler:
+    '''
+    Simulated annealing over the values of the discrete variables of a Problem. A move sets a
+    variable to any value of its domain by heat bath, which for a domain wall variable shifts
+    its wall, so every state visited is a valid encoding. Variables without couplers between
+    them are updated together and all replicas advance in the same array operations. The
+    ancillas of quadratize are always set to the product they stand for; other ancillary
+    variables are not supported, see ValueModel.
+    '''
+    def sample(self, problem, num_reads: int = 100, num_sweeps: int = 1000, beta_range=None,
+               seed=None, initial_positions=None) -> dimod.SampleSet:
+        '''
+        Returns a dimod SampleSet over the labels of problem.BQM, with energies evaluated on it.
+        initial_positions optionally gives (num_reads x num_variables) starting positions in the
+        domains, random by default.
+        '''
+        start = time.perf_counter()
+        model = ValueModel(problem)
+        rng = np.random.default_rng(seed)
+        n = len(problem.discrete_variables)
+        if initial_positions is None:
+            positions = (rng.random((num_reads, n)) * model.domain_sizes).astype(np.int64)
+        else:
+            positions = np.array(initial_positions, dtype=np.int64).reshape(num_reads, n)
+        beta_range = model.default_beta_range() if beta_range is None else beta_range
+        betas = np.geomspace(beta_range[0], beta_range[1], num_sweeps)
+
+        fields = model.fields(positions)
+        for beta in betas:
+            for group in model.colours:
+                local = fields[:, model.slot_of[group]] + model.product_fields(positions, group)
+                # heat bath over the whole domain, padding has infinite energy
+                weights = np.exp(-beta * (local - local.min(axis=2, keepdims=True)))
+                cumulative = np.cumsum(weights, axis=2)
+                draw = rng.random((num_reads, len(group), 1)) * cumulative[:, :, -1:]
+                chosen = np.minimum((cumulative < draw).sum(axis=2), model.domain_sizes[group] - 1)
+                model.move(positions, fields, group, chosen)
+
+        states, labels = self.binary_states(problem, positions)
+        sampleset = dimod.SampleSet.from_samples_bqm((states, labels), problem.BQM)
+        sampleset.info.update({
+            "beta_range": tuple(float(beta) for beta in beta_range),
+            "num_colours": len(model.colours),
+            "seconds": time.perf_counter() - start,
+        })
+        return sampleset
+
+    @staticmethod
+    def binary_states(problem, positions: np.ndarray):
+        '''
+        (num_reads x len(BQM)) states and labels of the encodings of the given positions, with
+        every ancilla set to the product it stands for
+        '''
+        labels = list(problem.BQM.variables)
+        column = {label: i for i, label in enumerate(labels)}
+        states = np.zeros((len(positions), len(labels)), dtype=np.int8)
+        for a, variable in enumerate(problem.discrete_variables):
+            if variable.encoding_type == "one-hot":
+                for s, binary_variable in enumerate(variable.one_hot_variable_list):
+                    if binary_variable.index in column:
+                        states[:, column[binary_variable.index]] = positions[:, a] == s
+            else:
+                # the wall after the chosen value: d_j is 1 once j passes the position
+                for j, wall in enumerate(variable.domain_wall_variable_list):
+                    if wall.index in column:
+                        states[:, column[wall.index]] = j > positions[:, a]
+
+        parents = {id(variable): a for a, variable in enumerate(problem.discrete_variables)}
+        bits = {}
+
+        def bit(binary_variable):
+            if binary_variable.index not in bits:
+                if binary_variable.role == "ancilla":
+                    x, y = binary_variable.represents
+                    bits[binary_variable.index] = bit(x) & bit(y)
+                elif binary_variable.role == "one-hot":
+                    bits[binary_variable.index] = positions[:, parents[id(binary_variable.parent_variable)]] == binary_variable.position
+                else:
+                    bits[binary_variable.index] = binary_variable.position > positions[:, parents[id(binary_variable.parent_variable)]]
+            return bits[binary_variable.index]
+
+        for ancilla in problem.ancillary_variables:
+            if ancilla.index in column and isinstance(ancilla.represents, tuple):
+                states[:, column[ancilla.index]] = bit(ancilla)
+        return states, labels
@@ -1,4 +1,6 @@
 import dimod
+import numpy as np
+from scipy import sparse
 
 def substitute_bqm_variables(bqm: dimod.BinaryQuadraticModel, variable, linear_combination):
     linear_bias = bqm.linear[variable]
@@ -15,3 +17,90 @@ def substitute_bqm_variables(bqm: dimod.BinaryQuadraticModel, variable, linear_c
                 bqm.add_quadratic(var1, var2, original_bias * new_bias)
     return bqm
 
+
+def linear_substitute_bqm(bqm: dimod.BinaryQuadraticModel, substitutions: dict, fixed: dict = None):
+    '''
+    Apply every substitution x = sum(coeff * y) at once, treating the whole map as one sparse
+    matrix T so that the new model is T^T Q T plus the matching linear and offset parts.
+    Variables in `fixed` are replaced by their value, whether they appear in the model or only
+    on the right hand side of a substitution. Couplers that cancel exactly are dropped.
+    '''
+    fixed = fixed or {}
+    old_labels = list(bqm.variables)
+    new_labels, new_index = [], {}
+    rows, cols, data = [], [], []
+    constants = np.zeros(len(old_labels))
+    for i, label in enumerate(old_labels):
+        combination = substitutions.get(label, {label: 1})
+        for var, coeff in combination.items():
+            if var in fixed:
+                constants[i] += coeff * fixed[var]
+                continue
+            if var not in new_index:
+                new_index[var] = len(new_labels)
+                new_labels.append(var)
+            rows.append(i)
+            cols.append(new_index[var])
+            data.append(coeff)
+    n_old, n_new = len(old_labels), len(new_labels)
+    T = sparse.csr_matrix((data, (rows, cols)), shape=(n_old, n_new), dtype=np.float64)
+
+    linear, (irow, icol, qdata), offset = bqm.to_numpy_vectors(variable_order=old_labels)
+    Q = sparse.csr_matrix((qdata, (irow, icol)), shape=(n_old, n_old), dtype=np.float64)
+    Q_sym_constants = Q @ constants + Q.T @ constants
+
+    new_offset = offset + linear @ constants + constants @ (Q @ constants)
+    new_linear = T.T @ (linear + Q_sym_constants)
+
+    M = (T.T @ Q @ T).tocoo()
+    diagonal = M.row == M.col
+    new_linear += np.bincount(M.row[diagonal], weights=M.data[diagonal], minlength=n_new)
+    upper = sparse.coo_matrix(
+        (M.data[~diagonal], (np.minimum(M.row, M.col)[~diagonal], np.maximum(M.row, M.col)[~diagonal])),
+        shape=(n_new, n_new)
+    ).tocsr()
+    upper.eliminate_zeros()
+    upper = upper.tocoo()
+    return dimod.BinaryQuadraticModel.from_numpy_vectors(
+        new_linear, (upper.row, upper.col, upper.data), new_offset, bqm.vartype, variable_order=new_labels
+    )
+
+def bqm_energies(bqm: dimod.BinaryQuadraticModel, states: np.ndarray):
+    '''
+    Energies of a BQM with integer labels for every row of states, where column i of states
+    holds the value of the variable labelled i. Couplers are applied as one sparse product.
+    '''
+    labels = np.fromiter(bqm.variables, dtype=np.int64, count=bqm.num_variables)
+    linear, (irow, icol, qdata), offset = bqm.to_numpy_vectors(variable_order=labels.tolist())
+    values = np.asarray(states[:, labels], dtype=np.float64)
+    Q = sparse.csr_matrix((qdata, (irow, icol)), shape=(len(labels), len(labels)))
+    return offset + values @ linear + np.einsum('ij,ij->i', np.asarray((Q.T @ values.T).T), values)
+
+def drop_zero_interactions(bqm: dimod.BinaryQuadraticModel, interactions):
+    '''Remove the given interactions from a BQM where their bias has cancelled to exactly zero'''
+    for u, v in list(interactions):
+        if bqm.get_quadratic(u, v, default=None) == 0:
+            bqm.remove_interaction(u, v)
+
+
+def sparse_model(linear, rows, cols, biases, offset: float, format: str = "qubo", dtype=np.float64):
+    '''
+    (upper triangular CSR coupler matrix, linear vector, offset) of a binary model given as
+    arrays over positions 0..n-1, so that E(x) = linear @ x + x @ Q @ x + offset. With
+    format="ising" they describe the same energies over spins s = 2x - 1.
+    '''
+    linear = np.asarray(linear, dtype=np.float64)
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    biases = np.asarray(biases, dtype=np.float64)
+    n = len(linear)
+    if format == "ising":
+        # x = (s + 1) / 2
+        offset = offset + linear.sum() / 2 + biases.sum() / 4
+        linear = linear / 2 + (np.bincount(rows, biases, n) + np.bincount(cols, biases, n)) / 4
+        biases = biases / 4
+    elif format != "qubo":
+        raise ValueError(f"Unknown format {format}, expected 'qubo' or 'ising'")
+    upper_rows, upper_cols = np.minimum(rows, cols), np.maximum(rows, cols)
+    matrix = sparse.csr_matrix((biases.astype(dtype), (upper_rows, upper_cols)), shape=(n, n))
+    matrix.sum_duplicates()
+    return matrix, linear.astype(dtype), float(offset)
@@ -0,0 +1,172 @@
+import json
+import os
+
+import numpy as np
+from dimod import BinaryQuadraticModel as BQM
+
+from dw_util.accumulator import CoefficientAccumulator
+
+FORMAT = "dw_util-problem"
+VERSION = 1
+COLUMNS = ("labels", "linear", "rows", "cols", "biases")
+ROLES = {"one-hot": 0, "domain-wall": 1}
+
+# the compiled models of a Problem, by name of the attribute holding them
+COMPILED_MODELS = {
+    "objective": "_objective_bqm",
+    "constraint": "_constraint_bqm",
+    "objective_part": "_objective_part",
+    "constraint_part": "_constraint_part",
+    "BQM": "_BQM",
+}
+
+
+def _json_default(value):
+    # numpy scalars in domains
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot save domain value {value!r} of type {type(value).__name__}")
+
+
+def bqm_columns(bqm: BQM):
+    '''(labels, linear, rows, cols, biases), offset of a BQM with integer labels, rows and cols indexing labels'''
+    labels = np.fromiter(bqm.variables, dtype=np.int64, count=bqm.num_variables)
+    linear, (rows, cols, biases), offset = bqm.to_numpy_vectors(variable_order=labels.tolist())
+    return (labels, linear, rows, cols, biases), offset
+
+
+def accumulator_columns(accumulator: CoefficientAccumulator):
+    '''The columns of an indexed accumulator, reduced, with rows and cols holding registry indices'''
+    linear, (rows, cols, biases), offset = accumulator.reduce()
+    used = accumulator.used_variables()
+    return (used, linear[used], rows, cols, biases), offset
+
+
+def columns_to_bqm(columns) -> BQM:
+    labels, linear, rows, cols, biases, offset = columns
+    return BQM.from_numpy_vectors(linear, (rows, cols, biases), offset, 'BINARY', variable_order=labels.tolist())
+
+
+def _source_columns(problem, terms, streamed):
+    '''The terms and streamed coefficients a full compile starts from, without the variables' own constraints'''
+    accumulator = CoefficientAccumulator(num_variables=len(problem.registry))
+    for term in terms:
+        term.emit(accumulator)
+    accumulator.merge(streamed.total)
+    return accumulator_columns(accumulator)
+
+
+def save_problem(problem, path):
+    '''
+    Write a compiled Problem to the directory path: one .npy file per column of each model and
+    a meta.json holding the discrete variables, the index -> (variable, role, position) map
+    columns and the offsets. Terms are not kept; their coefficients are saved as the sources
+    of future full compiles.
+    '''
+    if problem.is_dirty:
+        problem.compute_bqm()
+    os.makedirs(path, exist_ok=True)
+
+    models = {}
+    for name, attribute in COMPILED_MODELS.items():
+        bqm = getattr(problem, attribute)
+        if bqm is not None:
+            models[name] = (bqm_columns(bqm), False)
+    models["objective_source"] = (_source_columns(problem, problem.objective_terms, problem._streamed_objective), True)
+    models["constraint_source"] = (_source_columns(problem, problem.constraint_terms, problem._streamed_constraint), True)
+
+    ### Index -> (discrete variable, role, position), -1 for indices of removed variables ###
+    parent = np.full(len(problem.registry), -1, dtype=np.int64)
+    role = np.full(len(problem.registry), -1, dtype=np.int8)
+    position = np.full(len(problem.registry), -1, dtype=np.int64)
+    for i, variable in enumerate(problem.discrete_variables):
+        for binary_variable in variable.all_binary_variables:
+            parent[binary_variable.index] = i
+            role[binary_variable.index] = ROLES[binary_variable.role]
+            position[binary_variable.index] = binary_variable.position
+
+    meta = {
+        "format": FORMAT,
+        "version": VERSION,
+        "penalty_weight": problem.penalty_weight,
+        "substitution_mode": problem.substitution_mode,
+        "num_binary_variables": len(problem.registry),
+        "discrete_variables": [
+            {
+                "name": variable.name,
+                "domain": list(variable.domain),
+                "encoding_type": variable.encoding_type,
+                "extra_properties": variable.extra_properties,
+            }
+            for variable in problem.discrete_variables
+        ],
+        # the pair of indices an ancilla stands for the product of, if any
+        "ancillary_variables": [
+            {
+                "name": ancilla.name,
+                "index": ancilla.index,
+                "represents": [binary_variable.index for binary_variable in ancilla.represents] if isinstance(ancilla.represents, tuple) else None,
+            }
+            for ancilla in problem.ancillary_variables
+        ],
+        "models": {},
+    }
+    for name, ((columns, offset), indexed) in models.items():
+        for column, array in zip(COLUMNS, columns):
+            np.save(os.path.join(path, f"{name}.{column}.npy"), np.ascontiguousarray(array))
+        meta["models"][name] = {"offset": float(offset), "indexed": indexed}
+    for column, array in [("parent", parent), ("role", role), ("position", position)]:
+        np.save(os.path.join(path, f"variables.{column}.npy"), array)
+    # written last, so a directory without it is an incomplete save
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1, default=_json_default)
+
+
+def load_problem(problem_class, path, mmap: bool = True):
+    '''
+    Read a Problem written by save_problem. The arrays are memory mapped (unless mmap is
+    False), so processes loading the same file share one copy, and the compiled BQMs are only
+    built from them when they are first used.
+    '''
+    from dw_util.classes import DiscreteVariable, BinaryVariable
+
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT or meta.get("version") != VERSION:
+        raise ValueError(f"{path} is not a saved Problem this version can read")
+    mmap_mode = "r" if mmap else None
+    load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+    problem = problem_class()
+    problem.penalty_weight = meta["penalty_weight"]
+    problem.substitution_mode = meta["substitution_mode"]
+    problem.discrete_variables = [
+        DiscreteVariable(entry["name"], entry["domain"], entry["encoding_type"], entry["extra_properties"])
+        for entry in meta["discrete_variables"]
+    ]
+    ### Put every binary variable back at its saved index ###
+    parent, role, position = (load(f"variables.{column}") for column in ("parent", "role", "position"))
+    for index in np.flatnonzero(parent >= 0):
+        variable = problem.discrete_variables[parent[index]]
+        binaries = variable.one_hot_variable_list if role[index] == ROLES["one-hot"] else variable.domain_wall_variable_list
+        problem.registry.register_at(binaries[position[index]], int(index))
+    if len(problem.registry) < meta["num_binary_variables"]:
+        problem.registry.variables.extend([None] * (meta["num_binary_variables"] - len(problem.registry)))
+    for entry in meta.get("ancillary_variables", []):
+        represents = tuple(problem.registry[index] for index in entry["represents"]) if entry["represents"] else None
+        ancilla = BinaryVariable(name=entry["name"], represents=represents, role="ancilla")
+        problem.registry.register_at(ancilla, entry["index"])
+        problem.ancillary_variables.append(ancilla)
+        if represents:
+            problem._ancilla_pairs[tuple(sorted(entry["represents"]))] = ancilla.index
+
+    models = {}
+    for name, entry in meta["models"].items():
+        models[name] = tuple(load(f"{name}.{column}") for column in COLUMNS) + (entry["offset"],)
+    num_variables = len(problem.registry)
+    for name, streamed in [("objective_source", problem._streamed_objective), ("constraint_source", problem._streamed_constraint)]:
+        labels, linear, rows, cols, biases, offset = models.pop(name)
+        streamed.total = CoefficientAccumulator.from_arrays(num_variables, labels, linear, rows, cols, biases, offset)
+    problem._stored_models = models
+    problem._compiled_penalty_weight = problem.penalty_weight
+    return problem
@@ -0,0 +1,116 @@
+import os
+from itertools import islice
+
+from dw_util.accumulator import CoefficientAccumulator
+from dw_util.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def chunked(iterable, chunk_size: int):
+    '''Lists of up to chunk_size items, pulled lazily from an iterable'''
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_edge_chunks(path, chunk_size: int = 100_000, delimiter: str = ",", skiprows: int = 0):
+    '''
+    (E x 2) integer arrays of at most chunk_size edges read lazily from a file. A .npy file is
+    memory mapped and sliced, anything else is read as delimited text a chunk of lines at a time.
+    '''
+    if os.fspath(path).endswith(".npy"):
+        edges = np.load(path, mmap_mode="r")
+        for start in range(0, len(edges), chunk_size):
+            yield np.asarray(edges[start:start + chunk_size], dtype=np.int64).reshape(-1, 2)
+        return
+    with open(path) as f:
+        for _ in range(skiprows):
+            next(f, None)
+        for lines in chunked(f, chunk_size):
+            lines = [line for line in lines if line.strip() and not line.lstrip().startswith("#")]
+            if lines:
+                yield np.loadtxt(lines, delimiter=delimiter, dtype=np.int64, ndmin=2).reshape(-1, 2)
+
+
+def iter_edge_source(edges, chunk_size: int = 100_000):
+    '''Edge chunks from a file path, a single (E x 2) array or an iterable of arrays'''
+    if isinstance(edges, (str, os.PathLike)):
+        yield from iter_edge_chunks(edges, chunk_size)
+    elif isinstance(edges, np.ndarray):
+        for start in range(0, len(edges), chunk_size):
+            yield np.asarray(edges[start:start + chunk_size], dtype=np.int64).reshape(-1, 2)
+    else:
+        for chunk in edges:
+            yield np.asarray(chunk, dtype=np.int64).reshape(-1, 2)
+
+
+class StreamedCoefficients:
+    '''
+    The coefficients of terms that were streamed into a Problem and then dropped. Each chunk is
+    folded into a running total, used by full compiles, and into the part added since the last
+    compile, used by incremental ones. Both are compacted as they grow so their size follows
+    the model rather than the number of terms.
+    '''
+    def __init__(self, compact_threshold: int = 1_000_000):
+        # made on first use, so a Problem that streams nothing allocates nothing
+        self._total = None
+        self._pending = None
+        self.compact_threshold = compact_threshold
+        self._total_compacted = 0
+        self._pending_compacted = 0
+
+    @property
+    def total(self) -> CoefficientAccumulator:
+        if self._total is None:
+            self._total = CoefficientAccumulator(num_variables=0)
+        return self._total
+
+    @total.setter
+    def total(self, accumulator: CoefficientAccumulator):
+        self._total = accumulator
+
+    @property
+    def pending(self) -> CoefficientAccumulator:
+        if self._pending is None:
+            self._pending = CoefficientAccumulator(num_variables=0)
+        return self._pending
+
+    def _fold_into(self, accumulator: CoefficientAccumulator, chunk: CoefficientAccumulator, compacted_size: int) -> int:
+        accumulator.resize(max(accumulator.num_variables, chunk.num_variables))
+        accumulator.merge(chunk)
+        # compact once the raw entries outgrow both the threshold and twice the last compacted size
+        if accumulator.num_entries > max(self.compact_threshold, 2 * compacted_size):
+            accumulator.compact()
+            return accumulator.num_entries
+        return compacted_size
+
+    def fold(self, chunk: CoefficientAccumulator):
+        self._total_compacted = self._fold_into(self.total, chunk, self._total_compacted)
+        self._pending_compacted = self._fold_into(self.pending, chunk, self._pending_compacted)
+
+    def drop_variables(self, labels):
+        '''
+        Forget the streamed coefficients of removed variables. Those already compiled are taken
+        back through the pending part, the same way a removed term is.
+        '''
+        if self._total is None:
+            return
+        compiled = self._total.drop_variables(labels)
+        if self._pending is not None:
+            compiled.merge(self._pending.drop_variables(labels), scale=-1.0)
+        self.pending.resize(max(self.pending.num_variables, compiled.num_variables))
+        self.pending.merge(compiled, scale=-1.0)
+
+    @property
+    def has_pending(self):
+        return self._pending is not None and not self._pending.empty
+
+    def take_pending(self) -> CoefficientAccumulator:
+        pending = self.pending
+        self._pending = None
+        self._pending_compacted = 0
+        return pending
@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from dimod import BinaryQuadraticModel as BQM
+
+
+def aligned_vectors(bqm: BQM, position: np.ndarray, num_variables: int):
+    '''The linear, coupler and offset arrays of a BQM with integer labels, indexed by position[label]'''
+    labels = np.fromiter(bqm.variables, dtype=np.int64, count=bqm.num_variables)
+    linear, (rows, cols, biases), offset = bqm.to_numpy_vectors(variable_order=labels.tolist())
+    aligned = np.zeros(num_variables)
+    aligned[position[labels]] = linear
+    return aligned, position[labels][rows], position[labels][cols], biases, offset
+
+
+class SharedModel:
+    '''
+    The objective and constraint parts of a compiled Problem packed into one shared memory
+    block, so worker processes can build any weighted model without the BQMs being pickled.
+    Only the small descriptor (block name, array layout) is sent to the workers.
+    '''
+    def __init__(self, objective: BQM, constraint: BQM, labels: list):
+        position = np.zeros(max(labels, default=-1) + 1, dtype=np.int64)
+        position[labels] = np.arange(len(labels))
+        arrays = {}
+        for name, bqm in [('objective', objective), ('constraint', constraint)]:
+            linear, rows, cols, biases, offset = aligned_vectors(bqm, position, len(labels))
+            arrays.update({
+                f'{name}_linear': linear, f'{name}_rows': rows, f'{name}_cols': cols,
+                f'{name}_biases': biases, f'{name}_offset': np.array([offset], dtype=np.float64),
+            })
+        arrays['labels'] = np.asarray(labels, dtype=np.int64)
+
+        self.layout = []
+        size = 0
+        for name, array in arrays.items():
+            self.layout.append((name, array.dtype.str, array.shape, size))
+            size += array.nbytes
+        self._memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, dtype, shape, start in self.layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self._memory.buf, offset=start)
+            view[...] = arrays[name]
+        self.descriptor = (self._memory.name, self.layout)
+
+    def close(self):
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def weighted_bqm_from_shared(descriptor, weight: float) -> BQM:
+    '''Attach to a SharedModel and build objective + weight * constraint from its arrays'''
+    name, layout = descriptor
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = {
+            key: np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=start)
+            for key, dtype, shape, start in layout
+        }
+        rows = np.concatenate([arrays['objective_rows'], arrays['constraint_rows']])
+        cols = np.concatenate([arrays['objective_cols'], arrays['constraint_cols']])
+        biases = np.concatenate([arrays['objective_biases'], weight * arrays['constraint_biases']])
+        bqm = BQM.from_numpy_vectors(
+            arrays['objective_linear'] + weight * arrays['constraint_linear'],
+            (rows, cols, biases),
+            float(arrays['objective_offset'][0] + weight * arrays['constraint_offset'][0]),
+            'BINARY',
+            variable_order=arrays['labels'].tolist()
+        )
+    finally:
+        memory.close()
+    return bqm
+
+
+def _sample_weight(descriptor, weight, sampler, num_reads, sampler_kwargs):
+    bqm = weighted_bqm_from_shared(descriptor, weight)
+    sampleset = sampler.sample(bqm, num_reads=num_reads, **sampler_kwargs)
+    return sampleset
+
+
+class SweepResult:
+    '''The outcome of sampling a Problem at one penalty weight'''
+    def __init__(self, weight, sampleset, evaluation):
+        self.weight = weight
+        self.sampleset = sampleset
+        self.evaluation = evaluation
+
+    @property
+    def feasibility_rate(self):
+        return float(self.evaluation.feasible.mean()) if len(self.evaluation) else 0.0
+
+    @property
+    def best_feasible_energy(self):
+        '''Lowest objective energy over the feasible reads, None if there are none'''
+        feasible = self.evaluation.feasible
+        return float(self.evaluation.objective[feasible].min()) if feasible.any() else None
+
+    def __repr__(self):
+        return f"SweepResult(weight={self.weight}, feasibility_rate={self.feasibility_rate:.3f}, best_feasible_energy={self.best_feasible_energy})"
+
+
+def sweep_penalty(problem, weights, sampler, num_reads: int = 100, max_workers: int = None, **sampler_kwargs):
+    if problem.is_dirty or problem._objective_part is None:
+        problem.compute_bqm()
+    if problem._objective_part is None:
+        raise ValueError(f"Penalty sweeps need the cached model parts of the sparse substitution mode, not {problem.substitution_mode}")
+    # the ancilla penalties of quadratize are constraint terms sized to keep the optimum at weight 1
+    if problem._has_product_ancillas() and min(weights, default=1) < 1:
+        raise ValueError(f"Penalty weights below 1 do not keep the optimum of a quadratized Problem, got {min(weights)}")
+    labels = list(problem.BQM.variables)
+    results = []
+    with SharedModel(problem._objective_part, problem._constraint_part, labels) as model:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_sample_weight, model.descriptor, weight, sampler, num_reads, sampler_kwargs)
+                for weight in weights
+            ]
+            for weight, future in zip(weights, futures):
+                sampleset = future.result()
+                results.append(SweepResult(weight, sampleset, problem.evaluate(sampleset)))
+    return results
@@ -0,0 +1,29 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import random
+
+import pytest
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+
+
+def random_problem(encoding_type, n=6, k=4, m=10, seed=0):
+    '''n variables with k values, m random not-equal terms and a random linear term on every value'''
+    rnd = random.Random(seed)
+    problem = Problem([], [])
+    for i in range(n):
+        problem.add_variable(DiscreteVariable(name=f"n{i}", domain=list(range(k)), encoding_type=encoding_type))
+    for _ in range(m):
+        a, b = rnd.sample(range(n), 2)
+        problem.add_objective_term(problem.discrete_variables[a] != problem.discrete_variables[b])
+    for discrete_variable in problem.discrete_variables:
+        for binary_variable in discrete_variable.one_hot_variable_list:
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], rnd.random()))
+    return problem
+
+
+@pytest.fixture
+def make_problem():
+    return random_problem
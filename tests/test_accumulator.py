@@ -0,0 +1,75 @@
+"""
+Tests for the coefficient accumulator used by Problem.compute_bqm.
+"""
+
+import numpy as np
+from dimod import BinaryQuadraticModel as BQM
+
+from dw_util.abstract import AbstractTerm
+from dw_util.accumulator import CoefficientAccumulator
+from dw_util.classes import Problem, DiscreteVariable
+
+
+def test_duplicates_are_merged():
+    accumulator = CoefficientAccumulator(capacity=1)
+    accumulator.add_linear("a", 1)
+    accumulator.add_linear("a", 2)
+    accumulator.add_quadratic("a", "b", 1)
+    accumulator.add_quadratic("b", "a", 3)
+    accumulator.add_quadratic("b", "b", 5)
+    accumulator.add_offset(-1)
+    expected = BQM({"a": 3, "b": 5}, {("a", "b"): 4}, -1, "BINARY")
+    assert accumulator.to_bqm() == expected
+
+
+def test_bulk_arrays_match_scalar_appends():
+    scalar, bulk = CoefficientAccumulator(), CoefficientAccumulator()
+    rows, cols = np.array([0, 1, 2, 0]), np.array([1, 2, 0, 1])
+    biases = np.array([1.0, -2.0, 0.5, 1.0])
+    for label in range(3):
+        scalar.add_variable(label)
+        bulk.add_variable(label)
+    for u, v, bias in zip(rows, cols, biases):
+        scalar.add_quadratic(int(u), int(v), bias)
+    bulk.add_quadratic_from_arrays(rows, cols, biases)
+    assert scalar.to_bqm() == bulk.to_bqm()
+
+
+def test_compiled_parts_match_per_term_bqms(make_problem):
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type)
+        problem.compute_objective_bqm()
+        problem.compute_constraint_bqm()
+        objective = BQM(vartype="BINARY")
+        for term in problem.objective_terms:
+            objective.update(term.BQM)
+        constraint = BQM(vartype="BINARY")
+        for variable in problem.discrete_variables:
+            constraint.update(variable.BQM)
+        by_index = lambda bqm: bqm.relabel_variables({v: v.index for v in bqm.variables}, inplace=False)
+        assert problem.objective_bqm == by_index(objective)
+        assert problem.constraint_bqm == by_index(constraint)
+
+
+class ProductOfFirstValues(AbstractTerm):
+    '''A term that only defines BQM, so it is compiled through the default emit'''
+    @property
+    def value(self):
+        return self.coefficient * self.variables[0].value * self.variables[1].value
+
+    @property
+    def BQM(self):
+        bqm = BQM(vartype="BINARY")
+        bqm.add_quadratic(self.variables[0], self.variables[1], self.coefficient)
+        bqm.add_linear(self.variables[0], -self.coefficient)
+        return bqm
+
+
+def test_terms_with_only_a_bqm_are_compiled_by_index():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        a, b = (DiscreteVariable(name, [0, 1, 2], encoding_type) for name in "ab")
+        problem = Problem([a, b])
+        x, y = a.one_hot_variable_list[0], b.one_hot_variable_list[0]
+        problem.add_objective_term(ProductOfFirstValues([x, y], 2.5))
+        problem.compute_bqm()
+        assert problem.objective_bqm == BQM({x.index: -2.5, y.index: 0}, {(x.index, y.index): 2.5}, 0, "BINARY")
@@ -0,0 +1,30 @@
+"""
+Smoke test for the scaling benchmark suite.
+"""
+
+from benchmarks.bench_compile import run_suite, compare, PHASES
+from benchmarks.bench_import import run as run_imports
+from benchmarks.bench_pipeline import run as run_pipeline
+
+
+def test_suite_records_every_phase():
+    suite = run_suite(sizes=[10], colours=[3], max_couplers=10_000)
+    assert len(suite["results"]) == 4
+    for result in suite["results"]:
+        assert list(result["phases"]) == PHASES
+        assert all(phase["seconds"] >= 0 and phase["peak_bytes"] >= 0 for phase in result["phases"].values())
+        # timed from the stages compute_bqm reports, so the sparse path has no fix_ends
+        assert result["phases"]["substitution"]["seconds"] > 0
+        assert result["phases"]["fix_ends"] == {"seconds": 0.0, "peak_bytes": 0}
+    assert compare(suite, suite) == []
+
+
+def test_pipeline_benchmark_runs():
+    result = run_pipeline(count=6, n=5, k=3, latency=0.01, max_in_flight=3, compile_workers=0)
+    assert not result["failed"]
+    assert result["pipeline_seconds"] > 0 and result["serial_seconds"] > 0
+
+
+def test_import_benchmark_runs():
+    results = run_imports(repeat=1, snippets={"interpreter": "pass", "import dw_util": "import dw_util"})
+    assert results["import dw_util"]["loaded"] == []
@@ -0,0 +1,58 @@
+"""
+Tests for the incremental energy delta engine.
+"""
+
+import numpy as np
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+
+
+def test_deltas_match_full_energies(make_problem):
+    rng = np.random.default_rng(0)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=6, m=10)
+        problem.penalty_weight = 2
+        problem.compute_bqm()
+        state = problem.local_state(rng.integers(0, 2, problem.BQM.num_variables))
+        energy = lambda: problem.BQM.energy(state.sample)
+        assert np.isclose(state.energy, energy())
+
+        before = energy()
+        for column, delta in enumerate(state.flip_deltas()):
+            state.flip(column)
+            assert np.isclose(energy() - before, delta)
+            state.flip(column)
+
+        # starting from a state that is not a valid encoding
+        assert (state.positions() < 0).any()
+        for variable in range(len(problem.discrete_variables)):
+            for position in rng.permutation(4):
+                before = energy()
+                delta = state.value_deltas([variable])[0, position]
+                assert np.isclose(state.set_value(variable, position), delta)
+                assert np.isclose(energy() - before, delta)
+                assert state.positions()[variable] == position
+        assert np.isclose(state.energy, energy())
+
+
+def test_local_state_with_unsorted_labels():
+    rng = np.random.default_rng(1)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        variables = [DiscreteVariable(name=f"n{i}", domain=list(range(3)), encoding_type=encoding_type) for i in range(4)]
+        problem = Problem(variables, [])
+        problem.add_objective_term(variables[3] != variables[2])
+        problem.compute_bqm()
+        problem.add_objective_term(variables[0] != variables[1])
+        for position, binary_variable in enumerate(variables[0].one_hot_variable_list):
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], 1.5 + position))
+        problem.compute_bqm()
+        labels = list(problem.BQM.variables)
+        assert labels != sorted(labels)
+        samples = rng.integers(0, 2, size=(10, len(labels)))
+        energies = problem.BQM.energies((samples, labels))
+        for sample, expected in zip(samples, energies):
+            state = problem.local_state(sample)
+            assert np.isclose(state.energy, expected)
+            flipped = np.tile(sample, (len(labels), 1))
+            np.fill_diagonal(flipped, 1 - sample)
+            assert np.allclose(state.flip_deltas(), problem.BQM.energies((flipped, labels)) - expected)
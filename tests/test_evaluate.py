@@ -0,0 +1,91 @@
+"""
+Tests for vectorized decoding and evaluation of samples.
+"""
+
+import numpy as np
+import dimod
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm, LinearEqualityConstraint
+from dw_util.standalone import bqm_energies
+
+
+def set_sample(problem, sample):
+    for label, value in sample.items():
+        problem.variable(label).value = int(value)
+
+
+def test_evaluate_matches_scalar_decoding(make_problem):
+    rng = np.random.default_rng(0)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=4, k=3, m=5)
+        problem.compute_bqm()
+        labels = list(problem.BQM.variables)
+        samples = rng.integers(0, 2, size=(200, len(labels)))
+        evaluation = problem.evaluate(samples)
+        for r, row in enumerate(samples):
+            set_sample(problem, dict(zip(labels, row)))
+            for column, variable in enumerate(problem.discrete_variables):
+                assert evaluation.valid[r, column] == variable.is_valid
+                if variable.is_valid:
+                    assert evaluation.values[r, column] == variable.value
+                else:
+                    assert variable.value == "Invalid"
+        assert evaluation.valid.any() and not evaluation.valid.all()
+
+
+def test_energy_matches_compiled_bqm(make_problem):
+    rng = np.random.default_rng(1)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=5, k=4, m=8)
+        problem.penalty_weight = 3
+        problem.compute_bqm()
+        labels = list(problem.BQM.variables)
+        sampleset = dimod.SampleSet.from_samples_bqm(
+            (rng.integers(0, 2, size=(100, len(labels))), labels), problem.BQM
+        )
+        evaluation = problem.evaluate(sampleset)
+        assert np.allclose(evaluation.energy, sampleset.record.energy)
+        # every constraint here penalises exactly the broken encodings
+        assert np.array_equal(evaluation.penalty > 0, ~evaluation.feasible)
+
+
+def test_evaluate_decodes_valid_domain_wall_sample():
+    problem = Problem()
+    problem.add_variable(DiscreteVariable(name="a", domain=["r", "g", "b"], encoding_type="domain-wall"))
+    problem.add_objective_term(BinaryLinearTerm([problem.discrete_variables[0].one_hot_variable_list[1]], 2.5))
+    problem.compute_bqm()
+    labels = [variable.index for variable in problem.discrete_variables[0].virtual_variable_list]
+    evaluation = problem.evaluate(np.array([[0, 1], [1, 1], [1, 0]]), labels=labels)
+    assert evaluation.values[0, 0] == "g" and evaluation.values[1, 0] == "r"
+    assert evaluation.values.mask[2, 0]
+    assert np.allclose(evaluation.objective[:2], [2.5, 0])
+    assert list(evaluation.feasible) == [True, True, False]
+
+
+def test_bqm_energies_with_unsorted_labels():
+    bqm = dimod.BQM({2: 1.0, 0: -2.0, 1: 0.5}, {(2, 0): 3.0, (0, 1): -1.0}, 0.25, 'BINARY')
+    states = np.array(list(np.ndindex(2, 2, 2)))
+    expected = bqm.energies((states, [0, 1, 2]))
+    assert np.allclose(bqm_energies(bqm, states), expected)
+
+
+def test_mixed_domains_keep_their_values():
+    problem = Problem()
+    problem.add_variable(DiscreteVariable(name="a", domain=[0, 1, 2], encoding_type="one-hot"))
+    problem.add_variable(DiscreteVariable(name="b", domain=["x", "y"], encoding_type="one-hot"))
+    problem.compute_bqm()
+    labels = [b.index for variable in problem.discrete_variables for b in variable.one_hot_variable_list]
+    evaluation = problem.evaluate(np.array([[0, 0, 1, 0, 1]]), labels=labels)
+    assert evaluation.values[0, 0] == 2 and isinstance(evaluation.values[0, 0], int)
+    assert evaluation.values[0, 1] == "y"
+
+
+def test_rounding_does_not_violate_a_satisfied_constraint():
+    problem = Problem()
+    problem.add_variable(DiscreteVariable(name="a", domain=[0, 1], encoding_type="one-hot"))
+    x, y = problem.discrete_variables[0].one_hot_variable_list
+    problem.add_constraint_term(LinearEqualityConstraint([0.1, 0.2], [x, y], 0.3))
+    problem.compute_bqm()
+    evaluation = problem.evaluate(np.array([[1, 1], [1, 0]]), labels=[x.index, y.index])
+    # x = y = 1 breaks the one-hot encoding but satisfies the equality, whose penalty rounds to -2.8e-17
+    assert list(evaluation.violations[:, -1]) == [False, True]
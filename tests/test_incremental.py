@@ -0,0 +1,93 @@
+"""
+Tests for incremental recompilation of a Problem.
+"""
+
+import random
+
+import numpy as np
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+
+
+def assert_same_model(a, b):
+    assert set(a.variables) == set(b.variables)
+    assert abs(a.offset - b.offset) < 1e-9
+    for v in a.variables:
+        assert abs(a.linear[v] - b.linear[v]) < 1e-9
+    nonzero = lambda bqm: {frozenset(k): bias for k, bias in bqm.quadratic.items() if abs(bias) > 1e-9}
+    qa, qb = nonzero(a), nonzero(b)
+    assert qa.keys() == qb.keys()
+    for key in qa:
+        assert abs(qa[key] - qb[key]) < 1e-9
+
+
+def full_rebuild(problem):
+    problem.compute_bqm(incremental=False)
+    return problem.BQM.copy()
+
+
+def test_added_and_removed_terms_are_patched(make_problem):
+    rnd = random.Random(3)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=8, k=4, m=12)
+        problem.compute_bqm()
+        variables = problem.discrete_variables
+        for _ in range(5):
+            term = problem.objective_terms[rnd.randrange(len(problem.objective_terms))]
+            problem.remove_objective_term(term)
+            a, b = rnd.sample(range(len(variables)), 2)
+            problem.add_objective_term(variables[a] != variables[b])
+            problem.add_objective_term(BinaryLinearTerm([variables[a].one_hot_variable_list[0]], rnd.random()))
+            assert problem.is_dirty
+            problem.compute_bqm()
+            assert not problem.is_dirty
+            patched = problem.BQM.copy()
+            assert_same_model(patched, full_rebuild(problem))
+
+
+def test_added_and_removed_variables_are_patched(make_problem):
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=4, k=3, m=4)
+        problem.compute_bqm()
+        new = DiscreteVariable(name="extra", domain=[0, 1, 2], encoding_type=encoding_type)
+        problem.add_variable(new)
+        edge = new != problem.discrete_variables[0]
+        problem.add_objective_term(edge)
+        problem.compute_bqm()
+        assert_same_model(problem.BQM.copy(), full_rebuild(problem))
+
+        problem.remove_objective_term(edge)
+        problem.remove_variable(new)
+        problem.compute_bqm()
+        patched = problem.BQM.copy()
+        assert not {b.index for b in new.all_binary_variables} & set(patched.variables)
+        assert_same_model(patched, full_rebuild(problem))
+
+
+def test_penalty_weight_rescales_cached_constraint_part(make_problem):
+    problem = make_problem("domain-wall", n=5, k=3, m=6)
+    problem.compute_bqm()
+    constraint_part = problem._constraint_part
+    problem.penalty_weight = 7.5
+    assert problem.is_dirty
+    problem.compute_bqm()
+    assert problem._constraint_part is constraint_part
+    assert_same_model(problem.BQM.copy(), full_rebuild(problem))
+
+
+def test_evaluate_after_incremental_compile():
+    rng = np.random.default_rng(4)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        variables = [DiscreteVariable(name=f"n{i}", domain=list(range(3)), encoding_type=encoding_type) for i in range(4)]
+        problem = Problem(variables, [])
+        problem.add_objective_term(variables[3] != variables[2])
+        problem.compute_bqm()
+        # the patch appends labels below those already compiled, leaving them unsorted
+        problem.add_objective_term(variables[0] != variables[1])
+        for position, binary_variable in enumerate(variables[0].one_hot_variable_list):
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], 1.5 + position))
+        problem.compute_bqm()
+        labels = list(problem.BQM.variables)
+        samples = rng.integers(0, 2, size=(50, len(labels)))
+        evaluation = problem.evaluate(samples, labels=labels)
+        assert np.allclose(evaluation.energy, problem.BQM.energies((samples, labels)))
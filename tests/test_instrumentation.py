@@ -0,0 +1,35 @@
+"""
+Tests for compile instrumentation.
+"""
+
+
+def test_stages_are_recorded_and_forwarded(make_problem):
+    problem = make_problem("domain-wall", n=5, k=3, m=6)
+    assert problem.compile_stats is None
+    stages, compiles = [], []
+    problem.enable_instrumentation(on_stage=[stages.append], on_compile=[compiles.append])
+    problem.compute_bqm()
+    stats = problem.compile_stats
+    assert stats.mode == "full"
+    assert [stage.name for stage in stats.stages] == [
+        "compute_objective_bqm", "compute_constraint_bqm", "kill_impossible_terms", "substitution", "combine", "verify_bqm"
+    ]
+    assert stages == stats.stages and compiles == [stats]
+    assert stats["substitution"].counts["substitutions"] == 5 * 3
+    assert stats["combine"].after["BQM"] == (problem.BQM.num_variables, problem.BQM.num_interactions)
+    assert stats.seconds >= 0 and stats.as_dict()["stages"][0]["name"] == "compute_objective_bqm"
+
+    problem.add_objective_term(problem.discrete_variables[0] != problem.discrete_variables[1])
+    problem.penalty_weight = 2
+    problem.compute_bqm()
+    assert problem.compile_stats.mode == "incremental"
+    assert problem.compile_stats["compile_pending"].counts["objective_changes"] == 1
+    assert problem.compile_stats.stages[-1].name == "reweight"
+
+
+def test_disabled_instrumentation_records_nothing(make_problem):
+    problem = make_problem("one-hot", n=3, k=3, m=2)
+    problem.enable_instrumentation()
+    problem.disable_instrumentation()
+    problem.compute_bqm()
+    assert problem.compile_stats is None
@@ -0,0 +1,61 @@
+"""
+Tests for the lazy import layout.
+"""
+
+import subprocess
+import sys
+
+from benchmarks.bench_import import REPORT
+
+
+def run(code):
+    return subprocess.run([sys.executable, "-c", code + REPORT], check=True, capture_output=True, text=True).stdout.strip().splitlines()
+
+
+def test_building_a_model_loads_neither_dimod_nor_numpy():
+    output = run(
+        "from dw_util import Problem, DiscreteVariable\n"
+        "a, b = DiscreteVariable('a', [0, 1, 2], 'domain-wall'), DiscreteVariable('b', [0, 1, 2], 'one-hot')\n"
+        "problem = Problem([a, b])\n"
+        "problem.add_objective_term(a != b)\n"
+        "problem.add_objective_term(a.indicator(0) * b.indicator(1) * 2)\n"
+    )
+    assert output[-1] == "[]"
+
+
+def test_models_build_without_dimod_installed():
+    output = run(
+        "import sys\n"
+        "sys.modules['dimod'] = None\n"
+        "from dw_util import Problem, DiscreteVariable\n"
+        "a, b = DiscreteVariable('a', [0, 1], 'one-hot'), DiscreteVariable('b', [0, 1], 'one-hot')\n"
+        "problem = Problem([a, b])\n"
+        "problem.add_objective_term(a != b)\n"
+        "try:\n"
+        "    problem.compute_bqm()\n"
+        "except ImportError:\n"
+        "    print('needs dimod')\n"
+    )
+    assert output[-2] == "needs dimod"
+
+
+def test_top_level_names_resolve():
+    import dw_util
+    from dw_util.classes import Problem
+
+    assert dw_util.Problem is Problem
+    assert set(dw_util.__all__) <= set(dir(dw_util))
+
+
+def test_other_importers_get_the_real_modules():
+    output = run(
+        "import sys, types\n"
+        "import dw_util.classes\n"
+        "print('numpy' in sys.modules, 'dimod' in sys.modules)\n"
+        "from dw_util import Problem, DiscreteVariable\n"
+        "problem = Problem([DiscreteVariable('a', [0, 1], 'one-hot')])\n"
+        "problem.compute_bqm()\n"
+        "import numpy, dimod\n"
+        "print(type(numpy) is types.ModuleType and type(dimod) is types.ModuleType)\n"
+    )
+    assert output[:2] == ["False False", "True"]
@@ -0,0 +1,35 @@
+"""
+Tests for the closed-form linear equality constraint.
+"""
+
+import itertools
+
+import numpy as np
+
+from dw_util.accumulator import CoefficientAccumulator
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm, ConstantTerm, Collection, LinearEqualityConstraint
+
+
+def test_one_hot_constraint_matches_squared_collection():
+    variable = DiscreteVariable(name="a", domain=list(range(5)), encoding_type="one-hot")
+    linear_terms = [BinaryLinearTerm([b]) for b in variable.binary_variables] + [ConstantTerm(-1)]
+    assert variable.constraint_list[0].BQM == (Collection(linear_terms) ** 2).BQM
+
+
+def test_linear_equality_penalty_is_squared_residual():
+    problem = Problem()
+    problem.add_variable(DiscreteVariable(name="a", domain=list(range(4)), encoding_type="one-hot"))
+    variables = problem.discrete_variables[0].binary_variables
+    coefficients = [1.0, -2.0, 0.5, 3.0]
+    constraint = LinearEqualityConstraint(coefficients, variables, rhs=1.5, coefficient=2)
+    problem.add_constraint_term(constraint)
+    problem.compute_bqm()
+    accumulator = CoefficientAccumulator(num_variables=len(problem.registry))
+    constraint.emit(accumulator)
+    bqm = accumulator.to_bqm()
+    for bits in itertools.product([0, 1], repeat=4):
+        for variable, bit in zip(variables, bits):
+            variable.value = bit
+        expected = 2 * (np.dot(coefficients, bits) - 1.5) ** 2
+        assert abs(bqm.energy({v.index: bit for v, bit in zip(variables, bits)}) - expected) < 1e-9
+        assert abs(constraint.value - expected) < 1e-9
@@ -0,0 +1,30 @@
+"""
+Tests for the bulk not-equal edge builder.
+"""
+
+import numpy as np
+
+from dw_util.classes import Problem, DiscreteVariable, NotEqualTerm
+
+
+def test_not_equal_edges_match_per_edge_terms():
+    rng = np.random.default_rng(2)
+    # overlapping, differently ordered domains
+    domains = [[int(x) for x in rng.permutation(5)[:3 + i % 3]] if i % 2 else list(range(4)) for i in range(8)]
+    for encoding_type in ["one-hot", "domain-wall"]:
+        models = []
+        for bulk in [False, True]:
+            problem = Problem()
+            for i, domain in enumerate(domains):
+                problem.add_variable(DiscreteVariable(name=f"n{i}", domain=domain, encoding_type=encoding_type))
+            edges = np.random.default_rng(7).integers(0, 8, size=(20, 2))
+            edges = edges[edges[:, 0] != edges[:, 1]]
+            if bulk:
+                problem.add_not_equal_edges(edges, weight=1.5)
+            else:
+                for a, b in edges:
+                    problem.add_objective_term(NotEqualTerm([problem.discrete_variables[a], problem.discrete_variables[b]], 1.5))
+            problem.compute_bqm()
+            models.append((problem.objective_bqm, problem.BQM))
+        assert models[0][0] == models[1][0]
+        assert models[0][1] == models[1][1]
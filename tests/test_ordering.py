@@ -0,0 +1,58 @@
+"""
+Tests for the coupler minimising domain ordering.
+"""
+
+import numpy as np
+from dimod import ExactSolver
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm, BinaryQuadraticTerm
+
+
+def shuffled_colouring(n=5, k=4, seed=0):
+    rng = np.random.default_rng(seed)
+    problem = Problem()
+    for i in range(n):
+        problem.add_variable(DiscreteVariable(name=f"n{i}", domain=rng.permutation(k).tolist(), encoding_type="domain-wall"))
+    problem.add_not_equal_edges([(i, j) for i in range(n) for j in range(i + 1, n)])
+    for variable in problem.discrete_variables:
+        for binary_variable in variable.one_hot_variable_list:
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], 0.1 * binary_variable.represents))
+    problem.penalty_weight = 5
+    return problem
+
+
+def ground_state(problem):
+    sampleset = ExactSolver().sample(problem.BQM).lowest()
+    evaluation = problem.evaluate(sampleset)
+    return sampleset.first.energy, evaluation.values[evaluation.feasible].tolist()
+
+
+def test_reordering_removes_couplers_and_keeps_the_model():
+    problem = shuffled_colouring()
+    problem.compute_bqm()
+    energy, values = ground_state(problem)
+    result = problem.optimize_domain_orders()
+    assert result.after < result.before
+    assert result.orders
+    reordered_energy, reordered_values = ground_state(problem)
+    assert abs(energy - reordered_energy) < 1e-9
+    assert sorted(map(tuple, values)) == sorted(map(tuple, reordered_values))
+
+
+def test_permute_domain_moves_one_hot_variables():
+    variable = DiscreteVariable(name="x", domain=["a", "b", "c"], encoding_type="domain-wall")
+    b = variable.one_hot_variable_list[1]
+    variable.permute_domain([1, 2, 0])
+    assert variable.domain == ["b", "c", "a"]
+    assert variable.one_hot_variable_list[0] is b and b.position == 0
+    assert b.dw_neigbours == variable.domain_wall_variable_list[:2]
+    assert variable.domain_wall_variable_list[1].name == "x dw[b, c]"
+
+
+def test_variables_used_through_walls_keep_their_order():
+    problem = shuffled_colouring()
+    first, second = problem.discrete_variables[:2]
+    domain = list(first.domain)
+    problem.add_objective_term(BinaryQuadraticTerm([first.domain_wall_variable_list[2], second.one_hot_variable_list[0]], 1.0))
+    result = problem.optimize_domain_orders()
+    assert 0 not in result.orders and first.domain == domain
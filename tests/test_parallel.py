@@ -0,0 +1,32 @@
+"""
+Tests for compiling terms in parallel worker processes.
+"""
+
+import pytest
+
+from dw_util import parallel
+from dw_util.classes import ConstantTerm, LinearEqualityConstraint
+
+
+@pytest.mark.skipif(not parallel.can_fork(), reason="parallel compile needs fork")
+def test_parallel_compile_matches_serial(monkeypatch, make_problem):
+    monkeypatch.setattr(parallel, "MIN_ITEMS_PER_WORKER", 5)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        serial, split = make_problem(encoding_type, n=20, m=60), make_problem(encoding_type, n=20, m=60)
+        for problem in [serial, split]:
+            problem.add_objective_term(ConstantTerm(0.1))
+            problem.add_constraint_term(LinearEqualityConstraint(1, [v.one_hot_variable_list[0] for v in problem.discrete_variables], 3))
+        split.compile_workers = 4
+        serial.compute_bqm()
+        split.compute_bqm()
+        assert split.objective_bqm == serial.objective_bqm
+        assert split.constraint_bqm == serial.constraint_bqm
+        assert split.BQM == serial.BQM
+
+
+def test_small_lists_are_emitted_serially(monkeypatch, make_problem):
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", None)
+    problem = make_problem("one-hot")
+    problem.compile_workers = None
+    problem.compute_bqm()
+    assert problem.BQM.num_variables == 24
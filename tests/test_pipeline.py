@@ -0,0 +1,49 @@
+"""
+Tests for the asynchronous batch solve pipeline.
+"""
+
+import asyncio
+
+import dimod
+import numpy as np
+
+from dw_util.classes import Problem, DiscreteVariable
+from dw_util.pipeline import solve_many, solve_all, LatencySampler
+
+
+def test_results_match_solving_one_at_a_time(make_problem):
+    problems = [make_problem(encoding_type, n=3, m=3, seed=seed) for seed in range(3) for encoding_type in ["one-hot", "domain-wall"]]
+    sampler = dimod.ExactSolver()
+    for compile_workers in [0, 1]:
+        results = solve_all(problems, sampler, max_in_flight=3, compile_workers=compile_workers)
+        assert [result.index for result in results] == list(range(len(problems)))
+        for problem, result in zip(problems, results):
+            assert result.ok
+            problem.compute_bqm()
+            assert result.sampleset.first.energy == sampler.sample(problem.BQM).first.energy
+            assert set(result.timings) == {"compile", "compile_wall", "sample", "decode", "total"}
+
+
+def test_in_flight_jobs_are_bounded_and_overlap(make_problem):
+    sampler = LatencySampler(latency=0.05)
+    problems = (make_problem("one-hot", n=4, m=4) for _ in range(12))
+    results = solve_all(problems, sampler, max_in_flight=4, compile_workers=0, num_reads=5)
+    assert len(results) == 12
+    assert sampler.max_in_flight == 4
+    assert all(len(result.sampleset) == 5 for result in results)
+
+
+def test_results_stream_as_they_finish_and_failures_are_kept(make_problem):
+    broken = Problem([DiscreteVariable("x", [0, 1], "one-hot")])
+    broken.substitution_mode = "unknown"
+    problems = [make_problem("one-hot", n=4, m=4), broken, make_problem("domain-wall", n=4, m=4)]
+
+    async def collect():
+        return [result async for result in solve_many(problems, LatencySampler(latency=0.01), compile_workers=0, num_reads=3)]
+
+    results = asyncio.run(collect())
+    assert sorted(result.index for result in results) == [0, 1, 2]
+    failed = [result for result in results if not result.ok]
+    assert [result.index for result in failed] == [1]
+    assert isinstance(failed[0].error, ValueError)
+    assert all(np.isfinite(result.timings["total"]) for result in results)
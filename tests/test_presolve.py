@@ -0,0 +1,76 @@
+"""
+Tests for the presolve pass and its postsolve map.
+"""
+
+import numpy as np
+import pytest
+from dimod import BinaryQuadraticModel as BQM, ExactSolver
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+from dw_util.presolve import persistencies
+
+
+def path_colouring(encoding_type, n=4, k=4, seed=1):
+    rng = np.random.default_rng(seed)
+    problem = Problem()
+    for i in range(n):
+        problem.add_variable(DiscreteVariable(name=f"n{i}", domain=list(range(k)), encoding_type=encoding_type))
+    problem.add_not_equal_edges([(i, i + 1) for i in range(n - 1)])
+    for variable in problem.discrete_variables:
+        for binary_variable, cost in zip(variable.one_hot_variable_list, 3 * rng.random(k)):
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], cost))
+    problem.penalty_weight = 10
+    return problem
+
+
+def test_presolve_keeps_the_optimum():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = path_colouring(encoding_type)
+        presolved = problem.presolve(use_roof_duality=False)
+        assert presolved.bqm.num_variables < problem.BQM.num_variables
+        assert presolved.dropped_values
+
+        full = ExactSolver().sample(problem.BQM).first
+        sampleset = presolved.postsolve(ExactSolver().sample(presolved.bqm).lowest())
+        assert abs(sampleset.first.energy - full.energy) < 1e-9
+        evaluation = problem.evaluate(sampleset)
+        assert evaluation.feasible.all()
+        assert np.allclose(evaluation.energy, sampleset.record.energy)
+
+
+def test_persistencies_follow_local_fields():
+    bqm = BQM({"a": 2, "b": -3, "c": 1}, {("a", "b"): -1, ("b", "c"): -2}, 0, "BINARY")
+    # a is off whatever b does, b is then on, which leaves c at -1
+    assert persistencies(bqm) == {"a": 0, "b": 1, "c": 1}
+
+
+def test_persistencies_with_unsorted_labels():
+    bqm = BQM({2: 2, 0: -3, 1: 1}, {(2, 0): -1, (0, 1): -2}, 0, "BINARY")
+    assert persistencies(bqm) == {2: 0, 0: 1, 1: 1}
+
+
+def test_impossible_couplers_are_found_with_unsorted_labels():
+    problem = path_colouring("one-hot", n=2, k=3)
+    (a0, a1, a2), (b0, _, _) = [[binary_variable.index for binary_variable in variable.one_hot_variable_list] for variable in problem.discrete_variables]
+    bqm = BQM({a1: 0, b0: 0, a2: 0, a0: 0}, {(a0, a2): 1, (a1, b0): 1}, 0, "BINARY")
+    problem._kill_impossible_interactions(bqm)
+    assert set(map(frozenset, bqm.quadratic)) == {frozenset((a1, b0))}
+
+
+def test_presolve_with_roof_duality_keeps_the_optimum():
+    pytest.importorskip("dwave.preprocessing")
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = path_colouring(encoding_type)
+        presolved = problem.presolve(use_roof_duality=True)
+        full = ExactSolver().sample(problem.BQM).first
+        sampleset = presolved.postsolve(ExactSolver().sample(presolved.bqm).lowest())
+        assert abs(sampleset.first.energy - full.energy) < 1e-9
+
+
+def test_small_couplers_are_dropped():
+    problem = path_colouring("one-hot")
+    problem.compute_bqm()
+    u, v = next(iter(problem.BQM.quadratic))
+    problem.BQM.set_quadratic(u, v, 1e-12)
+    presolved = problem.presolve(drop_dominated=False, use_roof_duality=False)
+    assert presolved.stats["dropped_couplers"] == 1
@@ -0,0 +1,118 @@
+"""
+Tests for higher order terms and their quadratization.
+"""
+
+import itertools
+
+import dimod
+import numpy as np
+import pytest
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryVariable, BinaryPolynomialTerm
+from dw_util.quadratize import reduce_monomials
+
+
+def cubic_problem(encoding_type, seed=0):
+    variables = [DiscreteVariable(f"v{i}", [0, 1, 2], encoding_type) for i in range(4)]
+    problem = Problem(variables)
+    problem.penalty_weight = 2
+    rng = np.random.default_rng(seed)
+    products = []
+    for triple in itertools.combinations(range(4), 3):
+        for _ in range(2):
+            values = rng.integers(0, 3, 3).tolist()
+            coefficient = float(rng.normal())
+            term = variables[triple[0]].indicator(values[0]) * variables[triple[1]].indicator(values[1]) * variables[triple[2]].indicator(values[2]) * coefficient
+            problem.add_objective_term(term)
+            products.append((triple, values, coefficient))
+    return problem, products
+
+
+def test_ancillas_are_shared_by_terms_with_a_common_pair():
+    pairs = {}
+    made = iter(range(100, 200))
+    monomials, users = reduce_monomials([{1, 2, 3}, {1, 2, 4}, {1, 2, 5, 6}], pairs, lambda u, v: next(made))
+    assert pairs == {(1, 2): 100, (5, 6): 101}
+    assert monomials == [{100, 3}, {100, 4}, {100, 101}]
+    assert sorted(users[100]) == [0, 1, 2]
+
+
+def test_quadratized_problem_keeps_the_optimum():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem, products = cubic_problem(encoding_type)
+        result = problem.quadratize()
+        assert result.terms == len(products) and result.ancillas
+        assert problem.ancillary_variables == result.ancillas
+        problem.compute_bqm()
+
+        best = min(
+            sum(c for triple, values, c in products if all(x[i] == v for i, v in zip(triple, values)))
+            for x in itertools.product(range(3), repeat=4)
+        )
+        sampleset = dimod.ExactSolver().sample(problem.BQM)
+        assert sampleset.first.energy == pytest.approx(best)
+        evaluation = problem.evaluate(sampleset.lowest())
+        assert evaluation.feasible.all()
+        assert evaluation.objective == pytest.approx(best)
+
+
+def test_compile_quadratizes_new_terms_incrementally():
+    problem, _ = cubic_problem("one-hot")
+    problem.compute_bqm()
+    ancillas = list(problem.ancillary_variables)
+    a, b, c, d = problem.discrete_variables
+    problem.add_objective_term(BinaryPolynomialTerm([a.one_hot_variable_list[0], b.one_hot_variable_list[0], c.one_hot_variable_list[0], d.one_hot_variable_list[0]], 1.5))
+    problem.compute_bqm()
+    incremental = problem.BQM.copy()
+    problem.compute_bqm(incremental=False)
+    assert incremental == problem.BQM
+    assert problem.ancillary_variables[:len(ancillas)] == ancillas
+    problem.verify_bqm()
+
+    # decoding reads the discrete variables and sets each ancilla to its product
+    repaired = problem.repair(np.zeros((1, problem.BQM.num_variables)), list(problem.BQM.variables))
+    assert problem.evaluate(repaired).feasible.all()
+
+
+def test_products_of_two_values_of_one_variable_vanish():
+    a, b = DiscreteVariable("a", [0, 1, 2], "one-hot"), DiscreteVariable("b", [0, 1], "one-hot")
+    problem = Problem([a, b])
+    problem.add_objective_term(a.indicator(0) * a.indicator(1) * b.indicator(1))
+    assert problem.quadratize().vanished == 1
+    assert not problem.ancillary_variables
+
+
+def test_ancillas_survive_save_and_load(tmp_path):
+    problem, _ = cubic_problem("domain-wall")
+    problem.compute_bqm()
+    problem.save(tmp_path)
+    loaded = Problem.load(tmp_path)
+    assert [ancilla.index for ancilla in loaded.ancillary_variables] == [ancilla.index for ancilla in problem.ancillary_variables]
+    loaded.compute_bqm(incremental=False)
+    assert loaded.BQM == problem.BQM
+
+
+def test_plain_ancillary_variables_are_registered():
+    extra = BinaryVariable("extra")
+    problem = Problem([DiscreteVariable("a", [0, 1], "one-hot")], ancillary_variables=[extra])
+    assert extra.index is not None and extra.role == "ancilla"
+    problem.compute_bqm()
+    problem.verify_bqm([extra.index])
+
+
+def test_penalty_sweeps_below_one_are_rejected():
+    problem, _ = cubic_problem("one-hot")
+    with pytest.raises(ValueError, match="below 1"):
+        problem.sweep_penalty([0.01, 2.0], dimod.RandomSampler(), num_reads=2)
+
+
+def test_compiling_below_one_is_rejected():
+    problem, _ = cubic_problem("domain-wall")
+    problem.penalty_weight = 0.5
+    with pytest.raises(ValueError, match="below 1"):
+        problem.compute_bqm()
+    problem.penalty_weight = 1
+    problem.compute_bqm()
+    problem.penalty_weight = 0.5
+    with pytest.raises(ValueError, match="below 1"):
+        problem.compute_bqm()
@@ -0,0 +1,64 @@
+"""
+Tests for repairing broken reads.
+"""
+
+import numpy as np
+import pytest
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryVariable
+from dw_util.evaluate import registry_states
+from dw_util.repair import nearest_positions
+
+
+def test_domain_wall_reads_go_to_the_nearest_wall(make_problem):
+    problem = make_problem("domain-wall", n=3, k=5, m=2)
+    problem.compute_bqm()
+    walls = [[b.index for b in v.virtual_variable_list] for v in problem.discrete_variables]
+    states = np.zeros((1, len(problem.registry)), dtype=np.int8)
+    # valid wall after position 1; two walls, nearest is position 0; all zero, nearest is the last value
+    for columns, bits in zip(walls, [[0, 1, 1, 1], [1, 0, 1, 1], [0, 0, 0, 0]]):
+        states[0, columns] = bits
+    assert nearest_positions(problem, states).tolist() == [[1, 0, 4]]
+
+
+def test_repair_makes_every_read_feasible(make_problem):
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=8, m=12)
+        problem.penalty_weight = 2
+        problem.compute_bqm()
+        labels = list(problem.BQM.variables)
+        reads = np.random.default_rng(0).integers(0, 2, size=(50, len(labels)))
+        repaired = problem.repair(reads, labels)
+        evaluation = problem.evaluate(repaired)
+        assert evaluation.feasible.all()
+        # reads that were already valid are unchanged
+        valid = problem.evaluate(reads, labels).feasible
+        assert np.array_equal(repaired.record.sample[valid], registry_states(problem, reads, labels)[valid][:, labels])
+
+        descended = problem.repair(reads, labels, descent=True)
+        assert problem.evaluate(descended).feasible.all()
+        assert (descended.record.energy <= repaired.record.energy + 1e-9).all()
+
+
+def test_descent_repairs_quadratized_problems():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        variables = [DiscreteVariable(name=f"n{i}", domain=list(range(3)), encoding_type=encoding_type) for i in range(4)]
+        problem = Problem(variables, [])
+        problem.penalty_weight = 2
+        for a, b, c in [(0, 1, 2), (1, 2, 3), (0, 2, 3)]:
+            problem.add_objective_term(variables[a].indicator(0) * variables[b].indicator(1) * variables[c].indicator(2) * -1.5)
+        problem.compute_bqm()
+        assert problem.ancillary_variables
+        labels = list(problem.BQM.variables)
+        reads = np.random.default_rng(1).integers(0, 2, size=(30, len(labels)))
+        repaired = problem.repair(reads, labels)
+        descended = problem.repair(reads, labels, descent=True)
+        assert problem.evaluate(descended).feasible.all()
+        assert (descended.record.energy <= repaired.record.energy + 1e-9).all()
+
+
+def test_descent_rejects_free_ancillas():
+    problem = Problem([DiscreteVariable("a", [0, 1], "one-hot")], ancillary_variables=[BinaryVariable("extra")])
+    problem.compute_bqm()
+    with pytest.raises(ValueError, match="stand for no product"):
+        problem.repair(np.zeros((1, problem.BQM.num_variables)), descent=True)
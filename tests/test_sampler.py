@@ -0,0 +1,86 @@
+"""
+Tests for the discrete annealing sampler.
+"""
+
+import numpy as np
+from dimod import ExactSolver
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+
+from dw_util.sampler import DiscreteAnnealingSampler, ValueModel
+
+
+def test_value_model_matches_bqm_on_valid_states(make_problem):
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=8, m=12)
+        problem.penalty_weight = 3
+        model = ValueModel(problem)
+        positions = np.random.default_rng(0).integers(0, 4, size=(20, 8))
+        states, labels = DiscreteAnnealingSampler.binary_states(problem, positions)
+        assert np.allclose(model.energies(positions, model.fields(positions)), problem.BQM.energies((states, labels)))
+
+
+def test_value_model_with_objective_on_later_variables():
+    rng = np.random.default_rng(2)
+    for encoding_type in ["one-hot", "domain-wall"]:
+        variables = [DiscreteVariable(name=f"n{i}", domain=list(range(3)), encoding_type=encoding_type) for i in range(4)]
+        problem = Problem(variables, [])
+        problem.add_objective_term(variables[3] != variables[2])
+        for binary_variable in variables[3].one_hot_variable_list:
+            problem.add_objective_term(BinaryLinearTerm([binary_variable], rng.random()))
+        model = ValueModel(problem)
+        positions = rng.integers(0, 3, size=(20, 4))
+        states, labels = DiscreteAnnealingSampler.binary_states(problem, positions)
+        assert np.allclose(model.energies(positions, model.fields(positions)), problem.BQM.energies((states, labels)))
+
+
+def test_sampler_finds_the_ground_state(make_problem):
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type, n=4, k=3, m=5)
+        problem.penalty_weight = 4
+        sampleset = DiscreteAnnealingSampler().sample(problem, num_reads=20, num_sweeps=200, seed=0)
+        assert set(sampleset.variables) == set(problem.BQM.variables)
+        assert problem.evaluate(sampleset).feasible.all()
+        ground = ExactSolver().sample(problem.BQM).first.energy
+        assert abs(sampleset.first.energy - ground) < 1e-9
+
+
+def cubic_problem(encoding_type, seed=0):
+    rng = np.random.default_rng(seed)
+    variables = [DiscreteVariable(name=f"n{i}", domain=list(range(3)), encoding_type=encoding_type) for i in range(4)]
+    problem = Problem(variables, [])
+    problem.penalty_weight = 2
+    for a, b, c in [(0, 1, 2), (1, 2, 3), (0, 2, 3), (0, 1, 2)]:
+        values = rng.integers(0, 3, 3)
+        problem.add_objective_term(variables[a].indicator(values[0]) * variables[b].indicator(values[1]) * variables[c].indicator(values[2]) * float(rng.normal()))
+    problem.add_objective_term(variables[0] != variables[3])
+    return problem
+
+
+def test_value_model_matches_bqm_with_ancillas():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = cubic_problem(encoding_type)
+        model = ValueModel(problem)
+        assert problem.ancillary_variables and len(model.product_coefficients)
+        positions = np.array(list(np.ndindex(3, 3, 3, 3)))
+        states, labels = DiscreteAnnealingSampler.binary_states(problem, positions)
+        energies = model.energies(positions, model.fields(positions))
+        assert np.allclose(energies, problem.BQM.energies((states, labels)))
+
+        # the local fields of one variable give the energy of each of its values
+        for a in range(4):
+            local = model.fields(positions)[:, model.slot_of[[a]]] + model.product_fields(positions, np.array([a]))
+            for value in range(3):
+                moved = positions.copy()
+                moved[:, a] = value
+                change = model.energies(moved, model.fields(moved)) - energies
+                assert np.allclose(change, local[:, 0, value] - local[np.arange(len(positions)), 0, positions[:, a]])
+
+
+def test_sampler_finds_the_ground_state_with_ancillas():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = cubic_problem(encoding_type, seed=1)
+        sampleset = DiscreteAnnealingSampler().sample(problem, num_reads=20, num_sweeps=200, seed=0)
+        assert problem.evaluate(sampleset).feasible.all()
+        ground = ExactSolver().sample(problem.BQM).first.energy
+        assert abs(sampleset.first.energy - ground) < 1e-9
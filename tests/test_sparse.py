@@ -0,0 +1,31 @@
+"""
+Tests for exporting the compiled model as sparse matrices.
+"""
+
+import numpy as np
+
+from dw_util.classes import Problem
+
+
+def test_sparse_export_matches_bqm_energies(tmp_path, make_problem):
+    problem = make_problem("domain-wall")
+    problem.penalty_weight = 2
+    problem.compute_bqm()
+    problem.save(tmp_path / "problem")
+    loaded = Problem.load(tmp_path / "problem")
+    states = np.random.default_rng(0).integers(0, 2, size=(20, problem.BQM.num_variables))
+
+    for source in [problem, loaded]:
+        Q, linear, offset, labels = source.to_sparse()
+        assert (Q.tocoo().row < Q.tocoo().col).all()
+        expected = problem.BQM.energies((states, labels.tolist()))
+        assert np.allclose(states @ linear + np.einsum('ri,ri->r', states @ Q, states) + offset, expected)
+
+        J, h, ising_offset, _ = source.to_sparse("ising")
+        spins = 2 * states - 1
+        assert np.allclose(spins @ h + np.einsum('ri,ri->r', spins @ J, spins) + ising_offset, expected)
+    # exported without building the BQMs of the loaded problem
+    assert loaded._stored_models is not None
+
+    Q32, linear32, _, _ = problem.to_sparse(dtype=np.float32)
+    assert Q32.dtype == np.float32 and linear32.dtype == np.float32
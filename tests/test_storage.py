@@ -0,0 +1,61 @@
+"""
+Tests for saving and loading compiled problems.
+"""
+
+import numpy as np
+from dwave.samplers import SimulatedAnnealingSampler
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm, LinearEqualityConstraint
+
+
+def test_round_trip_keeps_models_and_decoding(tmp_path, make_problem):
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_problem(encoding_type)
+        problem.penalty_weight = 3
+        problem.compute_bqm()
+        problem.save(tmp_path / encoding_type)
+        loaded = Problem.load(tmp_path / encoding_type)
+
+        assert not loaded.is_dirty
+        assert isinstance(loaded._stored_models["BQM"][0], np.memmap)
+        assert loaded.BQM == problem.BQM
+        assert loaded.objective_bqm == problem.objective_bqm
+        assert loaded.constraint_bqm == problem.constraint_bqm
+        assert [b.name for b in loaded.registry] == [b.name for b in problem.registry]
+
+        sampleset = SimulatedAnnealingSampler().sample(loaded.BQM, num_reads=20, seed=1)
+        before, after = problem.evaluate(sampleset), loaded.evaluate(sampleset)
+        assert np.array_equal(before.positions, after.positions)
+        assert np.allclose(before.energy, after.energy)
+        assert np.allclose(after.energy, sampleset.record.energy)
+
+
+def test_loaded_problem_keeps_compiling(tmp_path, make_problem):
+    problem = make_problem("domain-wall")
+    problem.add_constraint_term(LinearEqualityConstraint(1, [v.one_hot_variable_list[0] for v in problem.discrete_variables], 2))
+    problem.save(tmp_path / "problem")
+    loaded = Problem.load(tmp_path / "problem")
+
+    for p in [problem, loaded]:
+        p.add_variable(DiscreteVariable(name="extra", domain=[0, 1, 2], encoding_type="domain-wall"))
+        p.add_objective_term(BinaryLinearTerm([p.discrete_variables[-1].one_hot_variable_list[1]], 2.5))
+        p.penalty_weight = 2
+        p.compute_bqm()
+    assert loaded.BQM == problem.BQM
+
+    # a full compile starts from the saved coefficients of the dropped terms
+    loaded.compute_bqm(incremental=False)
+    assert loaded.BQM == problem.BQM
+
+
+def test_removed_variables_leave_gaps(tmp_path, make_problem):
+    problem = make_problem("one-hot", m=0)
+    problem.remove_variable(problem.discrete_variables[2])
+    for term in list(problem.objective_terms):
+        if term.variables[0].parent_variable.name == "n2":
+            problem.remove_objective_term(term)
+    problem.save(tmp_path / "problem")
+    loaded = Problem.load(tmp_path / "problem", mmap=False)
+    assert len(loaded.registry) == len(problem.registry)
+    assert all(loaded.registry[b.index] is None for b in problem.registry if b.parent_variable.name == "n2")
+    assert loaded.BQM == problem.BQM
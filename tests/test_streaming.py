@@ -0,0 +1,105 @@
+"""
+Tests for streaming term ingestion.
+"""
+
+import numpy as np
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+from dw_util.streaming import StreamedCoefficients, iter_edge_chunks, iter_edge_source
+from dw_util.accumulator import CoefficientAccumulator
+
+
+def make_variables(encoding_type, n=12, k=4):
+    problem = Problem()
+    for i in range(n):
+        problem.add_variable(DiscreteVariable(name=f"n{i}", domain=list(range(k)), encoding_type=encoding_type))
+    return problem
+
+
+def random_edges(n=12, m=40, seed=0):
+    edges = np.random.default_rng(seed).integers(0, n, size=(m, 2))
+    return edges[edges[:, 0] != edges[:, 1]]
+
+
+def test_streamed_terms_match_kept_terms():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        kept, streamed = make_variables(encoding_type), make_variables(encoding_type)
+        kept.add_not_equal_edges(random_edges())
+        for variable in kept.discrete_variables:
+            for b in variable.one_hot_variable_list:
+                kept.add_objective_term(BinaryLinearTerm([b], b.represents + 0.5))
+        streamed.stream_not_equal_edges(random_edges(), chunk_size=7)
+        streamed.add_objective_terms(
+            (BinaryLinearTerm([b], b.represents + 0.5) for variable in streamed.discrete_variables for b in variable.one_hot_variable_list),
+            chunk_size=5,
+        )
+        assert streamed.objective_terms == []
+        kept.compute_bqm()
+        streamed.compute_bqm()
+        assert kept.BQM == streamed.BQM
+
+
+def test_streaming_after_compile_is_incremental():
+    kept, streamed = make_variables("domain-wall"), make_variables("domain-wall")
+    edges = random_edges()
+    kept.add_not_equal_edges(edges)
+    streamed.stream_not_equal_edges(edges[:10])
+    streamed.compute_bqm()
+    streamed.stream_not_equal_edges(edges[10:])
+    assert streamed.is_dirty
+    streamed.compute_bqm()
+    assert not streamed.is_dirty
+    kept.compute_bqm()
+    for u, v in kept.BQM.quadratic:
+        assert abs(kept.BQM.get_quadratic(u, v) - streamed.BQM.get_quadratic(u, v)) < 1e-9
+    assert set(kept.BQM.linear.items()) == set(streamed.BQM.linear.items())
+
+
+def test_edges_are_read_lazily_from_files(tmp_path):
+    edges = random_edges(m=25)
+    np.save(tmp_path / "edges.npy", edges)
+    np.savetxt(tmp_path / "edges.csv", edges, fmt="%d", delimiter=",", header="a,b")
+    from_npy = np.concatenate(list(iter_edge_chunks(tmp_path / "edges.npy", chunk_size=4)))
+    from_csv = list(iter_edge_chunks(tmp_path / "edges.csv", chunk_size=4))
+    assert max(len(chunk) for chunk in from_csv) <= 4
+    assert np.array_equal(from_npy, edges) and np.array_equal(np.concatenate(from_csv), edges)
+
+    problem, expected = make_variables("one-hot"), make_variables("one-hot")
+    problem.stream_not_equal_edges(tmp_path / "edges.csv", chunk_size=4)
+    expected.add_not_equal_edges(edges)
+    problem.compute_bqm()
+    expected.compute_bqm()
+    assert problem.BQM == expected.BQM
+
+
+def test_edge_sources_yield_int64_chunks():
+    edges = random_edges(m=10)
+    for source in [edges.astype(np.int32), edges.astype(np.uint16), [edges[:6].tolist(), edges[6:]]]:
+        chunks = list(iter_edge_source(source, chunk_size=4))
+        assert all(chunk.dtype == np.int64 and chunk.shape[1] == 2 for chunk in chunks)
+        assert np.array_equal(np.concatenate(chunks), edges)
+
+
+def test_streamed_store_stays_model_sized():
+    store = StreamedCoefficients(compact_threshold=100)
+    for _ in range(50):
+        chunk = CoefficientAccumulator(num_variables=10)
+        chunk.add_quadratic_from_arrays(np.arange(9), np.arange(1, 10), 1.0)
+        store.fold(chunk)
+    # 9 distinct couplers, however many chunks were folded in
+    assert store.total.num_entries <= 2 * 100 + 9
+    assert store.total.to_bqm().num_interactions == 9
+    assert all(bias == 50 for bias in store.total.to_bqm().quadratic.values())
+
+
+def test_removed_variables_drop_their_streamed_coefficients():
+    for encoding_type in ["one-hot", "domain-wall"]:
+        problem = make_variables(encoding_type)
+        problem.stream_not_equal_edges(random_edges())
+        problem.compute_bqm()
+        problem.remove_variable(problem.discrete_variables[3])
+        problem.compute_bqm()
+        incremental = problem.BQM.copy()
+        problem.compute_bqm(incremental=False)
+        problem.verify_bqm()
+        assert problem.BQM == incremental
@@ -0,0 +1,23 @@
+"""
+Tests for the sparse substitution of domain wall variables.
+"""
+
+
+def test_sparse_substitution_matches_sequential(make_problem):
+    models = {}
+    for mode in ["sequential", "sparse"]:
+        problem = make_problem("domain-wall", seed=1)
+        problem.substitution_mode = mode
+        problem.compute_bqm()
+        models[mode] = problem.BQM.relabel_variables({v: str(v) for v in problem.BQM.variables}, inplace=False)
+    sequential, batched = models["sequential"], models["sparse"]
+    for (u, v), bias in list(sequential.quadratic.items()):
+        if bias == 0:
+            sequential.remove_interaction(u, v)
+    assert set(sequential.variables) == set(batched.variables)
+    assert abs(sequential.offset - batched.offset) < 1e-9
+    for v in sequential.variables:
+        assert abs(sequential.linear[v] - batched.linear[v]) < 1e-9
+    assert sequential.num_interactions == batched.num_interactions
+    for (u, v), bias in sequential.quadratic.items():
+        assert abs(bias - batched.get_quadratic(u, v)) < 1e-9
@@ -0,0 +1,44 @@
+"""
+Tests for the penalty weight sweep.
+"""
+
+import numpy as np
+import dimod
+
+from dw_util.sweep import SharedModel, weighted_bqm_from_shared
+
+
+def test_shared_model_rebuilds_weighted_bqm(make_problem):
+    problem = make_problem("domain-wall", n=5, k=3, m=6)
+    problem.compute_bqm()
+    labels = list(problem.BQM.variables)
+    with SharedModel(problem._objective_part, problem._constraint_part, labels) as model:
+        for weight in [0.5, 2.0]:
+            problem.penalty_weight = weight
+            problem.compute_bqm()
+            rebuilt = weighted_bqm_from_shared(model.descriptor, weight)
+            states = np.random.default_rng(0).integers(0, 2, size=(50, len(labels)))
+            assert np.allclose(rebuilt.energies((states, labels)), problem.BQM.energies((states, labels)))
+
+
+def test_shared_model_with_unsorted_labels():
+    objective = dimod.BQM({3: 1.0, 0: -2.0, 2: 0.5}, {(3, 0): 1.5, (0, 2): -1.0}, 0.5, 'BINARY')
+    constraint = dimod.BQM({1: 2.0, 3: -1.0}, {(1, 3): 4.0}, 1.0, 'BINARY')
+    labels = [2, 3, 0, 1]
+    states = np.array(list(np.ndindex(2, 2, 2, 2)))
+    with SharedModel(objective, constraint, labels) as model:
+        rebuilt = weighted_bqm_from_shared(model.descriptor, 3.0)
+    expected = objective.energies((states, labels)) + 3.0 * constraint.energies((states, labels))
+    assert np.allclose(rebuilt.energies((states, labels)), expected)
+
+
+def test_sweep_penalty_reports_each_weight(make_problem):
+    problem = make_problem("domain-wall", n=4, k=3, m=4)
+    weights = [0.01, 5.0]
+    results = problem.sweep_penalty(weights, dimod.SimulatedAnnealingSampler(), num_reads=20, max_workers=2, num_sweeps=200)
+    assert [result.weight for result in results] == weights
+    for result in results:
+        assert len(result.sampleset) == 20
+        assert 0 <= result.feasibility_rate <= 1
+    assert results[1].feasibility_rate > 0
+    assert results[1].best_feasible_energy is not None
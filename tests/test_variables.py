@@ -0,0 +1,49 @@
+"""
+Tests for the variable classes and the Problem variable registry.
+"""
+
+import pytest
+
+from dw_util.classes import Problem, DiscreteVariable, BinaryVariable
+
+
+def test_registry_gives_dense_indices():
+    problem = Problem()
+    for i in range(3):
+        problem.add_variable(DiscreteVariable(name=f"n{i}", domain=[0, 1, 2], encoding_type="domain-wall"))
+    assert [variable.index for variable in problem.registry] == list(range(3 * (4 + 3)))
+    for variable in problem.registry:
+        assert problem.variable(variable.index) is variable
+    with pytest.raises(ValueError):
+        problem.registry.register(problem.discrete_variables[0].one_hot_variable_list[0])
+
+
+def test_bqm_labels_are_indices():
+    problem = Problem()
+    for i in range(2):
+        problem.add_variable(DiscreteVariable(name=f"n{i}", domain=[0, 1, 2], encoding_type="domain-wall"))
+    problem.add_objective_term(problem.discrete_variables[0] != problem.discrete_variables[1])
+    problem.compute_bqm()
+    assert all(isinstance(label, int) for label in problem.BQM.variables)
+    assert {problem.variable(label).name for label in problem.BQM.variables} == {
+        "n0 dw[0, 1]", "n0 dw[1, 2]", "n1 dw[0, 1]", "n1 dw[1, 2]"
+    }
+
+
+def test_names_are_built_lazily():
+    one_hot = DiscreteVariable(name="a", domain=[0, 1], encoding_type="one-hot")
+    domain_wall = DiscreteVariable(name="b", domain=[0, 1], encoding_type="domain-wall")
+    assert [v.name for v in one_hot.one_hot_variable_list] == ["a is 0", "a is 1"]
+    assert [v.name for v in domain_wall.one_hot_variable_list] == ["b=0", "b=1"]
+    assert [v.name for v in domain_wall.domain_wall_variable_list] == ["b dw[start, 0]", "b dw[0, 1]", "b dw[1, end]"]
+    assert domain_wall.one_hot_variable_list[1].dw_neigbours == domain_wall.domain_wall_variable_list[1:3]
+    assert BinaryVariable("c").name == "c"
+
+
+def test_variables_have_no_instance_dict():
+    variable = DiscreteVariable(name="a", domain=[0, 1], encoding_type="one-hot", extra_properties={"colour": "red"})
+    assert variable.colour == "red"
+    assert not hasattr(variable, "__dict__")
+    assert not hasattr(variable.one_hot_variable_list[0], "__dict__")
+    with pytest.raises(AttributeError):
+        DiscreteVariable(name="a", domain=[0, 1], encoding_type="one-hot", extra_properties={"domain": []})
@@ -1,4 +1,5 @@
-from dw_util.classes import Problem, DiscreteVariable
+from dw_util.classes import Problem, DiscreteVariable, BinaryLinearTerm
+import numpy as np
 import random
 
 khot_problem = Problem()
@@ -27,18 +28,14 @@ for i in range(n):
             edges.append((i,j))
 
 # For each edge, we add a penalty if the connected nodes have the same color
-for (node1, node2) in edges:
-    var1 = khot_problem.discrete_variables[node1]
-    var2 = khot_problem.discrete_variables[node2]
-    khot_problem.add_objective_term(var1 != var2)
+khot_problem.add_not_equal_edges(np.array(edges).reshape(-1, 2))
 
 # Assign random costs to each colour
 costs = {i: random.random() for i in range(k)}
 print({k: round(v, 2) for k, v in costs.items()})
 
 for discrete_variable in khot_problem.discrete_variables:
-    for binary_variable in discrete_variable.one_hot_variables:
-
+    for binary_variable in discrete_variable.one_hot_variable_list:
+        khot_problem.add_objective_term(BinaryLinearTerm([binary_variable], costs[binary_variable.represents]))
 
 khot_problem.compute_bqm()
-